@@ -0,0 +1,90 @@
+"""对比“每次调用新建连接”与 connection_manager 长连接的单次调用耗时
+
+用法：python -m benchmarks.bench_connection [--purchases 20000] [--calls 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import create_database
+from database.connection import connection_manager
+import database.queries as queries
+
+
+def seed(db_path, purchases, brands=5, items_per_brand=50):
+    """写入一份简单的测试数据"""
+    rng = random.Random(42)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for b in range(1, brands + 1):
+        cursor.execute("INSERT INTO brands (brand_id, brand_name, created_at) VALUES (?, ?, ?)",
+                       (b, f"品牌{b}", "2024-01-01 00:00:00"))
+        for i in range(items_per_brand):
+            cursor.execute("INSERT INTO items (item_name, spec, unit, brand_id) VALUES (?, ?, ?, ?)",
+                           (f"商品{b}-{i}", rng.randint(1, 24), "箱", b))
+    item_ids = [row for row in cursor.execute("SELECT item_id, brand_id FROM items")]
+    rows = []
+    for _ in range(purchases):
+        item_id, brand_id = rng.choice(item_ids)
+        qty = rng.randint(1, 50)
+        price = round(rng.uniform(5, 200), 2)
+        date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        rows.append((item_id, brand_id, qty, "箱", price, qty * price, date, None))
+    cursor.executemany(
+        "INSERT INTO purchases (item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def time_calls(calls):
+    """依次调用几个常用查询，返回平均单次耗时（微秒）"""
+    results = {}
+    cases = {
+        "get_all_brands": lambda: queries.get_all_brands(),
+        "get_all_items": lambda: queries.get_all_items(1),
+        "get_purchases_by_brand": lambda: queries.get_purchases_by_brand(1, 1, 20, 2024, 6),
+        "get_monthly_activities": lambda: queries.get_monthly_activities(1, 2024, 6),
+    }
+    for name, func in cases.items():
+        func()  # 预热
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        results[name] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--purchases", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        create_database(db_path)
+        seed(db_path, args.purchases)
+        queries.DB_PATH = db_path
+
+        managed_get_connection = queries.get_connection
+        queries.get_connection = lambda: sqlite3.connect(db_path)  # 旧实现：每次新建连接
+        before = time_calls(args.calls)
+        queries.get_connection = managed_get_connection
+        after = time_calls(args.calls)
+        connection_manager.close_all()
+
+    print(f"{'函数':<28}{'每次新建(µs)':>14}{'长连接(µs)':>14}{'加速比':>10}")
+    for name in before:
+        print(f"{name:<28}{before[name]:>14.1f}{after[name]:>14.1f}{before[name] / after[name]:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""账单导出基准：不同数据量下的导出耗时和进程内存增量，验证内存占用不随行数增长
+
+每个数据量在独立子进程中导出，内存以导出前后的峰值 RSS 之差计（依赖 resource 模块，仅 Linux/macOS）。
+用法：python -m benchmarks.bench_export [--sizes 50000 200000 800000] [--format xlsx]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import create_database
+from benchmarks.bench_connection import seed
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # macOS 以字节计，Linux 以 KB 计
+
+
+def run_export(db_path, out_path, results):
+    import database.queries as queries
+    from utils.export import export_purchases
+    queries.DB_PATH = db_path
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    rows = export_purchases(out_path, [1], (2024, 1), (2024, 12))
+    results.put((rows, time.perf_counter() - start, peak_rss_mb() - before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50000, 200000, 800000])
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "export.db")
+            create_database(db_path)
+            seed(db_path, size, brands=1)
+            out_path = os.path.join(tmp, f"bill.{args.format}")
+
+            results = context.Queue()
+            process = context.Process(target=run_export, args=(db_path, out_path, results))
+            process.start()
+            rows, seconds, rss_growth = results.get()
+            process.join()
+            print(f"{rows:>9} 行: {seconds:6.2f} s，{rows / seconds:8,.0f} 行/s，"
+                  f"峰值内存增量 {rss_growth:6.1f} MB，文件 {os.path.getsize(out_path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""批量导入基准：生成 CSV 后导入空库，统计总耗时和吞吐
+
+用法：python -m benchmarks.bench_import [--rows 1000000] [--items 2000] [--bad-rate 0.001]
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import create_database
+from database.connection import connection_manager
+import database.queries as queries
+from utils.importer import import_purchases
+
+
+def write_csv(path, rows, items, bad_rate):
+    """写入带中文表头的进货 CSV，按 bad_rate 混入无效行"""
+    rng = random.Random(11)
+    catalog = [(f"商品{i}", rng.choice([6, 12, 24]), rng.choice(["箱", "件"]), round(rng.uniform(5, 200), 2))
+               for i in range(items)]
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["日期", "品名", "规格", "单位", "数量", "单价", "金额", "备注"])
+        for _ in range(rows):
+            name, spec, unit, price = rng.choice(catalog)
+            quantity = rng.randint(1, 50)
+            date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            if rng.random() < bad_rate:
+                quantity = "abc"
+            writer.writerow([date, name, spec, unit, quantity, price, "", ""])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--bad-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "import.db")
+        csv_path = os.path.join(tmp, "purchases.csv")
+        create_database(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO brands (brand_name, created_at) VALUES ('基准品牌', '2024-01-01 00:00:00')")
+        conn.commit()
+        conn.close()
+        write_csv(csv_path, args.rows, args.items, args.bad_rate)
+        queries.DB_PATH = db_path
+
+        start = time.perf_counter()
+        report = import_purchases(csv_path, brand_id=1)
+        seconds = time.perf_counter() - start
+        connection_manager.close_all()
+
+    print(report.summary())
+    print(f"耗时: {seconds:.2f} s，吞吐: {report.total_rows / seconds:,.0f} 行/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""表结构迁移基准：在旧版表结构的合成数据库上执行全部迁移，输出各迁移耗时并校验结果
+
+旧版结构：items 的 spec 为 TEXT 且没有 unit/brand_id 以外的约束，activities 没有价格约束和唯一约束，
+purchases 只有单列品牌索引，也没有月度汇总表。
+用法：python -m benchmarks.bench_migrate [--purchases 1000000] [--items 20000] [--activities 20000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import SCHEMA_VERSION
+from database.migrations import migrate
+
+LEGACY_SCHEMA = """
+    CREATE TABLE brands (
+        brand_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        brand_name TEXT NOT NULL UNIQUE,
+        created_at TEXT NOT NULL
+    );
+    CREATE TABLE items (
+        item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_name TEXT NOT NULL,
+        spec TEXT,
+        unit TEXT,
+        brand_id INTEGER
+    );
+    CREATE TABLE purchases (
+        purchase_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL,
+        brand_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit TEXT NOT NULL,
+        unit_price REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        date TEXT NOT NULL,
+        remarks TEXT,
+        FOREIGN KEY (item_id) REFERENCES items(item_id),
+        FOREIGN KEY (brand_id) REFERENCES brands(brand_id) ON DELETE CASCADE
+    );
+    CREATE TABLE activities (
+        activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        brand_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        is_total_target BOOLEAN NOT NULL,
+        item_id INTEGER,
+        activity_type TEXT,
+        need_total_target BOOLEAN,
+        need_item_target BOOLEAN,
+        target_value REAL NOT NULL,
+        original_price REAL,
+        discount_price REAL
+    );
+    CREATE INDEX idx_purchases_date ON purchases(date);
+    CREATE INDEX idx_purchases_brand ON purchases(brand_id);
+"""
+
+
+def seed_legacy(db_path, purchases, items, activities, brands=10):
+    rng = random.Random(42)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO brands (brand_id, brand_name, created_at) VALUES (?, ?, ?)",
+                     [(b, f"品牌{b}", "2024-01-01 00:00:00") for b in range(1, brands + 1)])
+    specs = ["12", "24", "6", "", "abc", "-3", None]  # 含需要清洗的旧数据
+    conn.executemany("INSERT INTO items (item_id, item_name, spec, unit, brand_id) VALUES (?, ?, ?, ?, ?)",
+                     [(i, f"商品{i}", rng.choice(specs), rng.choice(["箱", "", None]), rng.randint(1, brands))
+                      for i in range(1, items + 1)])
+    conn.executemany(
+        "INSERT INTO activities (brand_id, month, is_total_target, item_id, activity_type, need_total_target,"
+        " need_item_target, target_value, original_price, discount_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(rng.randint(1, brands), f"2024-{rng.randint(1, 12):02d}", int(rng.random() < 0.1), rng.randint(1, items),
+          "特价", 1, 1, 100, rng.choice([10, -1, 0, None]), rng.choice([8, -2, None]))
+         for _ in range(activities)]
+    )
+    batch = []
+    for _ in range(purchases):
+        qty = rng.randint(1, 50)
+        price = round(rng.uniform(5, 200), 2)
+        batch.append((rng.randint(1, items), rng.randint(1, brands), qty, "箱", price, qty * price,
+                      f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", None))
+        if len(batch) >= 100000:
+            conn.executemany("INSERT INTO purchases (item_id, brand_id, quantity, unit, unit_price, total_amount,"
+                             " date, remarks) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO purchases (item_id, brand_id, quantity, unit, unit_price, total_amount,"
+                         " date, remarks) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def verify(db_path, purchases, items):
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == items
+        assert conn.execute("SELECT COUNT(*) FROM items WHERE spec <= 0 OR unit = ''").fetchone()[0] == 0
+        assert conn.execute("SELECT SUM(row_count) FROM purchase_monthly_agg").fetchone()[0] == purchases
+        duplicated = conn.execute("""
+            SELECT COUNT(*) FROM (SELECT 1 FROM activities WHERE is_total_target = 1
+                                  GROUP BY brand_id, month HAVING COUNT(*) > 1)
+        """).fetchone()[0]
+        assert duplicated == 0
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--purchases", type=int, default=1000000)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--activities", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "legacy.db")
+        start = time.perf_counter()
+        seed_legacy(db_path, args.purchases, args.items, args.activities)
+        print(f"生成旧版数据库（{args.purchases} 条进货）: {time.perf_counter() - start:.1f} s")
+
+        planned = migrate(db_path, dry_run=True)
+        print(f"待执行迁移: {', '.join(str(m.version) for m in planned)}")
+
+        last = [time.perf_counter()]
+
+        def report(number, total, migration, result):
+            now = time.perf_counter()
+            print(f"  [{number}/{total}] 版本 {migration.version} {migration.description}: "
+                  f"{now - last[0]:6.2f} s  {result}")
+            last[0] = now
+
+        start = time.perf_counter()
+        migrate(db_path, progress=report)
+        print(f"迁移合计: {time.perf_counter() - start:.2f} s")
+        verify(db_path, args.purchases, args.items)
+        print("校验通过；再次执行迁移:", migrate(db_path) or "无待执行迁移")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""数据库层基准：在几档规模的合成数据（benchmarks.datagen）上计时 database.queries 的公开查询
+
+每档规模生成（或从 --data-dir 缓存复制）一个数据库，对每个用例重复调用并记录中位数、p95 和最小耗时。
+写操作用例（add_purchase、delete_purchase）成对执行，结束后数据恢复原样。
+测量期间关闭 database.result_cache，计时的是实际查询而不是缓存命中。
+
+结果可以保存为 JSON，并与之前保存的基准结果比较：某用例的中位数比基准慢 threshold 倍以上
+且差值超过 --min-delta-ms 时判为退化，以非零状态退出。
+
+用法：python -m benchmarks.bench_queries [--scales small,medium] [--repeat 50] [--data-dir DIR]
+                                         [--save results.json] [--baseline baseline.json] [--threshold 1.25]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.datagen import SCALES, generate
+from database.connection import connection_manager
+from database.completion import compute_activity_completion
+from database.settlement import settle, settle_brand_month
+import database.queries as queries
+from database import result_cache
+
+# 用例：调用方式、每次调用前不计时的准备步骤、重复次数系数（较慢的用例少跑几次）
+Case = namedtuple("Case", ["func", "setup", "repeat_factor"])
+Case.__new__.__defaults__ = (None, 1.0)
+
+PER_PAGE = 20
+
+
+def dataset_context(db_path, spec):
+    """用例参数：进货最多的品牌、最后一个月，以及该品牌全部记录和当月记录的页数"""
+    conn = sqlite3.connect(db_path)
+    try:
+        brand_id, total = conn.execute("""
+            SELECT brand_id, COUNT(*) FROM purchases GROUP BY brand_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()
+        year, month = spec.end_year, 12
+        month_count = conn.execute("SELECT COUNT(*) FROM purchases WHERE brand_id = ? AND date LIKE ?",
+                                   (brand_id, f"{year}-{month:02d}-%")).fetchone()[0]
+        item = conn.execute("""
+            SELECT item_id, unit FROM purchases WHERE brand_id = ? AND date LIKE ? LIMIT 1
+        """, (brand_id, f"{year}-{month:02d}-%")).fetchone()
+    finally:
+        conn.close()
+    return {
+        "brand_id": brand_id, "year": year, "month": month, "item": item,
+        "pages": max(1, -(-total // PER_PAGE)), "month_pages": max(1, -(-month_count // PER_PAGE)),
+    }
+
+
+def build_cases(ctx):
+    brand_id, year, month = ctx["brand_id"], ctx["year"], ctx["month"]
+    item_id, unit = ctx["item"]
+    added = []
+    date = f"{year}-{month:02d}-15"
+
+    def add():
+        added.append(queries.add_purchase(item_id, brand_id, 3, unit, 10.0, 30.0, date, "基准测试"))
+
+    def delete():
+        queries.delete_purchase(added.pop())
+
+    return {
+        "get_purchases_by_brand(当月第1页)": Case(
+            lambda: queries.get_purchases_by_brand(brand_id, 1, PER_PAGE, year, month)),
+        "get_purchases_by_brand(当月末页)": Case(
+            lambda: queries.get_purchases_by_brand(brand_id, ctx["month_pages"], PER_PAGE, year, month)),
+        "get_purchases_by_brand(全部第1页)": Case(
+            lambda: queries.get_purchases_by_brand(brand_id, 1, PER_PAGE)),
+        "get_purchases_by_brand(全部中间页)": Case(
+            lambda: queries.get_purchases_by_brand(brand_id, ctx["pages"] // 2, PER_PAGE)),
+        "get_purchases_by_brand(全部末页)": Case(
+            lambda: queries.get_purchases_by_brand(brand_id, ctx["pages"], PER_PAGE)),
+        "get_purchases_page(全部首页)": Case(
+            lambda: queries.get_purchases_page(brand_id, per_page=PER_PAGE)),
+        "get_purchases_page(全部末页)": Case(
+            lambda: queries.get_purchases_page(brand_id, per_page=PER_PAGE, last=True)),
+        "get_purchase_count(未缓存)": Case(
+            lambda: queries.get_purchase_count(brand_id)),
+        "get_purchase_totals": Case(lambda: queries.get_purchase_totals(brand_id, year, month)),
+        "get_monthly_item_totals": Case(lambda: queries.get_monthly_item_totals(brand_id, year, month)),
+        "get_monthly_activities": Case(lambda: queries.get_monthly_activities(brand_id, year, month)),
+        "get_all_items": Case(lambda: queries.get_all_items(brand_id)),
+        "add_purchase": Case(add),
+        # 依次删除 add_purchase 用例写入的记录，两者的重复次数必须相同
+        "delete_purchase": Case(delete),
+        "compute_activity_completion": Case(
+            lambda: compute_activity_completion(brand_id, year, month), repeat_factor=0.2),
+        "settle_brand_month": Case(lambda: settle_brand_month(brand_id, year, month), repeat_factor=0.2),
+        "settle(全部品牌全年)": Case(lambda: settle(None, (year, 1), (year, 12)), repeat_factor=0.05),
+    }
+
+
+def measure(case, repeat):
+    """预热一次后计时 repeat 次，返回各次耗时（毫秒）"""
+    if case.setup:
+        case.setup()
+    case.func()
+    timings = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        case.func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "min_ms": round(ordered[0], 4),
+        "calls": len(ordered),
+    }
+
+
+def prepare_database(spec, scale, data_dir, workdir):
+    """返回本次测试用的数据库路径；有 data_dir 时生成的数据库缓存在其中，每次复制一份使用"""
+    db_path = os.path.join(workdir, f"{scale}.db")
+    if not data_dir:
+        generate(db_path, spec)
+        return db_path
+    cached = os.path.join(data_dir, "{}_{}x{}x{}x{}_s{}_{}.db".format(
+        scale, spec.brands, spec.items_per_brand, spec.purchases_per_month, spec.years, spec.seed, spec.end_year))
+    if not os.path.exists(cached):
+        os.makedirs(data_dir, exist_ok=True)
+        generate(cached + ".tmp", spec)
+        os.replace(cached + ".tmp", cached)
+    shutil.copyfile(cached, db_path)
+    return db_path
+
+
+def run_scale(scale, repeat, data_dir, workdir):
+    spec = SCALES[scale]
+    start = time.perf_counter()
+    db_path = prepare_database(spec, scale, data_dir, workdir)
+    print(f"[{scale}] 数据准备 {time.perf_counter() - start:.1f} s", flush=True)
+
+    queries.DB_PATH = db_path
+    result_cache.configure(max_entries=0)
+    queries.invalidate_item_catalog()
+    ctx = dataset_context(db_path, spec)
+    results = {}
+    try:
+        for name, case in build_cases(ctx).items():
+            results[name] = summarize(measure(case, max(3, int(repeat * case.repeat_factor))))
+            print(f"  {name:<36}{results[name]['median_ms']:>10.3f} ms  p95 {results[name]['p95_ms']:>9.3f} ms",
+                  flush=True)
+    finally:
+        connection_manager.close_all()
+    conn = sqlite3.connect(db_path)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ("items", "purchases", "activities")}
+    conn.close()
+    return {"spec": spec._asdict(), "counts": counts, "cases": results}
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """打印与基准的对比，返回退化的 (规模, 用例) 列表"""
+    regressions = []
+    print(f"\n与基准比较（阈值 {threshold:.2f}x，最小差值 {min_delta_ms} ms）")
+    for scale, result in current["scales"].items():
+        base_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for name, stats in result["cases"].items():
+            base = base_cases.get(name)
+            if base is None:
+                print(f"  [{scale}] {name:<36}     新用例")
+                continue
+            ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+            regressed = ratio > threshold and stats["median_ms"] - base["median_ms"] > min_delta_ms
+            mark = "  退化" if regressed else ""
+            print(f"  [{scale}] {name:<36}{base['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms"
+                  f"  {ratio:5.2f}x{mark}")
+            if regressed:
+                regressions.append((scale, name))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库层查询基准")
+    parser.add_argument("--scales", default="small,medium", help=f"逗号分隔，可选 {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--data-dir", help="缓存生成的数据库，重复运行时不再重新生成")
+    parser.add_argument("--save", help="把结果保存为 JSON")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="中位数超过基准的倍数视为退化")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="差值小于该毫秒数时不算退化（过滤噪声）")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"未知规模: {', '.join(unknown)}")
+
+    current = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            current["scales"][scale] = run_scale(scale, args.repeat, args.data_dir, workdir)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} 个用例退化")
+            sys.exit(1)
+        print("\n未发现退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""商品搜索索引基准：大量商品时的建索引耗时和各类查询的单次耗时
+
+商品名由 GB2312 一级汉字随机组词生成，约七分之一的商品带有历史使用记录。
+用法：python -m benchmarks.bench_search [--items 50000] [--repeat 20]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.item_search import ItemSearchIndex, pinyin_initials
+
+
+def make_items(count, rng):
+    chars = [bytes([hi, lo]).decode("gb2312") for hi in range(0xB0, 0xD8) for lo in range(0xA1, 0xFF)
+             if not (hi == 0xD7 and lo > 0xF9)]
+    words = ["".join(rng.choice(chars) for _ in range(2)) for _ in range(max(count // 60, 50))]
+    return [(i, "".join(rng.choice(words) for _ in range(rng.randint(2, 3))),
+             rng.choice([6, 12, 24, 500]), rng.choice("箱瓶件"))
+            for i in range(1, count + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    items = make_items(args.items, rng)
+    start = time.perf_counter()
+    index = ItemSearchIndex(items)
+    index.set_usage({item_id: (rng.randint(1, 50), f"2024-{rng.randint(1, 12):02d}")
+                     for item_id in range(1, args.items + 1, 7)})
+    index.search("", limit=1)
+    print(f"{args.items} 个商品建索引: {time.perf_counter() - start:.2f} s")
+
+    name = items[len(items) // 2][1]
+    initials = pinyin_initials(name)
+    queries = {
+        "单字": name[0],
+        "两字": name[:2],
+        "完整品名": name,
+        "错一个字": name[:2] + "X" + name[3:],
+        "首字母两位": initials[:2],
+        "首字母全拼": initials,
+        "规格": "12",
+        "单位": "箱",
+    }
+    for label, query in queries.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query)
+        elapsed = (time.perf_counter() - start) / args.repeat * 1000
+        print(f"{label:<8} {query!r:<16} {len(results):>4} 条  {elapsed:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
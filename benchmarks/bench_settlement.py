@@ -0,0 +1,79 @@
+"""批量结算基准：200 个品牌 × 12 个月一次结算，对比逐个品牌月调用的耗时
+
+用法：python -m benchmarks.bench_settlement [--brands 200] [--purchases 200000] [--loop-sample 100]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import create_database
+from database.connection import connection_manager
+from database.settlement import settle, settle_brand_month
+import database.queries as queries
+from benchmarks.bench_connection import seed
+
+YEAR = 2024
+
+
+def seed_activities(db_path, brands):
+    """每个品牌每月写入一个总目标和一个单品活动"""
+    rng = random.Random(7)
+    conn = sqlite3.connect(db_path)
+    first_items = dict(conn.execute("SELECT brand_id, MIN(item_id) FROM items GROUP BY brand_id"))
+    rows = []
+    for brand_id in range(1, brands + 1):
+        for month in range(1, 13):
+            ym = f"{YEAR}-{month:02d}"
+            rows.append((brand_id, ym, 1, None, None, 0, 0, rng.uniform(1e4, 1e5), None, None))
+            rows.append((brand_id, ym, 0, first_items[brand_id], "特价", rng.random() < 0.5,
+                         rng.random() < 0.5, rng.randint(1, 20), 10.0, 8.0))
+    conn.executemany("""
+        INSERT INTO activities (brand_id, month, is_total_target, item_id, activity_type,
+                                need_total_target, need_item_target, target_value,
+                                original_price, discount_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--brands", type=int, default=200)
+    parser.add_argument("--purchases", type=int, default=200000)
+    parser.add_argument("--loop-sample", type=int, default=100, help="逐个品牌月调用时实际计时的样本数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "settlement.db")
+        create_database(db_path)
+        seed(db_path, args.purchases, brands=args.brands, items_per_brand=20)
+        seed_activities(db_path, args.brands)
+        queries.DB_PATH = db_path
+
+        start = time.perf_counter()
+        detail, summary = settle(range(1, args.brands + 1), (YEAR, 1), (YEAR, 12))
+        batch_seconds = time.perf_counter() - start
+
+        pairs = [(b, m) for b in range(1, args.brands + 1) for m in range(1, 13)]
+        sample = random.Random(1).sample(pairs, min(args.loop_sample, len(pairs)))
+        start = time.perf_counter()
+        for brand_id, month in sample:
+            settle_brand_month(brand_id, YEAR, month)
+        per_call = (time.perf_counter() - start) / len(sample)
+        connection_manager.close_all()
+
+    print(f"品牌月数: {len(pairs)}，活动行: {len(detail)}，汇总行: {len(summary)}")
+    print(f"批量结算: {batch_seconds * 1000:.1f} ms")
+    print(f"逐个品牌月: {per_call * 1000:.2f} ms/次，推算全部 {per_call * len(pairs):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
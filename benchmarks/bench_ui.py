@@ -0,0 +1,259 @@
+"""界面性能基准：无显示环境下（QT_QPA_PLATFORM=offscreen）驱动主要窗口，测量真实的界面响应时间
+
+在 benchmarks.datagen 生成的数据库上依次测量：
+  - AddBrandWindow：构造（含 load_brands）
+  - PurchaseDetailsWindow：构造、首次表格有数据、切换月份、滚动加载下一批（翻页）
+  - ActivityInfoWindow / ActivityCompletionWindow / ExpenseInfoWindow：构造、首次表格有数据
+“有数据”指窗口发出的后台加载请求已返回并渲染完成（load_future 为空）。每个窗口另做一轮 tracemalloc，
+记录 Python 堆的峰值；最后输出进程的峰值常驻内存。窗口弹出的消息框只记录不显示，避免阻塞。
+
+结果格式与 benchmarks.bench_queries 相同，可以 --save 保存并用 --baseline 比较。
+用法：python -m benchmarks.bench_ui [--scales small,medium] [--repeat 10] [--data-dir DIR]
+                                    [--save ui.json] [--baseline ui_baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+from benchmarks.datagen import SCALES
+from benchmarks.bench_queries import prepare_database, summarize, compare
+from database.connection import connection_manager
+import database.queries as queries
+from database import result_cache
+import models.brand as brand_model
+from models.brand import Brand
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+TIMEOUT = 60.0
+messages = []
+
+
+def silence_message_boxes():
+    """消息框在无显示环境下会阻塞事件循环，改为记录"""
+    for name in ("information", "warning", "critical"):
+        setattr(QMessageBox, name,
+                staticmethod(lambda parent, title, text, *args, name=name: messages.append((name, title, text))
+                             or QMessageBox.Ok))
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+
+
+def wait_until(app, predicate, timeout=TIMEOUT):
+    """处理事件直到 predicate() 为真，超时抛出 TimeoutError"""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待界面加载超时")
+        app.processEvents()
+        time.sleep(0.0005)
+
+
+def loaded(window):
+    return lambda: window.load_future is None
+
+
+def close_window(app, window):
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+
+class Scenario:
+    """一个窗口的测量：open 构造窗口并返回计时，extra 在已打开的窗口上做额外测量"""
+
+    def __init__(self, name, factory, populated=None, extra=None):
+        self.name = name
+        self.factory = factory
+        self.populated = populated
+        self.extra = extra
+
+    def open(self, app):
+        start = time.perf_counter()
+        window = self.factory()
+        constructed = time.perf_counter()
+        window.show()
+        if self.populated:
+            wait_until(app, self.populated(window))
+        ready = time.perf_counter()
+        return window, (constructed - start) * 1000, (ready - start) * 1000
+
+
+def purchase_extras(app, window, ctx, repeat):
+    """切换月份（在当月之后的两个月之间来回切换）和全年视图中滚动加载下一批的耗时"""
+    timings = {"切换月份": [], "翻页": []}
+    window.year_combo.setCurrentText(str(ctx["year"]))
+    wait_until(app, loaded(window))
+    months = [ctx["month"] % 12, (ctx["month"] + 1) % 12]  # 下拉框序号，与默认打开的当月不同
+    for i in range(repeat):
+        start = time.perf_counter()
+        window.month_combo.setCurrentIndex(months[i % 2])
+        wait_until(app, loaded(window))
+        timings["切换月份"].append((time.perf_counter() - start) * 1000)
+
+    window.month_combo.setCurrentIndex(window.month_combo.count() - 1)  # 全年
+    wait_until(app, loaded(window))
+    for _ in range(repeat):
+        if not window.model.canFetchMore():
+            break
+        rows = window.model.rowCount()
+        start = time.perf_counter()
+        window.model.fetchMore()
+        wait_until(app, lambda: window.model.rowCount() > rows and window.load_future is None)
+        timings["翻页"].append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def build_scenarios(ctx):
+    from ui.add_brand import AddBrandWindow
+    from ui.purchase_details import PurchaseDetailsWindow
+    from ui.activity_info import ActivityInfoWindow
+    from ui.activity_completion import ActivityCompletionWindow
+    from ui.expense_info import ExpenseInfoWindow
+
+    brand = Brand(ctx["brand_id"], ctx["brand_name"], None)
+    year, month = ctx["year"], ctx["month"]
+    return [
+        Scenario("AddBrandWindow", AddBrandWindow),
+        Scenario("PurchaseDetailsWindow", lambda: PurchaseDetailsWindow(brand), loaded, purchase_extras),
+        Scenario("ActivityInfoWindow", lambda: ActivityInfoWindow(brand, year, month), loaded),
+        Scenario("ActivityCompletionWindow", lambda: ActivityCompletionWindow(brand, year, month), loaded),
+        Scenario("ExpenseInfoWindow", lambda: ExpenseInfoWindow(brand, year, month), loaded),
+    ]
+
+
+def dataset_context(db_path):
+    """进货最多的品牌和当前年月（生成数据时最后一年设为今年，窗口默认打开当月）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        brand_id, brand_name = conn.execute("""
+            SELECT b.brand_id, b.brand_name FROM brands b JOIN purchases p ON p.brand_id = b.brand_id
+            GROUP BY b.brand_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()
+    finally:
+        conn.close()
+    today = date.today()
+    return {"brand_id": brand_id, "brand_name": brand_name, "year": today.year, "month": today.month}
+
+
+def run_scale(app, scale, repeat, data_dir, workdir):
+    spec = SCALES[scale]._replace(end_year=date.today().year)
+    start = time.perf_counter()
+    db_path = prepare_database(spec, scale, data_dir, workdir)
+    print(f"[{scale}] 数据准备 {time.perf_counter() - start:.1f} s", flush=True)
+    queries.DB_PATH = brand_model.DB_PATH = db_path
+    result_cache.clear()
+    queries.invalidate_item_catalog()
+    ctx = dataset_context(db_path)
+
+    cases = {}
+    memory = {}
+    for scenario in build_scenarios(ctx):
+        timings = {"构造": [], "首次有数据": []}
+        extra_timings = {}
+        for i in range(repeat + 1):  # 第一轮为预热
+            window, constructed, ready = scenario.open(app)
+            if i:
+                timings["构造"].append(constructed)
+                timings["首次有数据"].append(ready)
+            if scenario.extra and i == repeat:
+                extra_timings = scenario.extra(app, window, ctx, repeat)
+            close_window(app, window)
+
+        tracemalloc.start()
+        window, _, _ = scenario.open(app)
+        if scenario.extra:
+            scenario.extra(app, window, ctx, 2)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        close_window(app, window)
+        memory[scenario.name] = round(peak / 1024 / 1024, 2)
+
+        if not scenario.populated:
+            del timings["首次有数据"]
+        timings.update(extra_timings)
+        for label, values in timings.items():
+            if values:
+                name = f"{scenario.name}.{label}"
+                cases[name] = summarize(values)
+                print(f"  {name:<40}{cases[name]['median_ms']:>10.2f} ms  p95 {cases[name]['p95_ms']:>9.2f} ms",
+                      flush=True)
+        print(f"  {scenario.name + ' Python 堆峰值':<40}{memory[scenario.name]:>10.2f} MB", flush=True)
+    connection_manager.close_all()
+    return {"spec": spec._asdict(), "cases": cases, "python_peak_mb": memory}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)  # macOS 单位为字节，Linux 为 KB
+
+
+def main():
+    parser = argparse.ArgumentParser(description="界面性能基准（无显示环境）")
+    parser.add_argument("--scales", default="small,medium", help=f"逗号分隔，可选 {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--data-dir", help="缓存生成的数据库，重复运行时不再重新生成")
+    parser.add_argument("--save", help="把结果保存为 JSON")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="中位数超过基准的倍数视为退化")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="差值小于该毫秒数时不算退化（过滤噪声）")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"未知规模: {', '.join(unknown)}")
+
+    app = QApplication(sys.argv[:1])
+    silence_message_boxes()
+    current = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "qt_platform": app.platformName(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            current["scales"][scale] = run_scale(app, scale, args.repeat, args.data_dir, workdir)
+    current["meta"]["peak_rss_mb"] = peak_rss_mb()
+    print(f"\n进程峰值常驻内存: {current['meta']['peak_rss_mb']} MB")
+    if messages:
+        print(f"窗口弹出的消息（未显示）: {messages[:5]}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} 个用例退化")
+            sys.exit(1)
+        print("\n未发现退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""合成数据生成器：按品牌数、每品牌商品数、每月进货条数和历史年数生成可复现的测试数据库
+
+分布尽量接近真实账本：品牌规模和品牌内商品热度都服从 Zipf 分布（少数品牌、少数商品占大部分进货），
+每月进货量带季节波动（年底、年初备货多，年中少），单价围绕商品基准价小幅波动，进货数量右偏。
+每个品牌每月大多设有一个总目标和一个单品活动（表结构限制每月各一条）。
+同样的参数和随机种子总是生成同样的数据。
+
+用法：python -m benchmarks.datagen OUT.db [--brands 10] [--items-per-brand 200]
+                                          [--purchases-per-month 2000] [--years 2] [--seed 42]
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import create_database, backfill_monthly_agg, MONTHLY_AGG_INSERT_TRIGGER
+
+# 数据规模；purchases_per_month 为所有品牌合计的月均进货条数，end_year 年 12 月为最后一个月
+DataSpec = namedtuple("DataSpec", ["brands", "items_per_brand", "purchases_per_month", "years", "seed", "end_year"])
+DataSpec.__new__.__defaults__ = (42, 2024)
+
+# 基准测试使用的几档规模
+SCALES = {
+    "small": DataSpec(brands=5, items_per_brand=100, purchases_per_month=1000, years=1),
+    "medium": DataSpec(brands=20, items_per_brand=300, purchases_per_month=5000, years=2),
+    "large": DataSpec(brands=50, items_per_brand=500, purchases_per_month=20000, years=3),
+}
+
+BRAND_SKEW = 1.1
+ITEM_SKEW = 1.2
+UNITS = ("箱", "件", "瓶", "袋")
+SPECS = (6, 12, 24, 30, 48)
+BATCH_SIZE = 50000
+
+
+def zipf_cum_weights(count, skew):
+    """第 k 名的权重为 1 / k^skew，返回 random.choices 用的累计权重"""
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def season_factor(month):
+    """月度进货量系数：1 月、12 月约为 1.3 倍，6、7 月约为 0.7 倍"""
+    return 1 + 0.3 * math.cos((month - 1 + 0.5) / 12 * 2 * math.pi)
+
+
+def months_of(spec):
+    return [(year, month) for year in range(spec.end_year - spec.years + 1, spec.end_year + 1)
+            for month in range(1, 13)]
+
+
+def generate(db_path, spec):
+    """在 db_path 生成新数据库，返回 {表名: 行数}；db_path 已存在时先删除"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_database(db_path)
+    rng = random.Random(spec.seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany("INSERT INTO brands (brand_id, brand_name, created_at) VALUES (?, ?, ?)",
+                         [(b, f"品牌{b:03d}", f"{spec.end_year - spec.years + 1}-01-01 00:00:00")
+                          for b in range(1, spec.brands + 1)])
+
+        # 商品：brand_items[b] 按热度从高到低排列，附带基准单价
+        brand_items = {}
+        item_id = 0
+        item_rows = []
+        for brand_id in range(1, spec.brands + 1):
+            brand_items[brand_id] = []
+            for i in range(spec.items_per_brand):
+                item_id += 1
+                item_spec, unit = rng.choice(SPECS), rng.choice(UNITS)
+                base_price = round(rng.lognormvariate(math.log(60), 0.6), 2)
+                item_rows.append((item_id, f"商品{brand_id:03d}-{i:04d}", item_spec, unit, brand_id))
+                brand_items[brand_id].append((item_id, unit, base_price))
+        conn.executemany("INSERT INTO items (item_id, item_name, spec, unit, brand_id) VALUES (?, ?, ?, ?, ?)",
+                         item_rows)
+
+        # 进货：先去掉月度汇总触发器逐行写入，最后一次性回填汇总（与批量导入相同）
+        conn.execute("DROP TRIGGER IF EXISTS trg_purchases_agg_insert")
+        brand_ids = list(range(1, spec.brands + 1))
+        brand_weights = zipf_cum_weights(spec.brands, BRAND_SKEW)
+        item_weights = zipf_cum_weights(spec.items_per_brand, ITEM_SKEW)
+        batch = []
+        for year, month in months_of(spec):
+            count = round(spec.purchases_per_month * season_factor(month))
+            for brand_id in rng.choices(brand_ids, cum_weights=brand_weights, k=count):
+                item_id, unit, base_price = rng.choices(brand_items[brand_id], cum_weights=item_weights)[0]
+                quantity = max(1, int(rng.paretovariate(1.5) * 3))
+                unit_price = round(base_price * rng.uniform(0.9, 1.1), 2)
+                remarks = "赠品" if rng.random() < 0.03 else None
+                batch.append((item_id, brand_id, quantity, unit, unit_price, round(quantity * unit_price, 2),
+                              f"{year}-{month:02d}-{rng.randint(1, 28):02d}", remarks))
+                if len(batch) >= BATCH_SIZE:
+                    _insert_purchases(conn, batch)
+                    batch = []
+        if batch:
+            _insert_purchases(conn, batch)
+        backfill_monthly_agg(conn.cursor())
+        conn.execute(MONTHLY_AGG_INSERT_TRIGGER)
+
+        # 活动：约八成品牌月有总目标，约六成有一个单品活动（多为热门商品）
+        activity_rows = []
+        for brand_id in brand_ids:
+            for year, month in months_of(spec):
+                ym = f"{year}-{month:02d}"
+                if rng.random() < 0.8:
+                    activity_rows.append((brand_id, ym, 1, None, None, None, None,
+                                          round(rng.uniform(5e3, 5e4), -2), None, None))
+                if rng.random() < 0.6:
+                    item_id, _, base_price = rng.choices(brand_items[brand_id], cum_weights=item_weights)[0]
+                    activity_rows.append((brand_id, ym, 0, item_id, rng.choice(["特价", "满赠", "陈列"]),
+                                          rng.random() < 0.5, rng.random() < 0.7, rng.randint(5, 50),
+                                          base_price, round(base_price * rng.uniform(0.7, 0.95), 2)))
+        conn.executemany("""
+            INSERT INTO activities (brand_id, month, is_total_target, item_id, activity_type,
+                                    need_total_target, need_item_target, target_value,
+                                    original_price, discount_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, activity_rows)
+        conn.commit()
+        conn.execute("ANALYZE")
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("brands", "items", "purchases", "activities", "purchase_monthly_agg")}
+    finally:
+        conn.close()
+
+
+def _insert_purchases(conn, rows):
+    conn.executemany(
+        "INSERT INTO purchases (item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成测试数据库")
+    parser.add_argument("output", help="输出的数据库文件（已存在时覆盖）")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="使用预设规模，其余规模参数被忽略")
+    parser.add_argument("--brands", type=int, default=10)
+    parser.add_argument("--items-per-brand", type=int, default=200)
+    parser.add_argument("--purchases-per-month", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    spec = SCALES[args.scale]._replace(seed=args.seed) if args.scale else DataSpec(
+        args.brands, args.items_per_brand, args.purchases_per_month, args.years, args.seed)
+    start = time.perf_counter()
+    counts = generate(args.output, spec)
+    print(f"{spec}\n生成完成，用时 {time.perf_counter() - start:.1f} s")
+    for table, count in counts.items():
+        print(f"  {table:<22}{count:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""检查进货相关的热点查询是否走索引
+
+通过 set_trace_callback 捕获各查询函数实际执行的 SQL，再逐条 EXPLAIN QUERY PLAN。
+访问 purchases 的步骤必须使用 idx_purchases_brand_date，访问 purchase_monthly_agg 的步骤
+必须使用其主键，否则以非零状态退出。
+
+用法：python -m benchmarks.query_plans
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import create_database
+from database.connection import connection_manager
+import database.queries as queries
+from database import result_cache
+from database.period import month_range
+from benchmarks.bench_connection import seed
+
+# 表名（或别名）-> 计划步骤中应出现的索引
+EXPECTED_ACCESS = {
+    "purchases": "idx_purchases_brand_date",
+    "p": "idx_purchases_brand_date",
+    "purchase_monthly_agg": "PRIMARY KEY",
+}
+
+# 需要检查的热点查询：名称 -> 调用方式
+HOT_QUERIES = {
+    "get_purchases_by_brand": lambda: queries.get_purchases_by_brand(1, 2, 20, 2024, 6),
+    "get_purchases_page(after)": lambda: queries.get_purchases_page(
+        1, 2024, 6, 20, after=queries.encode_page_cursor("2024-06-15", 0)),
+    "get_purchases_page(before)": lambda: queries.get_purchases_page(
+        1, 2024, 6, 20, before=queries.encode_page_cursor("2024-06-15", 0)),
+    "get_purchase_totals": lambda: queries.get_purchase_totals(1, 2024, 6),
+    "get_purchase_totals(item)": lambda: queries.get_purchase_totals(1, 2024, 6, item_id=3),
+    "get_monthly_item_totals": lambda: queries.get_monthly_item_totals(1, 2024, 6),
+    "get_purchase_count": lambda: queries.get_purchase_count(1, 2024, 6),
+    "iter_purchases_for_export": lambda: list(queries.iter_purchases_for_export(1, *month_range(2024, 6))),
+}
+
+
+def capture_statements(conn, func):
+    """执行 func 并返回期间执行的 SQL（参数已展开）"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements
+            if "purchase" in sql and sql.lstrip().upper().startswith("SELECT")]
+
+
+def accessed_table(step):
+    """返回计划步骤读取的表名（或别名），不是表访问步骤时返回 None"""
+    words = step.split()
+    if len(words) > 1 and words[0] in ("SEARCH", "SCAN"):
+        return words[1]
+    return None
+
+
+def query_plan(conn, sql):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "plans.db")
+        create_database(db_path)
+        seed(db_path, 5000)
+        queries.DB_PATH = db_path
+        conn = queries.get_connection()
+        conn.execute("ANALYZE")
+
+        for name, func in HOT_QUERIES.items():
+            result_cache.clear()  # 清空结果缓存，确保每次都真正执行查询
+            statements = capture_statements(conn, func)
+            if not statements:
+                print(f"[FAIL] {name}: 未捕获到访问进货表的语句")
+                failures += 1
+                continue
+            for sql in statements:
+                plan = query_plan(conn, sql)
+                checked = [(step, EXPECTED_ACCESS[accessed_table(step)]) for step in plan
+                           if accessed_table(step) in EXPECTED_ACCESS]
+                ok = bool(checked) and all(index in step for step, index in checked)
+                failures += 0 if ok else 1
+                print(f"[{'OK' if ok else 'FAIL'}] {name}")
+                for step in plan:
+                    print(f"       {step}")
+        connection_manager.close_all()
+
+    if failures:
+        print(f"{failures} 条语句未使用预期索引")
+        sys.exit(1)
+    print("所有热点查询均使用预期索引")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""进程内的数据变更通知：写操作提交后发布变更，依赖这些数据的窗口按 (品牌, 月份) 订阅并重新加载
+
+变更分三类，月份为 'YYYY-MM'，None 表示品牌的所有月份（如删除品牌、批量导入）：
+    change_bus.purchases_changed(brand_id, ym, purchase_id)    进货记录增删改
+    change_bus.activities_changed(brand_id, ym, activity_id)   活动增删改
+    change_bus.items_changed(brand_id)                         商品增删
+单条记录的变更带上记录 ID（row_id），订阅者可以只读取这一行就地更新；批量变更的 row_id 为 None。
+订阅：
+    sub = change_bus.subscribe(self.on_data_changed, (change_bus.PURCHASES, change_bus.ACTIVITIES),
+                               brand_id, month_key(year, month))
+    sub.cancel()   # 窗口关闭时
+回调收到本轮匹配的变更列表（去重后）。发布的变更先暂存，由调度器在稍后统一分发：界面中由 ui.db_executor
+安装的调度器把分发排到 GUI 线程的下一轮事件循环，同一轮内的多次发布（批量操作）每个订阅者只回调一次；
+没有安装调度器时（命令行导入等）发布后立即分发。可以在任意线程发布。
+"""
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+PURCHASES = "purchases"
+ACTIVITIES = "activities"
+ITEMS = "items"
+
+Change = namedtuple("Change", ["kind", "brand_id", "ym", "row_id"], defaults=(None,))
+
+_lock = threading.Lock()
+_subscriptions = []
+_pending = set()
+_scheduled = False
+_scheduler = None
+
+
+class Subscription:
+    """一个订阅；brand_id/ym 为 None 时不按该项过滤"""
+
+    def __init__(self, callback, kinds, brand_id=None, ym=None):
+        self.callback = callback
+        self.kinds = frozenset(kinds)
+        self.brand_id = brand_id
+        self.ym = ym
+        self.active = True
+
+    def matches(self, change):
+        if change.kind not in self.kinds:
+            return False
+        if self.brand_id is not None and change.brand_id is not None and change.brand_id != self.brand_id:
+            return False
+        return self.ym is None or change.ym is None or change.ym == self.ym
+
+    def cancel(self):
+        self.active = False
+        with _lock:
+            if self in _subscriptions:
+                _subscriptions.remove(self)
+
+
+def subscribe(callback, kinds, brand_id=None, ym=None):
+    subscription = Subscription(callback, kinds, brand_id, ym)
+    with _lock:
+        _subscriptions.append(subscription)
+    return subscription
+
+
+def set_scheduler(scheduler):
+    """scheduler(flush) 负责稍后（在 GUI 线程）调用 flush；None 表示发布后立即分发"""
+    global _scheduler
+    _scheduler = scheduler
+
+
+def publish(change):
+    global _scheduled
+    with _lock:
+        _pending.add(change)
+        if _scheduled:
+            return
+        _scheduled = True
+        scheduler = _scheduler
+    if scheduler is None:
+        flush()
+    else:
+        scheduler(flush)
+
+
+def purchases_changed(brand_id, ym=None, purchase_id=None):
+    publish(Change(PURCHASES, brand_id, ym, purchase_id))
+
+
+def activities_changed(brand_id, ym=None, activity_id=None):
+    publish(Change(ACTIVITIES, brand_id, ym, activity_id))
+
+
+def items_changed(brand_id):
+    publish(Change(ITEMS, brand_id, None))
+
+
+def flush():
+    """把暂存的变更分发给订阅者，每个订阅者最多回调一次"""
+    global _pending, _scheduled
+    with _lock:
+        changes, _pending = _pending, set()
+        _scheduled = False
+        subscriptions = list(_subscriptions)
+    if not changes:
+        return
+    for subscription in subscriptions:
+        matched = [change for change in changes if subscription.matches(change)]
+        if not matched or not subscription.active:
+            continue
+        try:
+            subscription.callback(matched)
+        except RuntimeError as e:  # 订阅的窗口已销毁但没有取消订阅
+            logger.debug("取消失效的变更订阅: %s", e)
+            subscription.cancel()
+        except Exception as e:
+            logger.exception("处理数据变更通知失败: %s", e)
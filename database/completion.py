@@ -0,0 +1,104 @@
+"""活动完成情况：一次分组查询得到某品牌某月所有活动的目标、实际销量、完成状态和返点
+
+活动完成情况窗口和支出情况窗口每次打开只需要一个品牌月，走这里的单条查询；
+跨品牌、跨月份的批量结算见 database.settlement，两者的返点规则保持一致。
+"""
+import sqlite3
+import logging
+from collections import namedtuple
+from database.queries import get_connection
+from database.period import month_key
+from database import result_cache
+
+logger = logging.getLogger(__name__)
+
+# 单个单品活动的计算结果
+ActivityCompletion = namedtuple("ActivityCompletion", [
+    "activity_id", "item_id", "item_name", "activity_type",
+    "need_total_target", "need_item_target", "target_value",
+    "actual_item_sales", "is_completed",
+    "initial_expense", "rebate", "actual_expense",
+])
+
+# 整个品牌月的计算结果
+CompletionResult = namedtuple("CompletionResult", ["total_target", "actual_total_sales", "activities"])
+
+# 以月度汇总表为基础，活动表、商品表左连接；totals 保证没有单品活动时也能返回一行总量数据
+COMPLETION_SQL = """
+    WITH month_items AS (
+        SELECT item_id, qty, amount
+        FROM purchase_monthly_agg
+        WHERE brand_id = :brand_id AND ym = :ym
+    ),
+    month_activities AS (
+        SELECT * FROM activities WHERE brand_id = :brand_id AND month = :ym
+    ),
+    totals AS (
+        SELECT (SELECT COALESCE(SUM(amount), 0) FROM month_items) AS actual_total_sales,
+               (SELECT COALESCE(MAX(target_value), 0) FROM month_activities
+                WHERE is_total_target = 1) AS total_target
+    ),
+    judged AS (
+        SELECT t.total_target, t.actual_total_sales,
+               a.activity_id, a.item_id, i.item_name, a.activity_type,
+               a.need_total_target, a.need_item_target, a.target_value,
+               COALESCE(a.original_price, 0) AS original_price,
+               COALESCE(a.discount_price, 0) AS discount_price,
+               COALESCE(i.spec, 1) AS spec,
+               COALESCE(mi.qty, 0) AS item_qty,
+               COALESCE(mi.amount, 0) AS item_amount,
+               CASE
+                   WHEN a.need_total_target AND t.actual_total_sales < t.total_target THEN 0
+                   WHEN a.need_item_target AND COALESCE(mi.qty, 0) < a.target_value THEN 0
+                   ELSE 1
+               END AS is_completed
+        FROM totals t
+        LEFT JOIN month_activities a ON a.is_total_target = 0
+        LEFT JOIN items i ON i.item_id = a.item_id
+        LEFT JOIN month_items mi ON mi.item_id = a.item_id
+    )
+    SELECT total_target, actual_total_sales, activity_id, item_id, item_name, activity_type,
+           need_total_target, need_item_target, target_value, item_qty, is_completed, item_amount,
+           CASE
+               WHEN is_completed AND original_price <> 0 AND discount_price <> 0
+               THEN (original_price - discount_price) * spec * item_qty
+               ELSE 0
+           END AS rebate
+    FROM judged
+    ORDER BY activity_id
+"""
+
+
+@result_cache.cached
+def compute_activity_completion(brand_id, year, month):
+    """计算某品牌某月的活动完成情况，查询次数与活动数量无关"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(COMPLETION_SQL, {"brand_id": brand_id, "ym": month_key(year, month)}).fetchall()
+    except sqlite3.Error as e:
+        logger.error("计算活动完成情况失败: %s", e)
+        raise
+    finally:
+        conn.close()
+
+    total_target, actual_total_sales = rows[0][0], round(rows[0][1], 2)
+    activities = []
+    for (_, _, activity_id, item_id, item_name, activity_type, need_total_target, need_item_target,
+         target_value, item_qty, is_completed, item_amount, rebate) in rows:
+        if activity_id is None:  # 当月没有单品活动
+            continue
+        initial_expense = round(float(item_amount), 2)
+        rebate = round(float(rebate), 2)
+        activities.append(ActivityCompletion(
+            activity_id, item_id, item_name, activity_type,
+            bool(need_total_target), bool(need_item_target), target_value,
+            item_qty, bool(is_completed),
+            initial_expense, rebate, round(initial_expense - rebate, 2),
+        ))
+    return CompletionResult(total_target, actual_total_sales, activities)
+
+
+def expense_summary(result):
+    """由活动完成情况得到支出情况：(原始支出, 优惠返点, 实际支出)，与 settlement 的品牌月汇总一致"""
+    rebate = round(sum(activity.rebate for activity in result.activities), 2)
+    return result.actual_total_sales, rebate, round(result.actual_total_sales - rebate, 2)
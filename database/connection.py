@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+import atexit
+from pathlib import Path
+from database import instrumentation
+
+# 每个连接只在创建时执行一次的 PRAGMA 设置
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",      # 约 16MB 页缓存
+    "PRAGMA mmap_size = 268435456",    # 256MB 内存映射
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+CACHED_STATEMENTS = 256
+
+
+class ManagedConnection(sqlite3.Connection):
+    """长连接：close() 只回滚未提交的事务，不真正关闭连接
+
+    旧代码在每个函数末尾都会调用 conn.close()，这里保留其“丢弃未提交修改”的语义，
+    连接本身由 ConnectionManager 统一关闭。
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+
+class InstrumentedConnection(ManagedConnection):
+    """开启查询统计（database.instrumentation.enable）后新建的连接，所有语句经计时游标执行"""
+
+    def cursor(self, factory=instrumentation.InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionManager:
+    """按线程、按数据库路径维护长连接，连接在首次使用时创建并完成调优"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def get_connection(self, db_path):
+        """返回当前线程对应 db_path 的连接，不存在时新建"""
+        db_path = str(Path(db_path))
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(db_path)
+        if conn is None:
+            conn = conns[db_path] = self._open(db_path)
+        return conn
+
+    def _open(self, db_path):
+        conn = sqlite3.connect(
+            db_path,
+            timeout=5.0,
+            factory=InstrumentedConnection if instrumentation.enabled else ManagedConnection,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False,  # 仅为了在退出时由主线程统一关闭
+        )
+        if instrumentation.enabled:
+            instrumentation.install(conn)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        try:
+            conn.really_close()
+        except sqlite3.Error:
+            pass
+
+    def close_thread_connections(self):
+        """关闭当前线程的所有连接（工作线程退出前调用）"""
+        conns = getattr(self._local, "conns", None) or {}
+        for conn in conns.values():
+            self._discard(conn)
+        self._local.conns = {}
+
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.really_close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+connection_manager = ConnectionManager()
+atexit.register(connection_manager.close_all)
@@ -21,10 +21,127 @@ BASE_DIR = Path(__file__).parent.parent  # 指向 stockflow/ 目录
 DB_DIR = BASE_DIR / "data"
 DB_PATH = DB_DIR / "stockflow.db"
 
-def create_database():
-    """创建 SQLite 数据库和表结构"""
-    DB_DIR.mkdir(parents=True, exist_ok=True)  # 自动创建 data 目录
-    conn = sqlite3.connect(DB_PATH)
+# 表结构版本，记录在 PRAGMA user_version 中；启动时版本一致即跳过表结构检查。
+# 等于 database.migrations.MIGRATIONS 中最后一个迁移的编号，修改表结构时新增迁移并同步递增
+SCHEMA_VERSION = 4
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def set_schema_version(conn, version=SCHEMA_VERSION):
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
+# 商品表和活动表的建表语句，{name} 为表名；表结构迁移（database.migrations）重建表时使用同一份定义
+ITEMS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_name TEXT NOT NULL,
+        spec INTEGER NOT NULL CHECK(spec > 0),  -- 修改：将 TEXT 改为 INTEGER，添加正整数约束
+        unit TEXT NOT NULL,
+        brand_id INTEGER NOT NULL,
+        UNIQUE(item_name, spec, unit, brand_id),  -- 更新 UNIQUE 约束，包含 unit 和 brand_id
+        FOREIGN KEY (brand_id) REFERENCES brands(brand_id) ON DELETE CASCADE
+    )
+"""
+
+ACTIVITIES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        brand_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        is_total_target BOOLEAN NOT NULL,
+        item_id INTEGER,
+        activity_type TEXT,
+        need_total_target BOOLEAN,
+        need_item_target BOOLEAN,
+        target_value REAL NOT NULL,
+        original_price REAL CHECK(original_price >= 0),  -- 新增：非负约束
+        discount_price REAL CHECK(discount_price >= 0),  -- 新增：非负约束
+        FOREIGN KEY (brand_id) REFERENCES brands(brand_id) ON DELETE CASCADE,
+        FOREIGN KEY (item_id) REFERENCES items(item_id)
+        UNIQUE(brand_id, month, is_total_target)  -- 新增：唯一约束
+    )
+"""
+
+# 新增进货时累加月度汇总；批量导入会在事务内临时移除它并按批更新汇总（见 utils.importer）
+MONTHLY_AGG_INSERT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS trg_purchases_agg_insert AFTER INSERT ON purchases
+    BEGIN
+        INSERT INTO purchase_monthly_agg (brand_id, item_id, ym, qty, amount, row_count)
+        VALUES (NEW.brand_id, NEW.item_id, substr(NEW.date, 1, 7), NEW.quantity, NEW.total_amount, 1)
+        ON CONFLICT (brand_id, ym, item_id) DO UPDATE SET
+            qty = qty + excluded.qty,
+            amount = amount + excluded.amount,
+            row_count = row_count + 1;
+    END
+"""
+
+# 进货月度汇总表：由 purchases 上的触发器实时维护，读取某月汇总时无需扫描明细
+MONTHLY_AGG_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS purchase_monthly_agg (
+        brand_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        ym TEXT NOT NULL,                      -- 'YYYY-MM'，与 activities.month 格式一致
+        qty INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (brand_id, ym, item_id)
+    ) WITHOUT ROWID
+    """,
+    MONTHLY_AGG_INSERT_TRIGGER,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_purchases_agg_delete AFTER DELETE ON purchases
+    BEGIN
+        UPDATE purchase_monthly_agg
+        SET qty = qty - OLD.quantity, amount = amount - OLD.total_amount, row_count = row_count - 1
+        WHERE brand_id = OLD.brand_id AND ym = substr(OLD.date, 1, 7) AND item_id = OLD.item_id;
+        DELETE FROM purchase_monthly_agg
+        WHERE brand_id = OLD.brand_id AND ym = substr(OLD.date, 1, 7) AND item_id = OLD.item_id
+              AND row_count <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_purchases_agg_update
+    AFTER UPDATE OF item_id, brand_id, quantity, total_amount, date ON purchases
+    BEGIN
+        UPDATE purchase_monthly_agg
+        SET qty = qty - OLD.quantity, amount = amount - OLD.total_amount, row_count = row_count - 1
+        WHERE brand_id = OLD.brand_id AND ym = substr(OLD.date, 1, 7) AND item_id = OLD.item_id;
+        DELETE FROM purchase_monthly_agg
+        WHERE brand_id = OLD.brand_id AND ym = substr(OLD.date, 1, 7) AND item_id = OLD.item_id
+              AND row_count <= 0;
+        INSERT INTO purchase_monthly_agg (brand_id, item_id, ym, qty, amount, row_count)
+        VALUES (NEW.brand_id, NEW.item_id, substr(NEW.date, 1, 7), NEW.quantity, NEW.total_amount, 1)
+        ON CONFLICT (brand_id, ym, item_id) DO UPDATE SET
+            qty = qty + excluded.qty,
+            amount = amount + excluded.amount,
+            row_count = row_count + 1;
+    END
+    """,
+)
+
+def create_monthly_agg(cursor):
+    """创建月度汇总表及其触发器（已存在时跳过）"""
+    for statement in MONTHLY_AGG_STATEMENTS:
+        cursor.execute(statement)
+
+def backfill_monthly_agg(cursor):
+    """根据现有进货明细重建月度汇总表"""
+    cursor.execute("DELETE FROM purchase_monthly_agg")
+    cursor.execute("""
+        INSERT INTO purchase_monthly_agg (brand_id, item_id, ym, qty, amount, row_count)
+        SELECT brand_id, item_id, substr(date, 1, 7), SUM(quantity), SUM(total_amount), COUNT(*)
+        FROM purchases
+        GROUP BY brand_id, item_id, substr(date, 1, 7)
+    """)
+
+def create_database(db_path=None):
+    """创建 SQLite 数据库和表结构（db_path 为空时使用默认路径）"""
+    if db_path is None:
+        DB_DIR.mkdir(parents=True, exist_ok=True)  # 自动创建 data 目录
+        db_path = DB_PATH
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     # 创建品牌表
@@ -37,17 +154,7 @@ def create_database():
     """)
 
     # 创建商品表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS items (
-            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_name TEXT NOT NULL,
-            spec INTEGER NOT NULL CHECK(spec > 0),  -- 修改：将 TEXT 改为 INTEGER，添加正整数约束
-            unit TEXT NOT NULL,
-            brand_id INTEGER NOT NULL,
-            UNIQUE(item_name, spec, unit, brand_id),  -- 更新 UNIQUE 约束，包含 unit 和 brand_id
-            FOREIGN KEY (brand_id) REFERENCES brands(brand_id) ON DELETE CASCADE
-        )
-    """)
+    cursor.execute(ITEMS_TABLE_SQL.format(name="items"))
 
     # 创建进货表
     cursor.execute("""
@@ -67,30 +174,18 @@ def create_database():
     """)
 
     # 创建活动表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS activities (
-            activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            brand_id INTEGER NOT NULL,
-            month TEXT NOT NULL,
-            is_total_target BOOLEAN NOT NULL,
-            item_id INTEGER,
-            activity_type TEXT,
-            need_total_target BOOLEAN,
-            need_item_target BOOLEAN,
-            target_value REAL NOT NULL,
-            original_price REAL CHECK(original_price >= 0),  -- 新增：非负约束
-            discount_price REAL CHECK(discount_price >= 0),  -- 新增：非负约束
-            FOREIGN KEY (brand_id) REFERENCES brands(brand_id) ON DELETE CASCADE,
-            FOREIGN KEY (item_id) REFERENCES items(item_id)
-            UNIQUE(brand_id, month, is_total_target)  -- 新增：唯一约束
-        )
-    """)
+    cursor.execute(ACTIVITIES_TABLE_SQL.format(name="activities"))
 
     # 创建索引
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases(date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchases_brand ON purchases(brand_id)")
+    # 品牌+日期复合索引：按品牌查询某个日期区间时可直接走索引范围扫描（也覆盖仅按品牌过滤的查询）
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchases_brand_date ON purchases(brand_id, date)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_activities_month ON activities(month)")
 
+    # 创建进货月度汇总表和触发器
+    create_monthly_agg(cursor)
+    set_schema_version(conn)
+
     conn.commit()
     conn.close()
 
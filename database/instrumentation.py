@@ -0,0 +1,313 @@
+"""查询统计：按语句记录执行次数和耗时分布，超过阈值的慢查询连同 EXPLAIN QUERY PLAN 写入日志
+
+默认关闭，关闭时没有任何开销。启动时调用 enable()（main.py 的 --trace-queries 或环境变量
+STOCKFLOW_TRACE_QUERIES=1）后，connection_manager 新建的连接改用 InstrumentedConnection：
+  - cursor()/execute() 返回的游标对 execute/executemany 以及随后的 fetch 计时，
+    一条语句的耗时 = 执行 + 读取结果，在结果读完、游标再次执行或被回收时记为一次；
+  - set_trace_callback 统计不经过游标的事务语句（BEGIN/COMMIT 等），以及每条语句执行期间
+    触发器内部执行的语句数（sqlite3 对触发器内的语句回调的是外层语句的文本，只能计数）。
+每条记录归属到调用它的函数（如 database.queries.get_purchases_page）和来源：
+数据库执行器中为发起请求的窗口类名（见 ui.db_executor），GUI 线程直接调用时为 database 包之外的调用方。
+
+summary() 返回按总耗时排序的统计，ui.diagnostics 的诊断对话框显示它；enable(dump_path=...) 时退出前写出 JSON。
+"""
+import atexit
+import bisect
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("stockflow.slow_query")
+
+DEFAULT_SLOW_MS = 50.0
+# 耗时直方图各桶的上界（毫秒），最后一桶为无穷大
+BUCKET_BOUNDS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf"))
+SLOW_QUERY_KEEP = 200
+
+# 计时时跳过的模块：调用方归属到第一个不在其中的栈帧
+_INTERNAL_MODULES = {__name__, "database.connection", "sqlite3", "sqlite3.dbapi2", "contextlib"}
+
+enabled = False
+_slow_ms = DEFAULT_SLOW_MS
+_lock = threading.Lock()
+_stats = {}             # (调用函数, 来源, SQL) -> StatementStats
+_implicit = {}          # 不经过游标的语句（首个关键字）-> 次数
+_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+_started_at = None
+_local = threading.local()
+
+
+class StatementStats:
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "nested", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.nested = 0
+        self.buckets = [0] * len(BUCKET_BOUNDS_MS)
+
+    def add(self, elapsed_ms, rows, nested):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.rows += rows
+        self.nested += nested
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+
+    def percentile(self, fraction):
+        """按直方图估算分位数，返回所在桶的上界（最后一桶返回最大值）"""
+        target = self.count * fraction
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+def normalize_sql(sql):
+    """合并空白，同一语句的不同写法（缩进、换行）归为一条"""
+    return " ".join(sql.split())
+
+
+@contextmanager
+def query_context(label):
+    """在此范围内执行的查询归属到 label（通常是发起请求的窗口类名）"""
+    stack = getattr(_local, "context", None)
+    if stack is None:
+        stack = _local.context = []
+    stack.append(label)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def _attribution():
+    """返回 (调用函数, 来源)"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") in _INTERNAL_MODULES:
+        frame = frame.f_back
+    function = origin = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        name = f"{module}.{getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)}"
+        if function is None:
+            function = name
+        if not module.startswith("database."):
+            origin = name
+            break
+        frame = frame.f_back
+    stack = getattr(_local, "context", None)
+    if stack and stack[-1]:
+        origin = stack[-1]
+    return function or "?", origin or "?"
+
+
+def _explain(conn, sql, params):
+    """在同一连接上取查询计划；语句不支持 EXPLAIN 时返回空列表"""
+    try:
+        cursor = sqlite3.Connection.cursor(conn)  # 原始游标，不计入统计
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        return [row[3] for row in rows]
+    except (sqlite3.Error, ValueError):
+        return []
+
+
+def record(conn, sql, params, elapsed_ms, rows, nested, function, origin):
+    key = (function, origin, normalize_sql(sql))
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats()
+        stats.add(elapsed_ms, rows, nested)
+    if elapsed_ms >= _slow_ms:
+        plan = _explain(conn, sql, params)
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_ms": round(elapsed_ms, 3),
+            "function": function,
+            "origin": origin,
+            "sql": key[2],
+            "params": [repr(p) for p in (params or ())][:20],
+            "rows": rows,
+            "plan": plan,
+        }
+        with _lock:
+            _slow_queries.append(entry)
+        slow_logger.warning("慢查询 %.1f ms（%s，来源 %s，%s 行）: %s\n  查询计划: %s",
+                            elapsed_ms, function, origin, rows, key[2], " | ".join(plan) or "无")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """对执行和读取结果计时的游标，一条语句的结果读完后记为一次"""
+
+    _pending = None   # [sql, params, 累计耗时(ms), 行数, 触发器内语句数, 调用函数, 来源]
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            record(self.connection, *pending)
+
+    def _start(self, sql, params, run, executions=1):
+        self._finish()
+        function, origin = _attribution()
+        _local.in_cursor = True
+        _local.steps = 0
+        start = time.perf_counter()
+        try:
+            result = run()
+        finally:
+            _local.in_cursor = False
+            elapsed = (time.perf_counter() - start) * 1000
+            nested = max(_local.steps - executions, 0)
+            self._pending = [sql, params, elapsed, 0, nested, function, origin]
+        if self.description is None:  # 非 SELECT：执行完即结束
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return result
+
+    def execute(self, sql, parameters=()):
+        return self._start(sql, parameters, lambda: super(InstrumentedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        first = seq_of_parameters[0] if seq_of_parameters else ()
+        return self._start(sql, first,
+                           lambda: super(InstrumentedCursor, self).executemany(sql, seq_of_parameters),
+                           executions=len(seq_of_parameters))
+
+    def _timed_fetch(self, fetch, done):
+        start = time.perf_counter()
+        result = fetch()
+        pending = self._pending
+        if pending is not None:
+            pending[2] += (time.perf_counter() - start) * 1000
+            pending[3] += len(result) if isinstance(result, list) else int(result is not None)
+            if done(result):
+                self._finish()
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone, lambda row: row is None)
+
+    def fetchmany(self, size=None):
+        fetch = super().fetchmany
+        return self._timed_fetch(lambda: fetch(self.arraysize if size is None else size), lambda rows: not rows)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall, lambda rows: True)
+
+    def __next__(self):
+        row = self._timed_fetch(lambda: sqlite3.Cursor.fetchone(self), lambda row: row is None)
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+_TRANSACTION_KEYWORDS = {"BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "END"}
+
+
+def _trace(sql):
+    """set_trace_callback：游标执行期间只计数（含触发器内的语句），其余按首个关键字统计"""
+    words = sql.split(None, 1)
+    keyword = words[0].upper() if words else "?"
+    if getattr(_local, "in_cursor", False) and keyword not in _TRANSACTION_KEYWORDS:
+        _local.steps += 1
+        return
+    with _lock:
+        _implicit[keyword] = _implicit.get(keyword, 0) + 1
+
+
+def install(conn):
+    """新建连接时由 connection_manager 调用"""
+    conn.set_trace_callback(_trace)
+
+
+def enable(slow_ms=None, dump_path=None):
+    """开启统计（只影响之后新建的连接，应在首次访问数据库前调用）"""
+    global enabled, _slow_ms, _started_at
+    enabled = True
+    _slow_ms = DEFAULT_SLOW_MS if slow_ms is None else float(slow_ms)
+    _started_at = datetime.now().isoformat(timespec="seconds")
+    if dump_path:
+        atexit.register(_dump_quietly, dump_path)
+    logger.info("已开启查询统计，慢查询阈值 %.1f ms", _slow_ms)
+
+
+def slow_query_ms():
+    return _slow_ms
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _implicit.clear()
+        _slow_queries.clear()
+
+
+def summary(limit=None):
+    """统计汇总（可直接序列化为 JSON），statements 按总耗时从高到低排列"""
+    with _lock:
+        items = [(key, stats.count, stats.total_ms, stats.max_ms, stats.rows, stats.nested, list(stats.buckets),
+                  stats.percentile(0.5), stats.percentile(0.95)) for key, stats in _stats.items()]
+        implicit, slow = dict(_implicit), list(_slow_queries)
+    items.sort(key=lambda item: item[2], reverse=True)
+    statements = []
+    for (function, origin, sql), count, total_ms, max_ms, rows, nested, buckets, p50, p95 in items[:limit]:
+        statements.append({
+            "function": function,
+            "origin": origin,
+            "sql": sql,
+            "count": count,
+            "total_ms": round(total_ms, 3),
+            "mean_ms": round(total_ms / count, 3),
+            "p50_ms": round(p50, 3),
+            "p95_ms": round(p95, 3),
+            "max_ms": round(max_ms, 3),
+            "rows": rows,
+            "nested_statements": nested,
+            "histogram": {f"<={bound:g}ms" if bound != float("inf") else "更长": n
+                          for bound, n in zip(BUCKET_BOUNDS_MS, buckets) if n},
+        })
+    return {
+        "enabled": enabled,
+        "started_at": _started_at,
+        "slow_query_ms": _slow_ms,
+        "statements": statements,
+        "implicit_statements": implicit,
+        "slow_queries": slow,
+    }
+
+
+def dump(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, ensure_ascii=False, indent=2)
+
+
+def _dump_quietly(path):
+    try:
+        dump(path)
+    except OSError as e:
+        logger.error("写出查询统计失败: %s", e)
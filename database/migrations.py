@@ -0,0 +1,191 @@
+"""表结构迁移：按编号顺序执行，已执行到的版本记录在 PRAGMA user_version
+
+每个迁移在一个事务中完成（失败时整体回滚，版本号不变），需要改约束的表按 SQLite 推荐的方式重建：
+建新表 -> INSERT ... SELECT 一次性复制并在 SQL 中完成数据清洗 -> 删除旧表 -> 新表改名，不经过 Python 逐行处理。
+迁移自身是幂等的：先检查表结构，已经符合时跳过，因此旧版本程序升级过一半的数据库也能直接迁移。
+
+用法：python -m database.migrations [--db data/stockflow.db] [--dry-run]
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db_setup import (DB_PATH, SCHEMA_VERSION, ITEMS_TABLE_SQL, ACTIVITIES_TABLE_SQL,
+                               create_monthly_agg, backfill_monthly_agg, get_schema_version)
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple("Migration", ["version", "description", "apply"])
+
+
+def table_sql(conn, table):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row[0] if row and row[0] else ""
+
+
+def table_columns(conn, table):
+    return {row[1]: row for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def index_names(conn, table):
+    return {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table,))}
+
+
+def column_or(columns, name, default="NULL"):
+    """旧表缺少某列时 SELECT 中用默认值代替"""
+    return name if name in columns else default
+
+
+def rebuild_table(conn, table, create_sql, select_sql):
+    """建 {table}_new -> 复制 -> 删除旧表 -> 改名；返回复制的行数
+
+    迁移连接关闭了外键检查，改名后其他表对 table 的外键引用自然指向新表。
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {table}_new")
+    conn.execute(create_sql.format(name=f"{table}_new"))
+    copied = conn.execute(select_sql.format(target=f"{table}_new")).rowcount
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    return copied
+
+
+def migrate_items(conn):
+    """items：spec 改为正整数并加 CHECK 约束，补齐 unit、brand_id 列和唯一约束"""
+    columns = table_columns(conn, "items")
+    if (columns.get("spec", (None,) * 3)[2] == "INTEGER" and "CHECK(spec > 0)" in table_sql(conn, "items")
+            and "unit" in columns and "brand_id" in columns):
+        return "已是最新结构，跳过"
+    unit = column_or(columns, "unit")
+    brand_id = column_or(columns, "brand_id")
+    copied = rebuild_table(conn, "items", ITEMS_TABLE_SQL, f"""
+        INSERT INTO {{target}} (item_id, item_name, spec, unit, brand_id)
+        SELECT item_id, item_name,
+               CASE WHEN CAST(spec AS INTEGER) > 0 THEN CAST(spec AS INTEGER) ELSE 1 END,
+               COALESCE(NULLIF({unit}, ''), '件'),
+               COALESCE(NULLIF({brand_id}, 0), 1)
+        FROM items
+    """)
+    return f"重建 items，复制 {copied} 行"
+
+
+def migrate_activities(conn):
+    """activities：价格非负约束，(brand_id, month, is_total_target) 唯一约束，重复的总目标只保留最早一条"""
+    columns = table_columns(conn, "activities")
+    sql = table_sql(conn, "activities")
+    has_unique_total = ("unique_brand_month_total" in index_names(conn, "activities")
+                        or "UNIQUE(brand_id, month, is_total_target)" in sql)
+    if (all(name in columns for name in ("need_total_target", "need_item_target", "original_price", "discount_price"))
+            and "CHECK(original_price >= 0)" in sql and "CHECK(discount_price >= 0)" in sql and has_unique_total):
+        return "已是最新结构，跳过"
+    original_price = column_or(columns, "original_price")
+    discount_price = column_or(columns, "discount_price")
+    copied = rebuild_table(conn, "activities", ACTIVITIES_TABLE_SQL, f"""
+        INSERT OR IGNORE INTO {{target}} (
+            activity_id, brand_id, month, is_total_target, item_id, activity_type,
+            need_total_target, need_item_target, target_value, original_price, discount_price
+        )
+        SELECT activity_id, brand_id, month, is_total_target, {column_or(columns, "item_id")},
+               {column_or(columns, "activity_type")}, {column_or(columns, "need_total_target")},
+               {column_or(columns, "need_item_target")}, target_value,
+               CASE WHEN {original_price} > 0 THEN {original_price} END,
+               CASE WHEN {discount_price} > 0 THEN {discount_price} END
+        FROM activities
+        ORDER BY activity_id
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_month ON activities(month)")
+    return f"重建 activities，保留 {copied} 行"
+
+
+def migrate_purchase_indexes(conn):
+    """purchases：用 (brand_id, date) 复合索引替换单列品牌索引"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_purchases_brand_date ON purchases(brand_id, date)")
+    conn.execute("DROP INDEX IF EXISTS idx_purchases_brand")
+    return "索引已更新"
+
+
+def migrate_monthly_agg(conn):
+    """新增进货月度汇总表及触发器，首次创建时根据现有明细回填"""
+    exists = bool(table_sql(conn, "purchase_monthly_agg"))
+    cursor = conn.cursor()
+    create_monthly_agg(cursor)
+    if exists:
+        return "汇总表已存在，已确认触发器"
+    backfill_monthly_agg(cursor)
+    return f"已创建汇总表并回填 {cursor.rowcount} 行"
+
+
+MIGRATIONS = (
+    Migration(1, "items 表规格改为正整数约束", migrate_items),
+    Migration(2, "activities 表价格非负及总目标唯一约束", migrate_activities),
+    Migration(3, "purchases 表 (brand_id, date) 复合索引", migrate_purchase_indexes),
+    Migration(4, "进货月度汇总表", migrate_monthly_agg),
+)
+assert MIGRATIONS[-1].version == SCHEMA_VERSION, "新增迁移后请同步修改 db_setup.SCHEMA_VERSION"
+
+
+def pending_migrations(conn, target=SCHEMA_VERSION):
+    current = get_schema_version(conn)
+    return [m for m in MIGRATIONS if current < m.version <= target]
+
+
+def migrate(db_path=None, target=SCHEMA_VERSION, dry_run=False, progress=None):
+    """把数据库迁移到 target 版本，返回执行（dry_run 时为将要执行）的迁移列表
+
+    progress(序号, 总数, 迁移, 结果说明) 在每个迁移完成后回调；dry_run 时结果说明为 None。
+    """
+    conn = sqlite3.connect(db_path or DB_PATH, isolation_level=None)  # 手动管理事务
+    try:
+        conn.execute("PRAGMA foreign_keys = OFF")  # 重建表期间不能触发级联删除
+        conn.execute("PRAGMA cache_size = -64000")  # 建索引、分组回填时排序使用更大的缓存
+        conn.execute("PRAGMA temp_store = MEMORY")
+        pending = pending_migrations(conn, target)
+        for number, migration in enumerate(pending, 1):
+            if dry_run:
+                if progress:
+                    progress(number, len(pending), migration, None)
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = migration.apply(conn)
+                violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if violations:
+                    logger.warning("迁移 %s 后存在 %s 条外键不一致的记录", migration.version, len(violations))
+                conn.execute(f"PRAGMA user_version = {migration.version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                logger.exception("迁移 %s（%s）失败，已回滚", migration.version, migration.description)
+                raise
+            logger.info("迁移 %s（%s）：%s", migration.version, migration.description, result)
+            if progress:
+                progress(number, len(pending), migration, result)
+        return pending
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库表结构迁移")
+    parser.add_argument("--db", default=str(DB_PATH), help="数据库文件路径")
+    parser.add_argument("--target", type=int, default=SCHEMA_VERSION, help="迁移到的版本")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要执行的迁移")
+    args = parser.parse_args()
+
+    def report(number, total, migration, result):
+        status = "待执行" if result is None else result
+        print(f"[{number}/{total}] 版本 {migration.version} {migration.description}：{status}")
+
+    done = migrate(args.db, target=args.target, dry_run=args.dry_run, progress=report)
+    if not done:
+        print("数据库已是最新版本")
+
+
+if __name__ == "__main__":
+    main()
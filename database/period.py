@@ -0,0 +1,63 @@
+"""日期区间工具：把年月、季度或任意区间统一转换为可走索引的 date >= ? AND date < ? 条件
+
+purchases.date 以 'YYYY-MM-DD' 文本存储，按字符串比较即可得到正确的日期范围，
+而 strftime('%Y', date) 之类的写法会让 SQLite 无法使用索引。
+"""
+
+
+def _month_start(year, month):
+    return f"{int(year):04d}-{int(month):02d}-01"
+
+
+def _next_month(year, month):
+    year, month = int(year), int(month)
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_key(year, month):
+    """月份键 'YYYY-MM'，与 activities.month 和 purchase_monthly_agg.ym 一致"""
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def month_range(year, month):
+    """单月区间，返回 (起始日期, 结束日期)，左闭右开"""
+    return _month_start(year, month), _month_start(*_next_month(year, month))
+
+
+def span_range(start_year, start_month, end_year, end_month):
+    """连续多月区间（首尾月份均包含）"""
+    if (int(end_year), int(end_month)) < (int(start_year), int(start_month)):
+        raise ValueError("结束月份不能早于起始月份")
+    return _month_start(start_year, start_month), _month_start(*_next_month(end_year, end_month))
+
+
+def quarter_range(year, quarter):
+    """季度区间，quarter 取 1-4"""
+    quarter = int(quarter)
+    if not 1 <= quarter <= 4:
+        raise ValueError("季度必须在 1-4 之间")
+    first_month = (quarter - 1) * 3 + 1
+    return span_range(year, first_month, year, first_month + 2)
+
+
+def year_range(year):
+    """整年区间"""
+    return span_range(year, 1, year, 12)
+
+
+def period_predicate(start, end, column="date"):
+    """生成 SQL 片段和参数：column >= start AND column < end"""
+    return f"{column} >= ? AND {column} < ?", [start, end]
+
+
+def month_predicate(year, month, column="date"):
+    """单月条件的快捷写法"""
+    return period_predicate(*month_range(year, month), column=column)
+
+
+def iter_months(start_year, start_month, end_year, end_month):
+    """依次产生区间内的 (year, month)"""
+    year, month = int(start_year), int(start_month)
+    while (year, month) <= (int(end_year), int(end_month)):
+        yield year, month
+        year, month = _next_month(year, month)
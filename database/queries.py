@@ -2,25 +2,33 @@ import sqlite3
 import logging
 from datetime import datetime
 from pathlib import Path
-import os
 import traceback  # 添加此行
+import threading
+import json
+import base64
+from database.connection import connection_manager
+from database import result_cache, change_bus
+from database.period import month_predicate, month_range, year_range, month_key, period_predicate
 
 # 基于项目根目录定义数据目录
 BASE_DIR = Path(__file__).parent.parent  # 指向 stockflow/ 目录
 DB_DIR = BASE_DIR / "data"
 DB_PATH = DB_DIR / "stockflow.db"
 
-# 配置日志
-DB_DIR.mkdir(parents=True, exist_ok=True)  # 自动创建 data 目录
-logging.basicConfig(
-    filename=os.path.join(DB_DIR, 'debug.log'),
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+DB_DIR.mkdir(parents=True, exist_ok=True)  # 自动创建 data 目录；日志由 utils.logger.setup_logging 在启动时配置
+
+# 商品目录缓存：brand_id -> {item_id: (item_id, item_name, spec, unit)}，商品增删时就地修补；
+# 每次变化递增该品牌的版本号，界面层据此判断共享的下拉模型是否需要同步
+_item_catalog_cache = {}
+_item_catalog_versions = {}
+_item_catalog_lock = threading.Lock()
 
 def get_connection():
-    """获取数据库连接"""
-    return sqlite3.connect(DB_PATH)
+    """获取当前线程的长连接（由 connection_manager 统一创建和调优）"""
+    return connection_manager.get_connection(DB_PATH)
+
+result_cache.set_connection_provider(get_connection)
+
 def add_brand(brand_name):
     """添加品牌"""
     conn = get_connection()
@@ -32,6 +40,7 @@ def add_brand(brand_name):
             (brand_name, created_at)
         )
         conn.commit()
+        result_cache.bump()
         return cursor.lastrowid
     except sqlite3.IntegrityError as e:
         logging.error(f"添加品牌失败: {e}")
@@ -60,6 +69,11 @@ def delete_brand(brand_id):
     try:
         cursor.execute("DELETE FROM brands WHERE brand_id = ?", (brand_id,))
         conn.commit()
+        result_cache.bump()
+        invalidate_item_catalog(brand_id)
+        change_bus.purchases_changed(brand_id)
+        change_bus.activities_changed(brand_id)
+        change_bus.items_changed(brand_id)
     except sqlite3.Error as e:
         logging.error(f"删除品牌失败: {e}")
     finally:
@@ -84,7 +98,11 @@ def add_item(item_name, spec, unit, brand_id):
             (item_name, spec, unit, brand_id)
         )
         conn.commit()
-        return cursor.lastrowid
+        result_cache.bump()
+        item_id = cursor.lastrowid
+        catalog_add_item(brand_id, item_id, item_name, spec, unit)
+        change_bus.items_changed(brand_id)
+        return item_id
     except sqlite3.IntegrityError as e:
         logging.error(f"添加商品失败: {e}")
         cursor.execute(
@@ -115,6 +133,71 @@ def get_all_items(brand_id=None):
     finally:
         conn.close()
 
+def _bump_item_catalog_version(brand_id):
+    _item_catalog_versions[brand_id] = _item_catalog_versions.get(brand_id, 0) + 1
+
+def item_catalog_version(brand_id):
+    """品牌商品目录的版本号，目录每次变化后递增"""
+    with _item_catalog_lock:
+        return _item_catalog_versions.get(brand_id, 0)
+
+def get_item_catalog(brand_id):
+    """品牌的商品目录，返回 (版本号, [(item_id, item_name, spec, unit)])；已缓存时不访问数据库"""
+    with _item_catalog_lock:
+        items = _item_catalog_cache.get(brand_id)
+        if items is not None:
+            return _item_catalog_versions.get(brand_id, 0), list(items.values())
+        version = _item_catalog_versions.get(brand_id, 0)
+
+    rows = get_all_items(brand_id)
+    with _item_catalog_lock:
+        # 查询期间目录发生变化时不写入缓存，避免缓存旧数据
+        if _item_catalog_versions.get(brand_id, 0) == version:
+            _item_catalog_cache[brand_id] = {row[0]: tuple(row) for row in rows}
+    return version, rows
+
+def catalog_add_item(brand_id, item_id, item_name, spec, unit):
+    """商品写入 items 表并提交后调用，把新商品补入已缓存的目录"""
+    with _item_catalog_lock:
+        items = _item_catalog_cache.get(brand_id)
+        if items is not None:
+            if item_id in items:
+                return
+            items[item_id] = (item_id, item_name, int(spec), unit)
+        _bump_item_catalog_version(brand_id)
+
+def catalog_remove_item(brand_id, item_id):
+    """商品从 items 表删除并提交后调用"""
+    with _item_catalog_lock:
+        items = _item_catalog_cache.get(brand_id)
+        if items is not None:
+            items.pop(item_id, None)
+        _bump_item_catalog_version(brand_id)
+
+def invalidate_item_catalog(brand_id=None):
+    """批量写入商品后调用，丢弃品牌的目录缓存；brand_id 为空时全部丢弃"""
+    with _item_catalog_lock:
+        brand_ids = list(_item_catalog_cache) if brand_id is None else [brand_id]
+        for key in brand_ids:
+            _item_catalog_cache.pop(key, None)
+            _bump_item_catalog_version(key)
+
+@result_cache.cached
+def get_item_usage(brand_id):
+    """品牌各商品的进货次数和最近进货月份 {item_id: (次数, 'YYYY-MM')}，读取月度汇总表"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT item_id, SUM(row_count), MAX(ym) FROM purchase_monthly_agg WHERE brand_id = ? GROUP BY item_id",
+            (brand_id,)
+        ).fetchall()
+        return {item_id: (count, ym) for item_id, count, ym in rows}
+    except sqlite3.Error as e:
+        logging.error(f"获取商品使用情况失败: {e}")
+        return {}
+    finally:
+        conn.close()
+
 def add_purchase(item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks=None):
     """添加进货记录"""
     conn = get_connection()
@@ -139,6 +222,8 @@ def add_purchase(item_id, brand_id, quantity, unit, unit_price, total_amount, da
             (item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks)
         )
         conn.commit()
+        result_cache.bump()
+        change_bus.purchases_changed(brand_id, str(date)[:7], cursor.lastrowid)
         return cursor.lastrowid
     except (sqlite3.Error, ValueError) as e:
         logging.error(f"添加进货记录失败: {e}")
@@ -146,24 +231,42 @@ def add_purchase(item_id, brand_id, quantity, unit, unit_price, total_amount, da
     finally:
         conn.close()
 
+# 进货记录列表的列（ui.table_models.PURCHASE_FIELDS）：purchase_id, item_id, brand_id, quantity, unit,
+# unit_price, total_amount, date, remarks, item_name, spec
+PURCHASE_SELECT = """
+    SELECT p.purchase_id, p.item_id, p.brand_id, p.quantity, p.unit, p.unit_price,
+           p.total_amount, p.date, p.remarks, i.item_name, i.spec
+    FROM purchases p
+    JOIN items i ON p.item_id = i.item_id
+"""
+
+def get_purchases_by_ids(purchase_ids):
+    """按 ID 读取进货记录（写操作之后就地更新表格用），返回 {purchase_id: 行}，已删除的 ID 不在结果中"""
+    purchase_ids = list(purchase_ids)
+    if not purchase_ids:
+        return {}
+    conn = get_connection()
+    try:
+        placeholders = ", ".join("?" * len(purchase_ids))
+        rows = conn.execute(PURCHASE_SELECT + f" WHERE p.purchase_id IN ({placeholders})", purchase_ids).fetchall()
+        return {row[0]: row for row in rows}
+    finally:
+        conn.close()
+
+@result_cache.cached
 def get_purchases_by_brand(brand_id, page=1, per_page=20, year=None, month=None):
     """按品牌分页查询进货记录，可按年月过滤"""
     conn = get_connection()
     cursor = conn.cursor()
     try:
         offset = (page - 1) * per_page
-        query = """
-            SELECT p.purchase_id, p.item_id, p.brand_id, p.quantity, p.unit, p.unit_price, 
-                   p.total_amount, p.date, p.remarks, i.item_name, i.spec
-            FROM purchases p
-            JOIN items i ON p.item_id = i.item_id
-            WHERE p.brand_id = ?
-        """
+        query = PURCHASE_SELECT + " WHERE p.brand_id = ?"
         params = [brand_id]
         
         if year and month:
-            query += " AND strftime('%Y', p.date) = ? AND strftime('%m', p.date) = ?"
-            params.extend([str(year), f"{month:02d}"])
+            period_sql, period_params = month_predicate(year, month, "p.date")
+            query += f" AND {period_sql}"
+            params.extend(period_params)
         
         query += " ORDER BY p.date ASC LIMIT ? OFFSET ?"
         params.extend([per_page, offset])
@@ -171,14 +274,7 @@ def get_purchases_by_brand(brand_id, page=1, per_page=20, year=None, month=None)
         cursor.execute(query, params)
         purchases = cursor.fetchall()
         
-        count_query = "SELECT COUNT(*) FROM purchases WHERE brand_id = ?"
-        count_params = [brand_id]
-        if year and month:
-            count_query += " AND strftime('%Y', date) = ? AND strftime('%m', date) = ?"
-            count_params.extend([str(year), f"{month:02d}"])
-        
-        cursor.execute(count_query, count_params)
-        total_records = cursor.fetchone()[0]
+        total_records = get_purchase_count(brand_id, year, month)
         return purchases, total_records
     except sqlite3.Error as e:
         logging.error(f"查询进货记录失败: {e}")
@@ -186,6 +282,157 @@ def get_purchases_by_brand(brand_id, page=1, per_page=20, year=None, month=None)
     finally:
         conn.close()
 
+def encode_page_cursor(date, purchase_id):
+    """把 (date, purchase_id) 编码为不透明的翻页游标"""
+    raw = json.dumps([date, purchase_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_page_cursor(token):
+    """解析翻页游标，返回 (date, purchase_id)"""
+    try:
+        date, purchase_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return str(date), int(purchase_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"无效的翻页游标: {token}") from e
+
+@result_cache.cached
+def get_purchases_page(brand_id, year=None, month=None, per_page=20, after=None, before=None, last=False):
+    """按 (date, purchase_id) 键集分页查询进货记录
+
+    after/before 为上一次查询返回的游标，分别表示取其后/其前的一页；last=True 表示取最后一页。
+    返回 (记录列表, 总条数, 首行游标, 末行游标)，没有记录时两个游标均为 None。
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        query = PURCHASE_SELECT + " WHERE p.brand_id = ?"
+        params = [brand_id]
+        # 日期上下界；有游标时把游标日期并入边界，使索引范围直接从游标处开始
+        lower, lower_op, upper, upper_op = None, ">=", None, "<"
+        if year and month:
+            lower, upper = month_range(year, month)
+        elif year:
+            lower, upper = year_range(year)
+
+        backwards = before is not None or last
+        seek_sql, seek_params = "", []
+        if after is not None:
+            cursor_date, cursor_id = decode_page_cursor(after)
+            if lower is None or cursor_date > lower:
+                lower = cursor_date
+            seek_sql, seek_params = " AND (p.date, p.purchase_id) > (?, ?)", [cursor_date, cursor_id]
+        elif before is not None:
+            cursor_date, cursor_id = decode_page_cursor(before)
+            if upper is None or cursor_date < upper:
+                upper, upper_op = cursor_date, "<="
+            seek_sql, seek_params = " AND (p.date, p.purchase_id) < (?, ?)", [cursor_date, cursor_id]
+
+        if lower is not None:
+            query += f" AND p.date {lower_op} ?"
+            params.append(lower)
+        if upper is not None:
+            query += f" AND p.date {upper_op} ?"
+            params.append(upper)
+        query += seek_sql
+        params.extend(seek_params)
+
+        # 向前翻页时倒序取一页再反转，保证结果始终按时间正序
+        direction = "DESC" if backwards else "ASC"
+        query += f" ORDER BY p.date {direction}, p.purchase_id {direction} LIMIT ?"
+        params.append(per_page)
+
+        cursor.execute(query, params)
+        purchases = cursor.fetchall()
+        if backwards:
+            purchases.reverse()
+
+        total_records = get_purchase_count(brand_id, year, month)
+        if not purchases:
+            return purchases, total_records, None, None
+        first, last_row = purchases[0], purchases[-1]
+        return (purchases, total_records,
+                encode_page_cursor(first[7], first[0]), encode_page_cursor(last_row[7], last_row[0]))
+    except sqlite3.Error as e:
+        logging.error(f"查询进货记录失败: {e}")
+        return [], 0, None, None
+    finally:
+        conn.close()
+
+@result_cache.cached
+def get_purchase_count(brand_id, year=None, month=None):
+    """品牌（某年/某月）的进货记录总数，读取月度汇总表"""
+    query = "SELECT SUM(row_count) FROM purchase_monthly_agg WHERE brand_id = ?"
+    params = [brand_id]
+    if year and month:
+        query += " AND ym = ?"
+        params.append(month_key(year, month))
+    elif year:
+        query += " AND ym >= ? AND ym <= ?"
+        params.extend([month_key(year, 1), month_key(year, 12)])
+    conn = get_connection()
+    try:
+        return conn.execute(query, params).fetchone()[0] or 0
+    finally:
+        conn.close()
+
+@result_cache.cached
+def get_purchase_totals(brand_id, year, month, item_id=None):
+    """统计品牌某月的进货数量和金额（读取月度汇总表），可限定单个商品，返回 (数量, 金额)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        query = "SELECT SUM(qty), SUM(amount) FROM purchase_monthly_agg WHERE brand_id = ? AND ym = ?"
+        params = [brand_id, month_key(year, month)]
+        if item_id is not None:
+            query += " AND item_id = ?"
+            params.append(item_id)
+        cursor.execute(query, params)
+        quantity, amount = cursor.fetchone()
+        return quantity or 0, round(amount or 0, 2)
+    except sqlite3.Error as e:
+        logging.error(f"统计进货金额失败: {e}")
+        return 0, 0
+    finally:
+        conn.close()
+
+@result_cache.cached
+def get_monthly_item_totals(brand_id, year, month):
+    """品牌某月各商品的进货汇总，返回 {item_id: (数量, 金额)}"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT item_id, qty, amount FROM purchase_monthly_agg WHERE brand_id = ? AND ym = ?",
+            (brand_id, month_key(year, month))
+        ).fetchall()
+        return {item_id: (qty, round(amount, 2)) for item_id, qty, amount in rows}
+    except sqlite3.Error as e:
+        logging.error(f"统计商品月度进货失败: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def iter_purchases_for_export(brand_id, start, end, fetch_size=5000):
+    """按 [start, end) 日期区间逐批读取进货记录（账单导出用），按日期排序，内存占用与结果行数无关"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        period_sql, params = period_predicate(start, end, "p.date")
+        cursor.execute(f"""
+            SELECT p.date, i.item_name, i.spec, p.unit, p.quantity, p.unit_price, p.total_amount, p.remarks
+            FROM purchases p
+            JOIN items i ON p.item_id = i.item_id
+            WHERE p.brand_id = ? AND {period_sql}
+            ORDER BY p.date, p.purchase_id
+        """, [brand_id] + params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+        conn.close()
+
 def get_earliest_year():
     """获取最早的进货年份"""
     conn = get_connection()
@@ -200,6 +447,25 @@ def get_earliest_year():
     finally:
         conn.close()
 
+# 活动列表的列：activity_id, is_total_target, item_id, activity_type, need_total_target,
+# need_item_target, target_value, original_price, discount_price, item_name, spec, unit
+ACTIVITY_SELECT = """
+    SELECT a.activity_id, a.is_total_target, a.item_id, a.activity_type,
+           a.need_total_target, a.need_item_target, a.target_value,
+           a.original_price, a.discount_price, i.item_name, i.spec, i.unit
+    FROM activities a
+    LEFT JOIN items i ON a.item_id = i.item_id
+"""
+
+def get_activity(activity_id):
+    """按 ID 读取单个活动，列与 get_monthly_activities 相同，不存在时返回 None"""
+    conn = get_connection()
+    try:
+        return conn.execute(ACTIVITY_SELECT + " WHERE a.activity_id = ?", (activity_id,)).fetchone()
+    finally:
+        conn.close()
+
+@result_cache.cached
 def get_monthly_activities(brand_id, year, month):
     """获取指定月份的所有活动"""
     conn = get_connection()
@@ -207,12 +473,7 @@ def get_monthly_activities(brand_id, year, month):
     try:
         month_str = f"{year}-{month:02d}"
         
-        cursor.execute("""
-            SELECT a.activity_id, a.is_total_target, a.item_id, a.activity_type,
-                   a.need_total_target, a.need_item_target, a.target_value,
-                   a.original_price, a.discount_price, i.item_name, i.spec, i.unit
-            FROM activities a
-            LEFT JOIN items i ON a.item_id = i.item_id
+        cursor.execute(ACTIVITY_SELECT + """
             WHERE a.brand_id = ? AND a.month = ?
             ORDER BY a.is_total_target DESC, a.activity_id
         """, (brand_id, month_str))
@@ -233,7 +494,7 @@ def get_monthly_activities(brand_id, year, month):
 def add_activity(brand_id, month, is_total_target, item_id, activity_type=None, 
                need_total_target=None, need_item_target=None, target_value=0,
                original_price=None, discount_price=None):
-    """添加或更新活动记录"""
+    """添加或更新活动记录，返回活动 ID"""
     # --- 验证价格（已有修改，保持不变） ---
     if original_price is not None:
         try:
@@ -269,8 +530,10 @@ def add_activity(brand_id, month, is_total_target, item_id, activity_type=None,
                     WHERE activity_id = ?
                 """, (target_value, original_price, discount_price, existing[0]))
                 conn.commit()
+                result_cache.bump()
+                change_bus.activities_changed(brand_id, month, existing[0])
                 logging.debug(f"Updated total target for brand_id: {brand_id}, month: {month}")
-                return
+                return existing[0]
         # --- 结束新增代码 ---
 
         cursor.execute("""
@@ -285,7 +548,10 @@ def add_activity(brand_id, month, is_total_target, item_id, activity_type=None,
               original_price, discount_price))
         
         conn.commit()
+        result_cache.bump()
+        change_bus.activities_changed(brand_id, month, cursor.lastrowid)
         logging.debug(f"Inserted new activity for brand_id: {brand_id}, month: {month}")
+        return cursor.lastrowid
     except sqlite3.Error as e:
         logging.error(f"添加或更新活动失败: {e}")
         raise
@@ -293,20 +559,21 @@ def add_activity(brand_id, month, is_total_target, item_id, activity_type=None,
         conn.close()
 
 def delete_activity(activity_id):
-    """删除活动并清理未引用的商品"""
+    """删除活动并清理未引用的商品，成功返回 True"""
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        # 获取活动关联的 item_id
-        cursor.execute("SELECT item_id FROM activities WHERE activity_id = ?", (activity_id,))
-        item_id = cursor.fetchone()
+        # 获取活动关联的 item_id、brand_id 和月份
+        cursor.execute("SELECT item_id, brand_id, month FROM activities WHERE activity_id = ?", (activity_id,))
+        row = cursor.fetchone()
+        removed_item = None
         
         # 删除活动记录
         cursor.execute("DELETE FROM activities WHERE activity_id = ?", (activity_id,))
         
         # 如果活动关联了商品，检查是否需要删除该商品
-        if item_id and item_id[0]:
-            item_id = item_id[0]
+        if row and row[0]:
+            item_id = row[0]
             # 检查该商品是否仍被其他活动或进货记录引用
             cursor.execute("SELECT COUNT(*) FROM activities WHERE item_id = ?", (item_id,))
             activity_count = cursor.fetchone()[0]
@@ -316,28 +583,38 @@ def delete_activity(activity_id):
             # 如果商品未被任何记录引用，删除该商品
             if activity_count == 0 and purchase_count == 0:
                 cursor.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
+                removed_item = item_id
         
         conn.commit()
+        result_cache.bump()
+        if row:
+            change_bus.activities_changed(row[1], row[2], activity_id)
+        if removed_item:
+            catalog_remove_item(row[1], removed_item)
+            change_bus.items_changed(row[1])
+        return True
     except sqlite3.Error as e:
         logging.error(f"删除活动失败: {e}")
+        return False
     finally:
         conn.close()
 
 def delete_purchase(purchase_id):
-    """删除进货记录并清理未引用的商品"""
+    """删除进货记录并清理未引用的商品，成功返回 True"""
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        # 获取进货记录关联的 item_id
-        cursor.execute("SELECT item_id FROM purchases WHERE purchase_id = ?", (purchase_id,))
-        item_id = cursor.fetchone()
+        # 获取进货记录关联的 item_id、brand_id 和日期
+        cursor.execute("SELECT item_id, brand_id, date FROM purchases WHERE purchase_id = ?", (purchase_id,))
+        row = cursor.fetchone()
+        removed_item = None
         
         # 删除进货记录
         cursor.execute("DELETE FROM purchases WHERE purchase_id = ?", (purchase_id,))
         
         # 如果进货记录关联了商品，检查是否需要删除该商品
-        if item_id and item_id[0]:
-            item_id = item_id[0]
+        if row and row[0]:
+            item_id = row[0]
             # 检查该商品是否仍被其他活动或进货记录引用
             cursor.execute("SELECT COUNT(*) FROM activities WHERE item_id = ?", (item_id,))
             activity_count = cursor.fetchone()[0]
@@ -347,9 +624,18 @@ def delete_purchase(purchase_id):
             # 如果商品未被任何记录引用，删除该商品
             if activity_count == 0 and purchase_count == 0:
                 cursor.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
+                removed_item = item_id
         
         conn.commit()
+        result_cache.bump()
+        if row:
+            change_bus.purchases_changed(row[1], str(row[2])[:7], purchase_id)
+        if removed_item:
+            catalog_remove_item(row[1], removed_item)
+            change_bus.items_changed(row[1])
+        return True
     except sqlite3.Error as e:
         logging.error(f"删除进货记录失败: {e}")
+        return False
     finally:
         conn.close()
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""只读查询的结果缓存：按 (查询, 参数) 缓存最近使用的结果，数据库有写入时整体失效
+
+用 @cached 装饰 database.queries 等模块中的只读查询（品牌月份的进货分页、活动、月度汇总、结算）。
+每条缓存记录保存写入时的版本号，版本号变化后旧记录不再命中：
+  - 本进程的写操作（queries 中的增删改、进货对话框的保存、导入）提交后调用 bump()；
+  - 其他进程（或同一进程的其他连接）写入由 PRAGMA data_version 发现：每次查找缓存时
+    在当前线程的连接上读取，它与上次读到的值不同时同样递增版本号。
+缓存条数和缓存的总行数都有上限，超出时淘汰最久未使用的记录。上限可用环境变量
+STOCKFLOW_RESULT_CACHE_ENTRIES / STOCKFLOW_RESULT_CACHE_ROWS 设置，或在运行时调用 configure()；
+条数上限为 0 时关闭缓存。命中率等统计见 stats()（诊断对话框中显示）。
+"""
+import functools
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_ROWS = 200000
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name) or default)
+    except ValueError:
+        logger.warning("环境变量 %s 不是整数，使用默认值 %s", name, default)
+        return default
+
+
+_max_entries = _env_int("STOCKFLOW_RESULT_CACHE_ENTRIES", DEFAULT_MAX_ENTRIES)
+_max_rows = _env_int("STOCKFLOW_RESULT_CACHE_ROWS", DEFAULT_MAX_ROWS)
+_lock = threading.Lock()
+_entries = OrderedDict()   # (查询名, 参数) -> (版本号, 结果, 行数)，按最近使用排序
+_rows = 0                  # 所有缓存记录的行数之和
+_version = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_local = threading.local()
+_connection_provider = None
+
+
+def configure(max_entries=None, max_rows=None):
+    """调整上限（None 表示不变），立即按新上限淘汰"""
+    global _max_entries, _max_rows
+    with _lock:
+        if max_entries is not None:
+            _max_entries = max(int(max_entries), 0)
+        if max_rows is not None:
+            _max_rows = max(int(max_rows), 0)
+        _evict()
+
+
+def set_connection_provider(get_connection):
+    """指定检查 PRAGMA data_version 时使用的连接（database.queries.get_connection）"""
+    global _connection_provider
+    _connection_provider = get_connection
+
+
+def is_enabled():
+    return _max_entries > 0
+
+
+def current_version():
+    """当前的写入版本号（只反映已发现的写入，不检查 data_version）"""
+    with _lock:
+        return _version
+
+
+def bump():
+    """本进程写入数据库并提交后调用：之前缓存的结果全部失效"""
+    global _version
+    with _lock:
+        _version += 1
+        _stats["invalidations"] += 1
+
+
+def clear():
+    global _rows
+    with _lock:
+        _entries.clear()
+        _rows = 0
+
+
+def _check_data_version():
+    """其他连接提交过写入时递增版本号；当前线程第一次检查（或换了连接）时保守地视为有写入"""
+    if _connection_provider is None:
+        return
+    conn = _connection_provider()
+    try:
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error as e:
+        logger.warning("读取 data_version 失败: %s", e)
+        bump()
+        return
+    if getattr(_local, "conn", None) is not conn or _local.data_version != data_version:
+        _local.conn, _local.data_version = conn, data_version
+        bump()
+
+
+def _mutable(value):
+    """列表、字典、pandas DataFrame/Series 等可变容器（字符串和元组不算）"""
+    return hasattr(value, "copy") and hasattr(value, "__len__")
+
+
+def _weight(value):
+    """结果的大致行数，用于总行数上限"""
+    if isinstance(value, tuple) and any(_mutable(v) for v in value):
+        return sum(_weight(v) for v in value)
+    return len(value) + 1 if _mutable(value) else 1
+
+
+def _detach(value):
+    """复制结果的可变外层，调用方修改返回值不会影响缓存；行元组不可变，不复制"""
+    if isinstance(value, tuple):
+        if not any(_mutable(v) for v in value):
+            return value
+        items = [_detach(v) for v in value]
+        return type(value)._make(items) if hasattr(value, "_make") else tuple(items)
+    return value.copy() if _mutable(value) else value
+
+
+def _evict():
+    global _rows
+    while _entries and (len(_entries) > _max_entries or _rows > _max_rows):
+        _, (_, _, rows) = _entries.popitem(last=False)
+        _rows -= rows
+        _stats["evictions"] += 1
+
+
+def _lookup(key):
+    _check_data_version()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == _version:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return True, entry[1], _version
+        _stats["misses"] += 1
+        return False, None, _version
+
+
+def _store(key, value, version):
+    global _rows
+    rows = _weight(value)
+    with _lock:
+        # 查询期间有写入时不缓存，避免缓存旧数据；单个结果超过行数上限时也不缓存
+        if version != _version or rows > _max_rows:
+            return
+        old = _entries.pop(key, None)
+        if old is not None:
+            _rows -= old[2]
+        _entries[key] = (version, value, rows)
+        _rows += rows
+        _evict()
+
+
+def cached(func):
+    """缓存只读查询的结果；参数须可哈希，返回值的可变外层在存入和取出时各复制一次"""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _max_entries:
+            return func(*args, **kwargs)
+        key = (name, args, tuple(sorted(kwargs.items())))
+        hit, value, version = _lookup(key)
+        if hit:
+            return _detach(value)
+        value = func(*args, **kwargs)
+        _store(key, _detach(value), version)
+        return value
+
+    return wrapper
+
+
+def stats():
+    """命中、未命中、淘汰、失效次数以及当前条数、行数和上限"""
+    with _lock:
+        result = dict(_stats)
+        result.update(entries=len(_entries), rows=_rows, max_entries=_max_entries, max_rows=_max_rows,
+                      version=_version)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else 0.0
+    return result
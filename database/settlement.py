@@ -0,0 +1,136 @@
+"""返点结算：按品牌集合和月份区间批量计算活动完成情况、返点和实际支出
+
+只执行三条分组查询（品牌月总额、商品月汇总、活动），其余计算全部用 pandas/NumPy 向量化完成，
+用于月末批量结算；单个品牌月的窗口走 database.completion 的单条查询，两处的返点规则保持一致。
+"""
+import sqlite3
+import logging
+import numpy as np
+import pandas as pd
+from database.queries import get_connection
+from database.period import month_key
+from database import result_cache
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_COLUMNS = [
+    "brand_id", "ym", "activity_id", "item_id", "item_name", "activity_type",
+    "need_total_target", "need_item_target", "target_value",
+    "total_target", "actual_total_sales", "actual_item_sales", "is_completed",
+    "initial_expense", "rebate", "actual_expense",
+]
+SUMMARY_COLUMNS = ["brand_id", "ym", "total_target", "original_expense", "rebate", "actual_expense"]
+
+
+def _brand_filter(brand_ids, column="brand_id"):
+    """生成品牌过滤条件，brand_ids 为空表示全部品牌"""
+    if brand_ids is None:
+        return "", []
+    brand_ids = list(brand_ids)
+    return f" AND {column} IN ({', '.join('?' * len(brand_ids))})", brand_ids
+
+
+def _read_frames(brand_ids, first_ym, last_ym):
+    """读取结算所需的三张原始表"""
+    brand_sql, brand_params = _brand_filter(brand_ids)
+    activity_brand_sql, _ = _brand_filter(brand_ids, "a.brand_id")
+    conn = get_connection()
+    try:
+        brand_totals = pd.read_sql_query(f"""
+            SELECT brand_id, ym, SUM(amount) AS actual_total_sales
+            FROM purchase_monthly_agg
+            WHERE ym >= ? AND ym <= ?{brand_sql}
+            GROUP BY brand_id, ym
+        """, conn, params=[first_ym, last_ym] + brand_params)
+        item_totals = pd.read_sql_query(f"""
+            SELECT brand_id, ym, item_id, qty AS actual_item_sales, amount AS initial_expense
+            FROM purchase_monthly_agg
+            WHERE ym >= ? AND ym <= ?{brand_sql}
+        """, conn, params=[first_ym, last_ym] + brand_params)
+        activities = pd.read_sql_query(f"""
+            SELECT a.brand_id, a.month AS ym, a.activity_id, a.is_total_target, a.item_id,
+                   i.item_name, a.activity_type, a.need_total_target, a.need_item_target,
+                   a.target_value, a.original_price, a.discount_price, i.spec
+            FROM activities a
+            LEFT JOIN items i ON i.item_id = a.item_id
+            WHERE a.month >= ? AND a.month <= ?{activity_brand_sql}
+        """, conn, params=[first_ym, last_ym] + brand_params)
+    except sqlite3.Error as e:
+        logger.error("读取结算数据失败: %s", e)
+        raise
+    finally:
+        conn.close()
+    return brand_totals, item_totals, activities
+
+
+def settle(brand_ids=None, start=None, end=None):
+    """批量结算
+
+    brand_ids 为品牌 ID 集合（None 表示全部品牌），start/end 为 (年, 月)，首尾均包含，end 省略时只算 start 当月。
+    返回 (活动明细表, 品牌月汇总表) 两个 DataFrame，列分别见 ACTIVITY_COLUMNS 和 SUMMARY_COLUMNS。
+    """
+    end = end or start
+    first_ym, last_ym = month_key(*start), month_key(*end)
+    brand_totals, item_totals, activities = _read_frames(brand_ids, first_ym, last_ym)
+    # 活动的 item_id 全为 NULL 时 pandas 读成 object 列，统一为可空整数才能与汇总表合并
+    activities["item_id"] = pd.to_numeric(activities["item_id"]).astype("Int64")
+    item_totals["item_id"] = item_totals["item_id"].astype("Int64")
+
+    is_total = activities["is_total_target"].astype(bool)
+    total_targets = (activities[is_total].groupby(["brand_id", "ym"], as_index=False)["target_value"]
+                     .max().rename(columns={"target_value": "total_target"}))
+
+    detail = activities[~is_total].drop(columns="is_total_target")
+    detail = detail.merge(total_targets, on=["brand_id", "ym"], how="left")
+    detail = detail.merge(brand_totals, on=["brand_id", "ym"], how="left")
+    detail = detail.merge(item_totals, on=["brand_id", "ym", "item_id"], how="left")
+    detail = detail.fillna({
+        "total_target": 0.0, "actual_total_sales": 0.0, "actual_item_sales": 0,
+        "initial_expense": 0.0, "original_price": 0.0, "discount_price": 0.0, "spec": 1,
+    })
+
+    need_total = detail["need_total_target"].fillna(0).astype(bool).to_numpy()
+    need_item = detail["need_item_target"].fillna(0).astype(bool).to_numpy()
+    actual_total = detail["actual_total_sales"].to_numpy(dtype=float)
+    actual_item = detail["actual_item_sales"].to_numpy(dtype=float)
+    original_price = detail["original_price"].to_numpy(dtype=float)
+    discount_price = detail["discount_price"].to_numpy(dtype=float)
+
+    # 需总销量时要求品牌当月总额达标，需单品销量时要求单品数量达标
+    is_completed = ~((need_total & (actual_total < detail["total_target"].to_numpy(dtype=float))) |
+                     (need_item & (actual_item < detail["target_value"].to_numpy(dtype=float))))
+    # 已完成且设置了原价和优惠价时，返点 = (原价 - 优惠价) × 规格 × 实际单品数量
+    rebate = np.where(is_completed & (original_price != 0) & (discount_price != 0),
+                      (original_price - discount_price) * detail["spec"].to_numpy(dtype=float) * actual_item,
+                      0.0)
+
+    detail["need_total_target"] = need_total
+    detail["need_item_target"] = need_item
+    detail["actual_item_sales"] = detail["actual_item_sales"].astype("int64")
+    detail["is_completed"] = is_completed
+    detail["initial_expense"] = detail["initial_expense"].round(2)
+    detail["actual_total_sales"] = detail["actual_total_sales"].round(2)
+    detail["rebate"] = np.round(rebate, 2)
+    detail["actual_expense"] = (detail["initial_expense"] - detail["rebate"]).round(2)
+    detail = detail.sort_values(["brand_id", "ym", "activity_id"]).reset_index(drop=True)[ACTIVITY_COLUMNS]
+
+    # 品牌月汇总：有进货或有活动的品牌月都列出
+    rebates = detail.groupby(["brand_id", "ym"], as_index=False)["rebate"].sum()
+    keys = pd.concat([brand_totals[["brand_id", "ym"]], activities[["brand_id", "ym"]]]).drop_duplicates()
+    summary = (keys.merge(brand_totals, on=["brand_id", "ym"], how="left")
+               .merge(total_targets, on=["brand_id", "ym"], how="left")
+               .merge(rebates, on=["brand_id", "ym"], how="left")
+               .fillna({"actual_total_sales": 0.0, "total_target": 0.0, "rebate": 0.0})
+               .rename(columns={"actual_total_sales": "original_expense"}))
+    summary["original_expense"] = summary["original_expense"].round(2)
+    summary["rebate"] = summary["rebate"].round(2)
+    summary["actual_expense"] = (summary["original_expense"] - summary["rebate"]).round(2)
+    summary = summary.sort_values(["brand_id", "ym"]).reset_index(drop=True)[SUMMARY_COLUMNS]
+    return detail, summary
+
+
+@result_cache.cached
+def settle_brand_month(brand_id, year, month):
+    """单个品牌月的结算，返回 (活动明细表, 汇总行 Series 或 None)"""
+    detail, summary = settle([brand_id], (year, month))
+    return detail, (summary.iloc[0] if len(summary) else None)
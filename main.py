@@ -1,10 +1,52 @@
+import time
+_START = time.perf_counter()  # 启动计时起点，尽量早于其他导入
+
 import sys
 import os
 import sqlite3
-from PyQt5.QtWidgets import QApplication
-from ui.add_brand import AddBrandWindow
-from database.db_setup import create_database, DB_PATH
-from database.update_db import update_database_schema
+import argparse
+import logging
+from database.db_setup import create_database, DB_PATH, SCHEMA_VERSION, get_schema_version
+from utils.logger import setup_logging
+# 界面模块在 QApplication 创建前才导入；非首屏窗口（进货详情、导入导出、pandas 结算）在首次使用时加载
+
+
+class StartupProfiler:
+    """--profile-startup 模式：记录各阶段耗时，首屏绘制后打印并退出"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = [("导入 main 依赖", time.perf_counter())]
+
+    def mark(self, label):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter()))
+
+    def report(self):
+        previous = _START
+        lines = ["启动耗时："]
+        for label, moment in self.marks:
+            lines.append(f"  {(moment - previous) * 1000:8.1f} ms  {label}")
+            previous = moment
+        lines.append(f"  {(previous - _START) * 1000:8.1f} ms  合计（至首屏绘制）")
+        deferred = [name for name in ("pandas", "openpyxl", "ui.purchase_details", "utils.export", "utils.importer")
+                    if name in sys.modules]
+        lines.append(f"  已加载模块 {len(sys.modules)} 个；延迟加载的模块中提前加载的：{', '.join(deferred) or '无'}")
+        print("\n".join(lines), flush=True)
+
+
+def watch_first_paint(window, callback):
+    """窗口第一次绘制时回调一次"""
+    from PyQt5.QtCore import QObject, QEvent
+
+    class FirstPaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                obj.removeEventFilter(self)
+                callback()
+            return False
+
+    window.installEventFilter(FirstPaintFilter(window))  # 以窗口为父对象，随窗口销毁
 
 def get_base_path():
     """获取应用程序的基路径（打包后为 main.exe 所在目录）"""
@@ -25,45 +67,72 @@ def ensure_data_directory():
     return os.path.join(data_dir, "stockflow.db")
 
 def check_database_schema(db_path):
-    """检查数据库表结构是否与预期一致"""
-    expected_columns = {
-        'activities': ['activity_id', 'brand_id', 'month', 'is_total_target', 'item_id',
-                      'activity_type', 'need_total_target', 'need_item_target', 'target_value',
-                      'original_price', 'discount_price'],
-        'brands': ['brand_id', 'brand_name', 'created_at'],
-        'items': ['item_id', 'item_name', 'spec', 'unit', 'brand_id'],
-        'purchases': ['purchase_id', 'item_id', 'brand_id', 'quantity', 'unit', 'unit_price',
-                     'total_amount', 'date', 'remarks']
-    }
-    
+    """检查数据库表结构是否为最新版本
+
+    PRAGMA user_version 等于 SCHEMA_VERSION 时直接返回；否则按编号执行尚未执行的迁移。
+    """
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    for table, columns in expected_columns.items():
-        cursor.execute(f"PRAGMA table_info({table})")
-        existing_columns = [row[1] for row in cursor.fetchall()]
-        missing_columns = [col for col in columns if col not in existing_columns]
-        
-        if missing_columns:
-            conn.close()
-            update_database_schema()
-            break
-    
-    conn.close()
+    try:
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return
+    finally:
+        conn.close()
+
+    from database.update_db import update_database_schema
+    update_database_schema(db_path)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--log-level", default=None, help="DEBUG/INFO/WARNING/ERROR，默认读取 STOCKFLOW_LOG_LEVEL 或 INFO")
+    parser.add_argument("--profile-startup", action="store_true", help="打印启动各阶段耗时，首屏绘制后退出")
+    parser.add_argument("--trace-queries", action="store_true",
+                        help="统计各 SQL 语句的次数和耗时，退出时写入 data/query_stats.json（也可设置 STOCKFLOW_TRACE_QUERIES=1）")
+    parser.add_argument("--slow-query-ms", type=float, default=None, help="慢查询阈值（毫秒），默认 50")
+    args, qt_args = parser.parse_known_args()
+    profiler = StartupProfiler(args.profile_startup)
     try:
         # 动态获取 data 目录和数据库路径
         DB_PATH = ensure_data_directory()
+        setup_logging(args.log_level, os.path.join(os.path.dirname(DB_PATH), "debug.log"))
+        logging.getLogger(__name__).info("程序启动，数据库: %s", DB_PATH)
+        profiler.mark("日志初始化")
+        if args.trace_queries or os.environ.get("STOCKFLOW_TRACE_QUERIES") == "1":
+            from database import instrumentation
+            instrumentation.enable(args.slow_query_ms, os.path.join(os.path.dirname(DB_PATH), "query_stats.json"))
+        if os.environ.get("STOCKFLOW_PROFILE") == "1":
+            import atexit
+            from utils import profiler as sampling_profiler
+            interval_ms = float(os.environ.get("STOCKFLOW_PROFILE_INTERVAL_MS") or sampling_profiler.DEFAULT_INTERVAL * 1000)
+            sampling_profiler.start_profiling(interval_ms / 1000)
+            atexit.register(sampling_profiler.stop_profiling, os.path.dirname(DB_PATH))
         
         # 确保数据库文件存在并创建
         if not os.path.exists(DB_PATH):
             create_database()
         else:
             check_database_schema(DB_PATH)
-        
-        app = QApplication(sys.argv)
+        profiler.mark("数据库检查")
+
+        from PyQt5.QtWidgets import QApplication
+        from ui.add_brand import AddBrandWindow
+        from ui.db_executor import db_executor
+        profiler.mark("导入界面模块")
+
+        app = QApplication(sys.argv[:1] + qt_args)
+        app.aboutToQuit.connect(db_executor.shutdown)  # 退出前让数据库线程执行完已排队的任务
+        if not args.profile_startup:
+            from utils import ui_metrics
+            metrics_path = os.path.join(os.path.dirname(DB_PATH), "ui_metrics.json")
+            app.aboutToQuit.connect(lambda: ui_metrics.save_quietly(metrics_path))  # 各操作耗时累加到文件
+        profiler.mark("创建 QApplication")
         window = AddBrandWindow()
+        profiler.mark("构建 AddBrandWindow")
+        if args.profile_startup:
+            def on_first_paint():
+                profiler.mark("首屏绘制")
+                profiler.report()
+                app.quit()
+            watch_first_paint(window, on_first_paint)
         window.show()
         sys.exit(app.exec_())
     except RuntimeError as e:
@@ -71,4 +140,4 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         print(f"未知错误: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
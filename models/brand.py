@@ -1,6 +1,8 @@
 import sqlite3
 from datetime import datetime
 from database.db_setup import get_db_path
+from database.connection import connection_manager
+from database import result_cache, change_bus, queries
 DB_PATH = get_db_path()  # 动态获取路径
 
 class Brand:
@@ -21,8 +23,8 @@ class Brand:
             delete_brand(self.brand_id)
 
 def get_connection():
-    """获取数据库连接"""
-    return sqlite3.connect(DB_PATH)
+    """获取数据库连接（复用 connection_manager 的线程长连接）"""
+    return connection_manager.get_connection(DB_PATH)
 
 def add_brand(brand_name):
     """添加品牌"""
@@ -35,6 +37,7 @@ def add_brand(brand_name):
             (brand_name, created_at)
         )
         conn.commit()
+        result_cache.bump()
         return cursor.lastrowid
     except sqlite3.IntegrityError:
         return None
@@ -51,15 +54,8 @@ def get_all_brands():
     return brands
 
 def delete_brand(brand_id):
-    """删除品牌及其相关数据"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    # 先删除相关的进货记录
-    cursor.execute("DELETE FROM purchases WHERE brand_id = ?", (brand_id,))
-    # 再删除品牌
-    cursor.execute("DELETE FROM brands WHERE brand_id = ?", (brand_id,))
-    conn.commit()
-    conn.close()
+    """删除品牌及其相关数据：进货、活动、商品由外键级联删除，缓存失效和变更通知与 database.queries 一致"""
+    queries.delete_brand(brand_id)
 
 def add_item(item_name, spec):
     """添加商品"""
@@ -71,6 +67,7 @@ def add_item(item_name, spec):
             (item_name, spec)
         )
         conn.commit()
+        result_cache.bump()
         return cursor.lastrowid
     except sqlite3.IntegrityError:
         cursor.execute(
@@ -115,7 +112,9 @@ def add_purchase(item_id, brand_id, quantity, unit, unit_price, total_amount, da
         (item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks)
     )
     conn.commit()
+    result_cache.bump()
     purchase_id = cursor.lastrowid
+    change_bus.purchases_changed(brand_id, str(date)[:7], purchase_id)
     conn.close()
     return purchase_id
 
@@ -0,0 +1,84 @@
+"""批量结算（database.settlement）与单个品牌月查询（database.completion）的返点规则一致性"""
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database.queries as queries
+from database import result_cache
+from database.connection import connection_manager
+from database.db_setup import create_database
+from database.completion import compute_activity_completion, expense_summary
+from database.settlement import settle
+from benchmarks.bench_connection import seed
+
+
+def add_activities(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("""
+        INSERT INTO activities (brand_id, month, is_total_target, item_id, activity_type,
+                                need_total_target, need_item_target, target_value,
+                                original_price, discount_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "settlement.db")
+    create_database(path)
+    seed(path, 2000, brands=2, items_per_brand=10)
+    monkeypatch.setattr(queries, "DB_PATH", path)
+    result_cache.clear()
+    yield path
+    result_cache.clear()
+    connection_manager.close_all()
+
+
+def assert_matches_completion(brand_id, year, month):
+    detail, summary = settle([brand_id], (year, month))
+    result = compute_activity_completion(brand_id, year, month)
+    assert list(detail["activity_id"]) == [a.activity_id for a in result.activities]
+    assert list(detail["rebate"]) == [a.rebate for a in result.activities]
+    assert list(detail["is_completed"]) == [a.is_completed for a in result.activities]
+    row = summary.iloc[0]
+    assert (row["original_expense"], row["rebate"], row["actual_expense"]) == expense_summary(result)
+    return detail
+
+
+def test_activities_without_item(db_path):
+    # 范围内的单品活动都没有关联商品时 item_id 整列为 NULL
+    add_activities(db_path, [
+        (1, "2024-06", 1, None, None, 0, 0, 1000, None, None),
+        (1, "2024-06", 0, None, "特价", 1, 0, 0, 10.0, 8.0),
+    ])
+    detail = assert_matches_completion(1, 2024, 6)
+    assert detail["item_id"].isna().all()
+    assert list(detail["actual_item_sales"]) == [0]
+    assert list(detail["rebate"]) == [0.0]
+
+
+def test_batch_with_and_without_item(db_path):
+    add_activities(db_path, [
+        (1, "2024-06", 1, None, None, 0, 0, 1000, None, None),
+        (1, "2024-06", 0, 1, "特价", 1, 1, 5, 10.0, 8.0),
+        (1, "2024-07", 0, None, "满减", 0, 0, 0, None, None),
+        (2, "2024-06", 0, 11, "特价", 0, 1, 100000, 12.0, 9.0),
+    ])
+    detail, summary = settle(None, (2024, 6), (2024, 7))
+    assert len(detail) == 3 and detail["item_id"].isna().sum() == 1
+    assert detail["rebate"].iloc[0] > 0
+    for brand_id, month in ((1, 6), (1, 7), (2, 6)):
+        assert_matches_completion(brand_id, 2024, month)
+
+
+def test_month_without_activities(db_path):
+    detail, summary = settle([1], (2024, 6))
+    assert detail.empty
+    result = compute_activity_completion(1, 2024, 6)
+    assert (summary.iloc[0]["original_expense"], 0.0, summary.iloc[0]["actual_expense"]) == expense_summary(result)
@@ -1,36 +1,23 @@
 import sys
-import traceback
-from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                            QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, 
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
+                            QLineEdit, QPushButton, 
                             QHeaderView, QDialog, QFormLayout, QComboBox, QCheckBox, 
-                            QMessageBox, QStackedWidget, QRadioButton, QCompleter,QAbstractItemView)
-from PyQt5.QtGui import QDoubleValidator, QStandardItemModel, QStandardItem,QIntValidator
-from PyQt5.QtCore import Qt, QSortFilterProxyModel
-from database.queries import (get_monthly_activities, add_activity, delete_activity, 
-                             get_all_items, add_item)
-import os
-import datetime
+                            QMessageBox, QStackedWidget, QRadioButton, QCompleter,QAbstractItemView,
+                            QTableView)
+from PyQt5.QtGui import QDoubleValidator, QIntValidator
+from PyQt5.QtCore import Qt, QTimer
+import logging
 from database.queries import (
-    get_monthly_activities, add_activity, delete_activity, 
-    get_all_items, add_item, get_connection
+    get_monthly_activities, add_activity, delete_activity,
+    add_item, get_connection, get_activity
 )
 
-# 建议也为这个文件添加日志功能，方便调试
-def log_activity_debug(message):
-    try:
-        with open("activity_debug.log", "a", encoding="utf-8") as f:
-            f.write(f"[{datetime.datetime.now()}] {message}\n")
-    except:
-        pass # 日志失败不应影响主程序
-
-# 定义 log_debug 函数，复用 purchase_details.py 的逻辑
-LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug.log")
-def log_debug(message):
-    """记录调试信息到文件"""
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {message}\n")
+logger = logging.getLogger(__name__)
 
+from ui.db_executor import db_executor
+from ui.delegates import ButtonDelegate
+from ui.table_models import ActivityTableModel, estimate_column_widths
+from ui.item_catalog import item_catalog, ItemSearchProxyModel, SEARCH_DEBOUNCE_MS
 from ui.base_window import CenteredMainWindow  # 导入基类
 class ActivityInfoWindow(CenteredMainWindow):
     """活动信息管理窗口"""
@@ -40,6 +27,8 @@ class ActivityInfoWindow(CenteredMainWindow):
         self.brand = brand
         self.year = year
         self.month = month
+        self.load_future = None
+        self.pending_action = None  # 打开窗口的计时，由打开它的窗口设置（utils.ui_metrics）
         self.setWindowTitle(f"{brand.brand_name} - {year}年{month}月活动")
         self.resize(1600, 600)
         self.center_on_screen()  # 确保在调整大小后居中
@@ -64,13 +53,20 @@ class ActivityInfoWindow(CenteredMainWindow):
         # 单品活动区域
         item_group = QWidget()
         item_layout = QVBoxLayout(item_group)
-        self.activity_table = QTableWidget()
-        self.activity_table.setColumnCount(9)
-        self.activity_table.setHorizontalHeaderLabels([
-            "商品名称", "规格", "活动类型", "需总销量", "需单品销量", 
-            "目标值", "原价", "优惠价", "操作"
-        ])
+        self.status_label = QLabel("加载中...")
+        self.status_label.hide()
+        item_layout.addWidget(self.status_label)
+        self.activity_model = ActivityTableModel(self)
+        self.activity_table = QTableView()
+        self.activity_table.setModel(self.activity_model)
+        self.activity_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.activity_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.activity_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        # 删除按钮由委托绘制，不为每行创建 QPushButton
+        self.delete_delegate = ButtonDelegate(self.activity_table)
+        self.delete_delegate.clicked.connect(
+            lambda row: self.delete_activity(self.activity_model.activity_id_at(row)))
+        self.activity_table.setItemDelegateForColumn(ActivityTableModel.ACTION_COLUMN, self.delete_delegate)
         add_btn = QPushButton("添加单品活动")
         add_btn.clicked.connect(self.open_add_dialog)
         item_layout.addWidget(self.activity_table)
@@ -80,86 +76,46 @@ class ActivityInfoWindow(CenteredMainWindow):
         self.load_activities()
 
     def load_activities(self):
-        self.activity_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        """加载活动数据，防止重复和空行"""
-        activities = get_monthly_activities(self.brand.brand_id, self.year, self.month)
-        self.activity_table.setRowCount(0)
-        seen_items = set()  # 跟踪已添加的 item_id
-        if not activities:
-            self.activity_table.insertRow(0)
-            self.activity_table.setItem(0, 0, QTableWidgetItem("无数据"))
-            log_activity_debug(f"无活动数据 for brand: {self.brand.brand_name}, year: {self.year}, month: {self.month}")
-            return
-        
+        """在数据库线程中读取活动数据，结果返回前显示加载状态"""
+        if self.load_future is not None:
+            self.load_future.cancel()
+        self.status_label.setText("加载中...")
+        self.status_label.show()
+        self.activity_table.setEnabled(False)
+        self.load_future = db_executor.submit(
+            get_monthly_activities, self.brand.brand_id, self.year, self.month, parent=self
+        ).then(self.on_activities_loaded, self.on_activities_failed)
+
+    def on_activities_failed(self, error):
+        self.load_future = None
+        if self.pending_action is not None:
+            self.pending_action.cancel()
+            self.pending_action = None
+        self.status_label.hide()
+        self.activity_table.setEnabled(True)
+        QMessageBox.critical(self, "错误", f"加载活动数据失败: {str(error)}")
+
+    def on_activities_loaded(self, activities):
+        """渲染活动数据：总目标填入输入框，单品活动交给模型，列宽只计算一次"""
+        self.load_future = None
+        self.activity_table.setEnabled(True)
         for activity in activities:
-            row = self.activity_table.rowCount()
-            activity_id, is_total, item_id, activity_type, need_total, need_item, target_value, \
-            original_price, discount_price, item_name, spec, unit = activity
-            
-            if is_total:
-                self.total_target_input.setText(str(target_value))
-                continue
-                
-            # 防止重复添加
-            if item_id and item_id in seen_items:
-                continue
-            seen_items.add(item_id)
-            
-            self.activity_table.insertRow(row)
-
-            # 第0列: 商品名称
-            item0 = QTableWidgetItem(item_name or "")
-            item0.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 0, item0)
-
-            # 第1列: 规格
-            item1 = QTableWidgetItem(str(spec) if spec is not None else "")
-            item1.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 1, item1)
-
-            # 第2列: 活动类型
-            item2 = QTableWidgetItem(activity_type or "")
-            item2.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 2, item2)
-
-            # 第3列: 需总销量
-            item3 = QTableWidgetItem("是" if need_total else "否")
-            item3.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 3, item3)
-
-            # 第4列: 需单品销量
-            item4 = QTableWidgetItem("是" if need_item else "否")
-            item4.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 4, item4)
-
-            # 第5列: 目标值
-            item5 = QTableWidgetItem(str(target_value))
-            item5.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 5, item5)
-
-            # 第6列: 原价
-            item6 = QTableWidgetItem(str(original_price or ""))
-            item6.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 6, item6)
-
-            # 第7列: 优惠价
-            item7 = QTableWidgetItem(str(discount_price or ""))
-            item7.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 7, item7)
-            
-            # 第8列: 操作按钮
-            delete_btn = QPushButton("删除")
-            delete_btn.clicked.connect(lambda checked, aid=activity_id: self.delete_activity(aid))
-            self.activity_table.setCellWidget(row, 8, delete_btn)
-
-            # 列宽自适应
-            self.activity_table.resizeColumnsToContents()
-            font_metrics = self.activity_table.fontMetrics()
-            padding = font_metrics.horizontalAdvance('M') * 4
-            for col in range(self.activity_table.columnCount()):
-                current_width = self.activity_table.columnWidth(col)
-                self.activity_table.setColumnWidth(col, current_width + padding)
+            if activity[1]:
+                self.total_target_input.setText(str(activity[6]))
+        self.activity_model.reset_activities(activities)
+        if not self.activity_model.rowCount():
+            self.status_label.setText("无数据")
+            logger.debug("无活动数据 for brand: %s, year: %s, month: %s", self.brand.brand_name, self.year, self.month)
+        else:
+            self.status_label.hide()
 
+        padding = self.activity_table.fontMetrics().horizontalAdvance('M') * 4
+        widths = estimate_column_widths(self.activity_model, self.activity_table.fontMetrics(), padding=padding)
+        for col, width in enumerate(widths):
+            self.activity_table.setColumnWidth(col, width)
+        if self.pending_action is not None:
+            self.pending_action.finish(self.activity_table.viewport())
+            self.pending_action = None
 
     def save_total_target(self):
         """保存总销量目标"""
@@ -169,42 +125,36 @@ class ActivityInfoWindow(CenteredMainWindow):
                 raise ValueError("目标值必须大于0")
             add_activity(self.brand.brand_id, f"{self.year}-{self.month:02d}", True, None,
                         None, False, False, target_value, None, None)
+            # 已打开的活动完成情况、支出情况窗口通过 database.change_bus 的通知自动刷新
             QMessageBox.information(self, "成功", "总销量目标已保存")
-            # --- 修改代码：增强自动刷新 ---
-            # 通知父窗口中的 ActivityCompletionWindow 和 ExpenseInfoWindow 刷新
-            parent = self.parent()
-            if parent and hasattr(parent, 'completion_windows'):
-                key = (self.brand.brand_id, self.year, self.month)
-                if key in parent.completion_windows:
-                    try:
-                        parent.completion_windows[key].load_completion_data()
-                        log_activity_debug(f"自动刷新 ActivityCompletionWindow for brand: {self.brand.brand_name}, year: {self.year}, month: {self.month}")
-                    except Exception as e:
-                        log_activity_debug(f"自动刷新 ActivityCompletionWindow 失败: {e}")
-            if parent and hasattr(parent, 'expense_windows'):
-                if key in parent.expense_windows:
-                    try:
-                        parent.expense_windows[key].load_expense_data()
-                        log_activity_debug(f"自动刷新 ExpenseInfoWindow for brand: {self.brand.brand_name}, year: {self.year}, month: {self.month}")
-                    except Exception as e:
-                        log_activity_debug(f"自动刷新 ExpenseInfoWindow 失败: {e}")
-            # --- 结束修改代码 ---
         except ValueError as e:
             QMessageBox.warning(self, "错误", f"请输入有效的金额: {str(e)}")
 
     def open_add_dialog(self):
         """打开添加单品活动对话框"""
         dialog = AddItemActivityDialog(self.brand.brand_id, self.year, self.month)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_activities()
+        if dialog.exec_() == QDialog.Accepted and dialog.activity_id is not None:
+            # 只读取新增的一行插入表格，不重建整张表
+            db_executor.submit(get_activity, dialog.activity_id, parent=self).then(self.on_activity_added)
+
+    def on_activity_added(self, activity):
+        if activity is None:
+            return
+        self.activity_model.add_activity(activity)
+        self.status_label.hide()
 
     def delete_activity(self, activity_id):
         """删除指定活动"""
         reply = QMessageBox.question(self, "确认", "确定删除此活动?", 
                                    QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            delete_activity(activity_id)
-            self.load_activities()
+            if delete_activity(activity_id):
+                self.activity_model.remove_activity(activity_id)
+                if not self.activity_model.rowCount():
+                    self.status_label.setText("无数据")
+                    self.status_label.show()
+            else:
+                QMessageBox.critical(self, "错误", "删除活动失败")
 
     def closeEvent(self, event):
         """在窗口关闭时从父窗口的 activity_windows 字典中移除自身"""
@@ -225,6 +175,7 @@ class AddItemActivityDialog(CenteredDialog):
         self.year = year
         self.month = month
         self.selected_item = None
+        self.activity_id = None  # 保存成功后为新活动的 ID
         self.setWindowTitle("添加单品活动")
         self.resize(450, 350)
         self.center_on_screen()  # 确保在调整大小后居中
@@ -262,21 +213,13 @@ class AddItemActivityDialog(CenteredDialog):
         self.existing_item_combo.setInsertPolicy(QComboBox.NoInsert)
         self.existing_item_combo.lineEdit().setPlaceholderText("输入关键字进行搜索...")
 
-        self.existing_item_model = QStandardItemModel()
-        items = get_all_items(self.brand_id)
-        for item_id, item_name, spec, unit in items:
-            display_text = f"{item_name} ({spec}, {unit})"
-            model_item = QStandardItem(display_text)
-            model_item.setData(item_id, Qt.UserRole)
-            model_item.setData(item_name, Qt.UserRole + 1)
-            model_item.setData(spec, Qt.UserRole + 2)
-            model_item.setData(unit, Qt.UserRole + 3)
-            self.existing_item_model.appendRow(model_item)
-
-        self.proxy_model = QSortFilterProxyModel(self)
-        self.proxy_model.setSourceModel(self.existing_item_model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
-        self.proxy_model.setFilterKeyColumn(0)
+        self.existing_item_model = item_catalog.model(self.brand_id)  # 按品牌共享，目录已缓存时不查询数据库
+
+        self.proxy_model = ItemSearchProxyModel(self.brand_id, self)
+        self.search_timer = QTimer(self)  # 输入停顿后再搜索
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search)
 
         self.existing_item_combo.setModel(self.proxy_model)
 
@@ -367,10 +310,10 @@ class AddItemActivityDialog(CenteredDialog):
         if is_no_total_target:
             self.need_total.setEnabled(False)
             self.need_total.setChecked(False)  # 强制取消勾选
-            log_activity_debug("Disabled need_total for activity type: 案后结(不与总指标挂钩)")
+            logger.debug("Disabled need_total for activity type: 案后结(不与总指标挂钩)")
         else:
             self.need_total.setEnabled(True)
-            log_activity_debug(f"Enabled need_total for activity type: {self.activity_type.currentText()}")
+            logger.debug("Enabled need_total for activity type: %s", self.activity_type.currentText())
 
     # 添加 update_target_value_state 方法
     def update_target_value_state(self, checked):
@@ -439,27 +382,36 @@ class AddItemActivityDialog(CenteredDialog):
                 self.next_button.setEnabled(self.selected_item is not None)
 
     def on_search_text_changed(self, text):
-        """处理搜索文本变化，禁止自动填充，并增加错误处理"""
+        """处理搜索文本变化：立即清除已选品类，停止输入 SEARCH_DEBOUNCE_MS 后再搜索"""
         try:
-            current_text = self.existing_item_combo.lineEdit().text()
-            cursor_pos = self.existing_item_combo.lineEdit().cursorPosition()
-
-            self.proxy_model.setFilterFixedString(text)
-            
             self.selected_item = None
             self.update_buttons()
+            self.search_timer.start()
+        except Exception as e:
+            logger.exception("搜索时发生严重错误: %s", e)
+            QMessageBox.critical(self, "严重错误", f"搜索功能出现异常: {e}")
 
-            # 恢复用户输入的文本和光标，防止QCompleter自动填充
-            if self.existing_item_combo.lineEdit().text() != current_text:
-                self.existing_item_combo.lineEdit().setText(current_text)
-                self.existing_item_combo.lineEdit().setCursorPosition(cursor_pos)
-
-            if text and self.proxy_model.rowCount() > 0:
+    def apply_search(self):
+        """按当前输入搜索品类（相关度和常用程度排序，支持拼音首字母），禁止自动填充"""
+        try:
+            line_edit = self.existing_item_combo.lineEdit()
+            current_text = line_edit.text()
+            cursor_pos = line_edit.cursorPosition()
+
+            # 模型重置会清空编辑框，恢复用户输入的文本和光标
+            line_edit.blockSignals(True)
+            self.proxy_model.set_query(current_text)
+            if line_edit.text() != current_text:
+                line_edit.setText(current_text)
+                line_edit.setCursorPosition(cursor_pos)
+            line_edit.blockSignals(False)
+
+            if current_text and self.proxy_model.rowCount() > 0:
                 self.existing_item_combo.showPopup()
             else:
                 self.existing_item_combo.hidePopup()
         except Exception as e:
-            log_activity_debug(f"搜索时发生严重错误: {e}\n{traceback.format_exc()}")
+            logger.exception("搜索时发生严重错误: %s", e)
             QMessageBox.critical(self, "严重错误", f"搜索功能出现异常: {e}")
 
     def on_item_selected(self, index):
@@ -486,7 +438,7 @@ class AddItemActivityDialog(CenteredDialog):
                 self.update_buttons()
                 self.existing_item_combo.hidePopup()
         except Exception as e:
-            log_activity_debug(f"选择项目时发生严重错误: {e}\n{traceback.format_exc()}")
+            logger.exception("选择项目时发生严重错误: %s", e)
             QMessageBox.critical(self, "严重错误", f"选择项目时出现异常: {e}")
             self.selected_item = None
             self.update_buttons()
@@ -545,12 +497,13 @@ class AddItemActivityDialog(CenteredDialog):
                 if activity_type == "案后结(不与总指标挂钩)":
                     need_total = False
                 
-                add_activity(self.brand_id, f"{self.year}-{self.month:02d}", False, item_id,
-                            activity_type, need_total, need_item, target_value,
-                            original_price, discount_price)
+                self.activity_id = add_activity(self.brand_id, f"{self.year}-{self.month:02d}", False, item_id,
+                                                activity_type, need_total, need_item, target_value,
+                                                original_price, discount_price)
+                item_catalog.record_use(self.brand_id, item_id)
                 self.accept()
             except Exception as e:
-                log_activity_debug(f"保存活动时发生错误: {e}\n{traceback.format_exc()}")
+                logger.exception("保存活动时发生错误: %s", e)
                 QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
 
     def validate_inputs(self):
@@ -1,20 +1,14 @@
-import os
-import datetime
-import traceback  # 添加导入
+import logging
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QScrollArea, QWidget, QGridLayout, QDialog, QLineEdit, QFormLayout, QMessageBox, QMenu
 from PyQt5.QtCore import Qt
 from models.brand import add_brand, get_all_brands, Brand
-from ui.purchase_details import PurchaseDetailsWindow
 from PyQt5 import  sip
 from PyQt5.QtCore import Qt, QTimer  # 添加 QTimer
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import QShortcut
+from utils import ui_metrics
 
-# 定义 log_debug 函数
-LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug.log")
-def log_debug(message):
-    """记录调试信息到文件"""
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {message}\n")
+logger = logging.getLogger(__name__)
 
 class AddBrandWindow(QWidget):
     def __init__(self):
@@ -76,6 +70,33 @@ class AddBrandWindow(QWidget):
 
         self.setLayout(layout)
 
+        # 隐藏的查询诊断对话框
+        diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        diagnostics_shortcut.activated.connect(self.open_diagnostics)
+        # 隐藏的采样分析开关
+        profiler_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+        profiler_shortcut.activated.connect(self.toggle_profiler)
+
+    def open_diagnostics(self):
+        from ui.diagnostics import DiagnosticsDialog
+        DiagnosticsDialog(self).show()
+
+    def toggle_profiler(self):
+        """开始采样，或停止采样并把结果写入 data 目录"""
+        from utils import profiler
+        if not profiler.is_profiling():
+            profiler.start_profiling()
+            self.setWindowTitle("品牌管理 [采样中]")
+            return
+        self.setWindowTitle("品牌管理")
+        try:
+            paths = profiler.stop_profiling()
+        except OSError as e:
+            logger.error("写出采样结果失败: %s", e)
+            QMessageBox.critical(self, "错误", f"写出采样结果失败: {e}")
+            return
+        QMessageBox.information(self, "采样结果", "已写入：\n" + "\n".join(str(path) for path in paths))
+
     def load_brands(self):
         """加载品牌列表并创建按钮"""
         # 清空现有按钮
@@ -110,30 +131,33 @@ class AddBrandWindow(QWidget):
 
     def open_purchase_details(self, brand):
         """打开进货详情界面，确保只有一个 PurchaseDetailsWindow 打开"""
-        log_debug(f"调用 open_purchase_details for brand: {brand.brand_name}")
+        logger.debug("调用 open_purchase_details for brand: %s", brand.brand_name)
         
         # 先关闭所有当前打开的窗口
         for window in self.purchase_windows[:]:  # 使用列表副本进行迭代
             try:
                 if window is not None:
                     window.close()
-                    log_debug(f"关闭现有 PurchaseDetailsWindow")
+                    logger.debug("关闭现有 PurchaseDetailsWindow")
             except Exception as e:
-                log_debug(f"关闭窗口时发生错误: {str(e)}")
+                logger.error("关闭窗口时发生错误: %s", e)
         
         # 清空列表
         self.purchase_windows.clear()
-        log_debug("清空 purchase_windows 列表")
+        logger.debug("清空 purchase_windows 列表")
         
         # 创建并显示新窗口
         try:
+            from ui.purchase_details import PurchaseDetailsWindow  # 首次打开时才加载，缩短启动时间
+            timer = ui_metrics.start("打开品牌")
             purchase_window = PurchaseDetailsWindow(brand)
+            purchase_window.track_action(timer)
             self.purchase_windows.append(purchase_window)
-            log_debug(f"创建 PurchaseDetailsWindow for brand: {brand.brand_name}")
+            logger.debug("创建 PurchaseDetailsWindow for brand: %s", brand.brand_name)
             purchase_window.show()
-            log_debug("调用 purchase_window.show()")
+            logger.debug("调用 purchase_window.show()")
         except Exception as e:
-            log_debug(f"创建 PurchaseDetailsWindow 失败: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("创建 PurchaseDetailsWindow 失败: %s", e)
             QMessageBox.critical(self, "错误", f"打开进货详情失败: {str(e)}")
 
 
@@ -168,7 +192,7 @@ class AddBrandWindow(QWidget):
                 if window is not None:
                     window.close()
             except Exception as e:
-                log_debug(f"关闭窗口时发生错误: {str(e)}")
+                logger.error("关闭窗口时发生错误: %s", e)
         
         self.purchase_windows.clear()  # 清空列表
         super().closeEvent(event)
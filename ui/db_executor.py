@@ -0,0 +1,164 @@
+"""数据库执行器：专用工作线程持有自己的连接，按提交顺序执行查询，结果通过 Qt 信号回到 GUI 线程
+
+用法：
+    future = db_executor.submit(get_purchases_page, brand_id, year, month, parent=self)
+    future.then(self.on_loaded, self.on_load_failed)
+
+database 模块中的查询函数通过 connection_manager 取得线程本地连接，在工作线程里调用时自然使用
+工作线程自己的连接，无需改动。回调总在 GUI 线程执行；future 被取消后回调不再触发，
+窗口重新加载时取消上一次的 future 即可丢弃过期结果。future 回调（或被跳过）后自行 deleteLater，
+不会在窗口下累积，调用方不要在回调之后继续使用它。
+priority=PRIORITY_LOW 的任务（预取）只在没有普通任务排队时执行。
+
+本模块同时为 database.change_bus 安装调度器：变更通知在 GUI 线程的下一轮事件循环中统一分发。
+"""
+import itertools
+import logging
+import queue
+import threading
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from database.connection import connection_manager
+from database import change_bus, instrumentation
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = 1
+
+
+class DbFuture(QObject):
+    """一次数据库调用的结果；finished(结果) 或 failed(异常) 二者之一在 GUI 线程发出"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+    # 工作线程发出的内部信号，排队到 future 所在的 GUI 线程后再检查是否已取消
+    _resolved = pyqtSignal(object)
+    _rejected = pyqtSignal(object)
+    _skipped = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancelled = False
+        self.done = False
+        self._resolved.connect(self._on_resolved)
+        self._rejected.connect(self._on_rejected)
+        self._skipped.connect(self.deleteLater)
+
+    def cancel(self):
+        """取消：尚未执行的任务会被跳过，已在执行的任务结果会被丢弃"""
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def then(self, on_result, on_error=None):
+        """注册回调，返回自身以便链式调用"""
+        self.finished.connect(on_result)
+        if on_error is not None:
+            self.failed.connect(on_error)
+        return self
+
+    def _on_resolved(self, result):
+        self.done = True
+        if not self._cancelled:
+            self.finished.emit(result)
+        self.deleteLater()
+
+    def _on_rejected(self, error):
+        self.done = True
+        if not self._cancelled:
+            self.failed.emit(error)
+        self.deleteLater()
+
+
+class DbExecutor:
+    """单工作线程的数据库执行器，任务按优先级、同优先级内按提交顺序串行执行"""
+
+    def __init__(self, name="db-executor"):
+        self.name = name
+        self._queue = queue.PriorityQueue()  # (优先级, 提交序号, 任务)
+        self._sequence = itertools.count()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, parent=None, priority=PRIORITY_NORMAL, **kwargs):
+        """提交 fn(*args, **kwargs) 到工作线程，返回 DbFuture
+
+        parent 通常传入发起请求的窗口：窗口销毁时 future 一并销毁，迟到的结果不会再访问已关闭的窗口。
+        priority 为 PRIORITY_LOW 时排在所有普通任务之后。
+        """
+        self.start()
+        future = DbFuture(parent)
+        # 开启查询统计时，任务中的查询归属到发起请求的窗口
+        origin = type(parent).__name__ if parent is not None else None
+        self._queue.put((priority, next(self._sequence), (future, fn, args, kwargs, origin)))
+        return future
+
+    def shutdown(self, wait=True, timeout=5.0):
+        """停止工作线程；已排队的普通任务会先执行完，低优先级任务被丢弃"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put((PRIORITY_NORMAL, next(self._sequence), None))
+            if wait:
+                thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                _, _, task = self._queue.get()
+                if task is None:
+                    break
+                future, fn, args, kwargs, origin = task
+                if future.cancelled():
+                    self._emit(future._skipped)
+                    continue
+                try:
+                    if instrumentation.enabled:
+                        with instrumentation.query_context(origin):
+                            result = fn(*args, **kwargs)
+                    else:
+                        result = fn(*args, **kwargs)
+                except Exception as e:
+                    logger.exception("数据库任务 %s 执行失败: %s", getattr(fn, '__name__', fn), e)
+                    self._emit(future._rejected, e)
+                else:
+                    self._emit(future._resolved, result)
+        finally:
+            connection_manager.close_thread_connections()
+
+    @staticmethod
+    def _emit(signal, *value):
+        try:
+            signal.emit(*value)
+        except RuntimeError:
+            pass  # future 已随窗口销毁
+
+
+db_executor = DbExecutor()
+
+
+class ChangeDispatcher(QObject):
+    """排队信号：任意线程发布的变更都在 GUI 线程的下一轮事件循环中分发，同一轮内的发布合并为一次"""
+    _wake = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self._wake.connect(self._dispatch, Qt.QueuedConnection)
+
+    def schedule(self, flush):
+        self._wake.emit(flush)
+
+    def _dispatch(self, flush):
+        flush()
+
+
+change_dispatcher = ChangeDispatcher()
+change_bus.set_scheduler(change_dispatcher.schedule)
@@ -0,0 +1,47 @@
+"""表格委托：在单元格内直接绘制控件，避免为每行创建真实的 QWidget"""
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+from PyQt5.QtCore import Qt, QEvent, QRect, pyqtSignal
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """把单元格的显示文本绘制成按钮，鼠标在按钮上松开时发出 clicked(行号)"""
+    clicked = pyqtSignal(int)
+
+    MARGIN = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pressed = None  # 当前按下的 (row, column)
+
+    def _button_rect(self, option):
+        return option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = QRect(self._button_rect(option))
+        button.text = index.data(Qt.DisplayRole) or ""
+        button.state = QStyle.State_Enabled
+        if self._pressed == (index.row(), index.column()):
+            button.state |= QStyle.State_Sunken
+        else:
+            button.state |= QStyle.State_Raised
+        widget = option.widget
+        style = widget.style() if widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, widget)
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        size.setWidth(option.fontMetrics.horizontalAdvance(index.data(Qt.DisplayRole) or "") + 6 * self.MARGIN + 16)
+        return size
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            if self._button_rect(option).contains(event.pos()):
+                self._pressed = (index.row(), index.column())
+                return True
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            pressed, self._pressed = self._pressed, None
+            if pressed == (index.row(), index.column()) and self._button_rect(option).contains(event.pos()):
+                self.clicked.emit(index.row())
+            return pressed is not None
+        return super().editorEvent(event, model, option, index)
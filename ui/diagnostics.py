@@ -0,0 +1,133 @@
+"""诊断对话框（隐藏功能，品牌管理窗口按 Ctrl+Shift+D 打开）：显示 database.instrumentation 的查询统计、
+database.result_cache 和 ui.prefetch 的命中情况
+
+查询统计需要以 --trace-queries 启动（或设置环境变量 STOCKFLOW_TRACE_QUERIES=1）才会有数据。
+"""
+import logging
+from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+                             QPlainTextEdit, QSplitter, QHeaderView, QAbstractItemView, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt
+from database import instrumentation, result_cache
+from ui.base_window import CenteredDialog
+from ui import prefetch
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_LIMIT = 200
+
+
+class DiagnosticsDialog(CenteredDialog):
+    COLUMNS = ["调用函数", "来源", "次数", "总耗时(ms)", "平均(ms)", "p95(ms)", "最大(ms)", "行数", "SQL"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle("查询诊断")
+        self.resize(1400, 700)
+        self.center_on_screen()
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+        self.prefetch_label = QLabel()
+        layout.addWidget(self.prefetch_label)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        splitter.addWidget(self.table)
+        self.slow_text = QPlainTextEdit()
+        self.slow_text.setReadOnly(True)
+        splitter.addWidget(self.slow_text)
+        splitter.setSizes([450, 250])
+        layout.addWidget(splitter)
+
+        button_layout = QHBoxLayout()
+        refresh_button = QPushButton("刷新")
+        refresh_button.clicked.connect(self.refresh)
+        reset_button = QPushButton("清空统计")
+        reset_button.clicked.connect(self.reset)
+        export_button = QPushButton("导出 JSON")
+        export_button.clicked.connect(self.export_json)
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(refresh_button)
+        button_layout.addWidget(reset_button)
+        button_layout.addWidget(export_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def refresh(self):
+        summary = instrumentation.summary(limit=STATEMENT_LIMIT)
+        if not summary["enabled"]:
+            self.status_label.setText("查询统计未开启：请以 --trace-queries 启动，或设置环境变量 STOCKFLOW_TRACE_QUERIES=1")
+        else:
+            statements = summary["statements"]
+            self.status_label.setText(
+                f"开始于 {summary['started_at']}，共 {sum(s['count'] for s in statements)} 次执行，"
+                f"{len(statements)} 条不同语句；慢查询阈值 {summary['slow_query_ms']:g} ms；"
+                f"事务语句 {summary['implicit_statements']}"
+            )
+        cache = result_cache.stats()
+        self.cache_label.setText(
+            f"结果缓存：命中 {cache['hits']} 次，未命中 {cache['misses']} 次（命中率 {cache['hit_rate']:.0%}），"
+            f"失效 {cache['invalidations']} 次，淘汰 {cache['evictions']} 条；"
+            f"当前 {cache['entries']}/{cache['max_entries']} 条、{cache['rows']}/{cache['max_rows']} 行"
+        )
+        prefetched = prefetch.stats()
+        self.prefetch_label.setText(
+            f"预取：发出 {prefetched['issued']} 次，完成 {prefetched['completed']}，取消 {prefetched['cancelled']}，"
+            f"失败 {prefetched['failed']}；导航命中 {prefetched['hits']}/{prefetched['hits'] + prefetched['misses']}"
+            f"（命中率 {prefetched['hit_rate']:.0%}），预取利用率 {prefetched['usage_rate']:.0%}，浪费 {prefetched['wasted']}"
+        )
+
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(summary["statements"]))
+        for row, stats in enumerate(summary["statements"]):
+            values = [stats["function"], stats["origin"], stats["count"], stats["total_ms"], stats["mean_ms"],
+                      stats["p95_ms"], stats["max_ms"], stats["rows"], stats["sql"]]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)  # 数值列按数值排序
+                if col == len(values) - 1:
+                    item.setToolTip(value)
+                self.table.setItem(row, col, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(3, Qt.DescendingOrder)
+        self.table.resizeColumnsToContents()
+        self.table.setColumnWidth(len(self.COLUMNS) - 1, 600)
+
+        lines = []
+        for entry in reversed(summary["slow_queries"]):
+            lines.append(f"[{entry['time']}] {entry['elapsed_ms']:.1f} ms  {entry['function']}  来源 {entry['origin']}"
+                         f"  {entry['rows']} 行")
+            lines.append(f"  {entry['sql']}")
+            lines.append(f"  参数: {', '.join(entry['params'])}")
+            lines.extend(f"  计划: {step}" for step in entry["plan"] or ["无"])
+            lines.append("")
+        self.slow_text.setPlainText("\n".join(lines) or "没有慢查询")
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出查询统计", "query_stats.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            instrumentation.dump(path)
+        except OSError as e:
+            logger.error("导出查询统计失败: %s", e)
+            QMessageBox.critical(self, "错误", f"导出失败: {e}")
@@ -1,17 +1,13 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget,
                              QTableWidgetItem, QPushButton, QMessageBox, QApplication, QHeaderView)
 from PyQt5.QtCore import Qt
-import datetime
-import traceback
-import os
-from database.queries import get_connection
+import logging
+from database.completion import compute_activity_completion, expense_summary
+from ui.db_executor import db_executor
+from database import change_bus
+from database.period import month_key
 
-LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug.log")
-
-def log_debug(message):
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {message}\n")
+logger = logging.getLogger(__name__)
 
 class ExpenseInfoWindow(QWidget):
     def __init__(self, brand, year, month, parent=None):
@@ -20,12 +16,16 @@ class ExpenseInfoWindow(QWidget):
         self.brand = brand
         self.year = year
         self.month = month
+        self.load_future = None
+        self.pending_action = None  # 打开窗口的计时，由打开它的窗口设置（utils.ui_metrics）
         self.setWindowTitle(f"{self.brand.brand_name} - 支出情况")
         self.setGeometry(100, 100, 800, 400)
         self.init_ui()
         self.load_expense_data()
+        self.change_subscription = change_bus.subscribe(
+            self.on_data_changed, (change_bus.PURCHASES, change_bus.ACTIVITIES), brand.brand_id, month_key(year, month))
         self.center_on_screen()
-        log_debug(f"初始化 ExpenseInfoWindow for brand: {brand.brand_name}, 年: {year}, 月: {month}")
+        logger.debug("初始化 ExpenseInfoWindow for brand: %s, 年: %s, 月: %s", brand.brand_name, year, month)
 
     def center_on_screen(self):
         screen = QApplication.primaryScreen().geometry()
@@ -40,6 +40,10 @@ class ExpenseInfoWindow(QWidget):
         title_label.setStyleSheet("font-size: 16pt; font-weight: bold;")
         layout.addWidget(title_label)
 
+        self.status_label = QLabel("加载中...")
+        self.status_label.hide()
+        layout.addWidget(self.status_label)
+
         self.table = QTableWidget()
         self.table.setColumnCount(3)
         self.table.setHorizontalHeaderLabels(["原始支出", "优惠返点", "实际支出"])
@@ -61,101 +65,32 @@ class ExpenseInfoWindow(QWidget):
         self.setLayout(layout)
 
     def load_expense_data(self):
+        if self.load_future is not None:
+            self.load_future.cancel()
+        self.status_label.show()
+        self.table.setEnabled(False)
+        # 与活动完成情况窗口共用同一查询（及其缓存结果）
+        self.load_future = db_executor.submit(
+            compute_activity_completion, self.brand.brand_id, self.year, self.month, parent=self
+        ).then(self.on_expense_loaded, self.on_expense_failed)
+
+    def on_expense_failed(self, error):
+        self.load_future = None
+        if self.pending_action is not None:
+            self.pending_action.cancel()
+            self.pending_action = None
+        self.status_label.hide()
+        self.table.setEnabled(True)
+        QMessageBox.critical(self, "错误", f"加载支出数据失败: {str(error)}")
+
+    def on_expense_loaded(self, result):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-
-            # 原始支出
-            log_debug(f"Querying original expense for brand_id: {self.brand.brand_id}, year: {self.year}, month: {self.month}")
-            cursor.execute("""
-                SELECT SUM(total_amount)
-                FROM purchases
-                WHERE brand_id = ? AND strftime('%Y', date) = ? AND strftime('%m', date) = ?
-            """, (self.brand.brand_id, str(self.year), f"{self.month:02d}"))
-            result = cursor.fetchone()
-            original_expense = float(result[0]) if result and result[0] is not None else 0.0
-            log_debug(f"Original expense retrieved: {original_expense}")
-
-            # 获取总销量目标
-            log_debug(f"Querying total target for brand_id: {self.brand.brand_id}, month: {self.year}-{self.month:02d}")
-            cursor.execute("""
-                SELECT target_value
-                FROM activities
-                WHERE brand_id = ? AND month = ? AND is_total_target = 1
-            """, (self.brand.brand_id, f"{self.year}-{self.month:02d}"))
-            total_target = cursor.fetchone()
-            total_target_value = float(total_target[0]) if total_target and total_target[0] is not None else 0.0
-            log_debug(f"Total target value: {total_target_value}")
-
-            # 获取单品活动数据
-            log_debug(f"Querying activities for brand_id: {self.brand.brand_id}, month: {self.year}-{self.month:02d}")
-            cursor.execute("""
-                SELECT a.activity_id, a.activity_type, a.original_price, a.discount_price,
-                    a.target_value, a.need_total_target, a.need_item_target, a.item_id
-                FROM activities a
-                WHERE a.brand_id = ? AND a.month = ? AND a.is_total_target = 0
-            """, (self.brand.brand_id, f"{self.year}-{self.month:02d}"))
-            activities = cursor.fetchall()
-            log_debug(f"Activities retrieved: {len(activities)} records")
-
-            # 计算实际总销量
-            log_debug(f"Querying actual total sales for brand_id: {self.brand.brand_id}")
-            cursor.execute("""
-                SELECT SUM(total_amount)
-                FROM purchases
-                WHERE brand_id = ? AND strftime('%Y', date) = ? AND strftime('%m', date) = ?
-            """, (self.brand.brand_id, str(self.year), f"{self.month:02d}"))
-            result = cursor.fetchone()
-            actual_total_sales = float(result[0]) if result and result[0] is not None else 0.0
-            log_debug(f"Actual total sales: {actual_total_sales}")
-
-            # --- 修改代码：计算优惠返点 ---
-            discount_total = 0.0
-            log_debug(f"Querying activities for brand_id: {self.brand.brand_id}, month: {self.year}-{self.month:02d}")
-            cursor.execute("""
-                SELECT a.activity_id, a.activity_type, a.original_price, a.discount_price,
-                    a.target_value, a.need_total_target, a.need_item_target, a.item_id,
-                    i.spec
-                FROM activities a
-                LEFT JOIN items i ON a.item_id = i.item_id
-                WHERE a.brand_id = ? AND a.month = ? AND a.is_total_target = 0
-            """, (self.brand.brand_id, f"{self.year}-{self.month:02d}"))
-            activities = cursor.fetchall()
-            log_debug(f"Activities retrieved: {len(activities)} records")
-
-            for activity in activities:
-                activity_id, activity_type, original_price, discount_price, target_value, \
-                need_total_target, need_item_target, item_id, spec = activity
-
-                is_completed = True
-                if need_total_target and actual_total_sales < total_target_value:
-                    is_completed = False
-                if need_item_target and item_id:
-                    log_debug(f"Querying actual item sales for item_id: {item_id}")
-                    cursor.execute("""
-                        SELECT SUM(quantity)
-                        FROM purchases
-                        WHERE brand_id = ? AND item_id = ? AND 
-                            strftime('%Y', date) = ? AND strftime('%m', date) = ?
-                    """, (self.brand.brand_id, item_id, str(self.year), f"{self.month:02d}"))
-                    result = cursor.fetchone()
-                    actual_item_sales = float(result[0]) if result and result[0] is not None else 0.0
-                    log_debug(f"Actual item sales for item_id {item_id}: {actual_item_sales}")
-                    if actual_item_sales < target_value:
-                        is_completed = False
-
-                if is_completed and original_price and discount_price and item_id:
-                    # 获取规格，默认为 1
-                    spec_value = float(spec) if spec else 1.0
-                    log_debug(f"Spec for item_id {item_id}: {spec_value}")
-                    # 计算单品返点
-                    item_discount = (original_price - discount_price) * spec_value * actual_item_sales
-                    discount_total += item_discount
-                    log_debug(f"Discount calculated for activity {activity_id}: {item_discount}")
-            # --- 结束修改代码 ---
-
-            actual_expense = original_expense - discount_total
-            log_debug(f"Final actual expense: {actual_expense}")
+            self.load_future = None
+            self.status_label.hide()
+            self.table.setEnabled(True)
+            original_expense, discount_total, actual_expense = expense_summary(result)
+            logger.debug("支出情况 brand_id: %s, %s-%02d: 原始 %s, 返点 %s, 实际 %s",
+                         self.brand.brand_id, self.year, self.month, original_expense, discount_total, actual_expense)
 
             self.table.setRowCount(1)
             items_to_set = [
@@ -175,16 +110,22 @@ class ExpenseInfoWindow(QWidget):
             for col in range(self.table.columnCount()):
                 current_width = self.table.columnWidth(col)
                 self.table.setColumnWidth(col, current_width + padding)
-
-            conn.close()
+            if self.pending_action is not None:
+                self.pending_action.finish(self.table.viewport())
+                self.pending_action = None
 
         except Exception as e:
-            log_debug(f"加载支出数据时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("加载支出数据时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"加载支出数据失败: {str(e)}")
 
+    def on_data_changed(self, changes):
+        """本品牌月的进货或活动有变化时重新计算"""
+        self.load_expense_data()
+
     def closeEvent(self, event):
+        self.change_subscription.cancel()
         try:
-            log_debug("ExpenseInfoWindow 关闭事件触发")
+            logger.debug("ExpenseInfoWindow 关闭事件触发")
             parent = self.parent()
             if parent and hasattr(parent, 'expense_windows'):
                 key = (self.brand.brand_id, self.year, self.month)
@@ -192,5 +133,5 @@ class ExpenseInfoWindow(QWidget):
                     del parent.expense_windows[key]
             super().closeEvent(event)
         except Exception as e:
-            log_debug(f"关闭窗口时发生错误: {e}")
+            logger.error("关闭窗口时发生错误: %s", e)
             event.accept()
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""商品目录：按品牌共享已构建好的下拉模型和搜索索引，新增进货、单品活动对话框直接复用
+
+目录数据由 database.queries.get_item_catalog 按品牌缓存，商品增删时在数据库层就地修补并递增版本号；
+这里为每个品牌保留一个 QStandardItemModel，只在版本号变化时按差异增删行，目录已缓存时打开对话框
+不访问数据库。模型只在 GUI 线程中访问，工作线程（如批量导入）只改动数据库层的缓存。
+
+搜索索引（utils.item_search）在数据库执行器线程中构建，构建完成前 ItemSearchProxyModel 退回逐行子串匹配。
+"""
+import logging
+from PyQt5.QtCore import Qt, QAbstractProxyModel, QModelIndex
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from database.queries import get_item_catalog, item_catalog_version, get_item_usage
+from ui.db_executor import db_executor
+from utils.item_search import ItemSearchIndex, normalize, DEFAULT_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# 模型中保存商品字段的数据角色
+ITEM_ID_ROLE = Qt.UserRole
+ITEM_NAME_ROLE = Qt.UserRole + 1
+ITEM_SPEC_ROLE = Qt.UserRole + 2
+ITEM_UNIT_ROLE = Qt.UserRole + 3
+
+# 搜索框停止输入多久后再查询（毫秒）
+SEARCH_DEBOUNCE_MS = 120
+
+
+def make_item_row(item_id, item_name, spec, unit):
+    model_item = QStandardItem(f"{item_name} ({spec}, {unit})")
+    model_item.setEditable(False)
+    model_item.setData(item_id, ITEM_ID_ROLE)
+    model_item.setData(item_name, ITEM_NAME_ROLE)
+    model_item.setData(spec, ITEM_SPEC_ROLE)
+    model_item.setData(unit, ITEM_UNIT_ROLE)
+    return model_item
+
+
+def build_search_index(brand_id, items):
+    """在执行器线程中运行：载入使用情况并建立索引，顺带预先算好空查询的排序"""
+    index = ItemSearchIndex(items)
+    index.set_usage(get_item_usage(brand_id))
+    index.search("", limit=1)
+    return index
+
+
+class _BrandCatalog:
+    def __init__(self):
+        self.version = None
+        self.items = []
+        self.model = QStandardItemModel()
+        self.model_items = {}      # item_id -> QStandardItem
+        self.index = None          # ItemSearchIndex，构建完成前为 None
+        self.index_future = None
+        self.pending_uses = []     # 索引构建期间记录的选择
+
+
+class ItemCatalog:
+    """品牌 -> 共享的商品下拉模型和搜索索引；对话框各自用 ItemSearchProxyModel 包装后搜索"""
+
+    def __init__(self):
+        self._brands = {}
+
+    def _sync(self, brand_id):
+        entry = self._brands.get(brand_id)
+        if entry is None:
+            entry = self._brands[brand_id] = _BrandCatalog()
+        elif entry.version == item_catalog_version(brand_id):
+            return entry
+
+        version, items = get_item_catalog(brand_id)
+        wanted = {item[0]: item for item in items}
+        removed = [item_id for item_id in entry.model_items if item_id not in wanted]
+        added = [item for item in items if item[0] not in entry.model_items]
+        # 先更新版本和索引，模型发出行变化信号时代理模型重新搜索即可得到新结果
+        entry.version = version
+        entry.items = items
+        if entry.index is not None:
+            for item_id in removed:
+                entry.index.remove(item_id)
+            for item in added:
+                entry.index.add(*item)
+        for item_id in removed:
+            model_item = entry.model_items.pop(item_id)
+            entry.model.removeRow(model_item.row())
+        for item in added:
+            model_item = entry.model_items[item[0]] = make_item_row(*item)
+            entry.model.appendRow(model_item)
+        return entry
+
+    def model(self, brand_id):
+        """品牌的共享下拉模型，显示文本为“品名 (规格, 单位)”，商品字段保存在 ITEM_*_ROLE"""
+        return self._sync(brand_id).model
+
+    def items(self, brand_id):
+        """品牌的商品列表 [(item_id, item_name, spec, unit)]"""
+        return self._sync(brand_id).items
+
+    def search(self, brand_id, query, limit=None):
+        """按相关度排序的匹配商品在共享模型中的行号；索引尚未就绪时返回 None"""
+        entry = self._sync(brand_id)
+        index = self.search_index(brand_id)
+        if index is None:
+            return None
+        model_items = entry.model_items
+        return [model_items[item_id].row() for item_id in index.search(query, limit=limit or len(index))
+                if item_id in model_items]
+
+    def search_index(self, brand_id):
+        """品牌的搜索索引；尚未构建时在执行器中开始构建并返回 None"""
+        entry = self._sync(brand_id)
+        if entry.index is None and entry.index_future is None:
+            # 以共享模型为父对象，future 留在 GUI 线程，回调后自行释放
+            entry.index_future = db_executor.submit(build_search_index, brand_id, list(entry.items),
+                                                    parent=entry.model)
+            entry.index_future.then(
+                lambda index: self._on_index_built(brand_id, entry, index),
+                lambda error: self._on_index_failed(entry, error),
+            )
+        return entry.index
+
+    def _on_index_built(self, brand_id, entry, index):
+        entry.index_future = None
+        if self._brands.get(brand_id) is not entry:
+            return
+        # 补上构建期间目录发生的变化
+        current = {item[0]: item for item in entry.items}
+        for item_id in [item_id for item_id in current if item_id not in index]:
+            index.add(*current[item_id])
+        for item_id in list(index):
+            if item_id not in current:
+                index.remove(item_id)
+        for item_id in entry.pending_uses:
+            index.record_use(item_id)
+        entry.pending_uses = []
+        entry.index = index
+        logger.debug("品牌 %s 的商品搜索索引已建立，共 %s 个商品", brand_id, len(index))
+
+    def _on_index_failed(self, entry, error):
+        entry.index_future = None
+        logger.error("建立商品搜索索引失败: %s", error)
+
+    def record_use(self, brand_id, item_id):
+        """商品被选中保存后调用，之后的搜索结果中该商品靠前"""
+        entry = self._sync(brand_id)
+        if entry.index is not None:
+            entry.index.record_use(item_id)
+        else:
+            entry.pending_uses.append(item_id)
+
+    def clear(self):
+        self._brands.clear()
+
+
+item_catalog = ItemCatalog()
+
+
+class ItemSearchProxyModel(QAbstractProxyModel):
+    """按搜索结果排序和过滤共享下拉模型的代理
+
+    set_query 用品牌的搜索索引得到排好序的商品，索引未就绪时按显示文本做不区分大小写的子串匹配。
+    共享模型增删行时按当前查询重新搜索。
+    """
+    RESULT_LIMIT = DEFAULT_LIMIT
+
+    def __init__(self, brand_id, parent=None):
+        super().__init__(parent)
+        self.brand_id = brand_id
+        self.query = ""
+        self._rows = []            # 代理行 -> 源模型行
+        self._proxy_rows = {}      # 源模型行 -> 代理行
+        source = item_catalog.model(brand_id)
+        item_catalog.search_index(brand_id)  # 提前开始构建索引
+        self.setSourceModel(source)
+        source.rowsAboutToBeRemoved.connect(self._begin_source_change)
+        source.rowsRemoved.connect(self._end_source_change)
+        source.rowsAboutToBeInserted.connect(self._begin_source_change)
+        source.rowsInserted.connect(self._end_source_change)
+        self._rows = self._search()
+        self._proxy_rows = {row: i for i, row in enumerate(self._rows)}
+
+    def set_query(self, text):
+        """按 text 重新搜索；空查询列出全部商品，否则最多 RESULT_LIMIT 条"""
+        self.query = text
+        self.beginResetModel()
+        self._rows = self._search()
+        self._proxy_rows = {row: i for i, row in enumerate(self._rows)}
+        self.endResetModel()
+
+    def _search(self):
+        limit = self.RESULT_LIMIT if self.query else None
+        rows = item_catalog.search(self.brand_id, self.query, limit)
+        if rows is not None:
+            return rows
+        source = self.sourceModel()
+        query = normalize(self.query)
+        rows = [row for row in range(source.rowCount())
+                if query in normalize(source.item(row).text())]
+        return rows[:limit] if limit else rows
+
+    def _begin_source_change(self, *args):
+        self.beginResetModel()
+
+    def _end_source_change(self, *args):
+        self._rows = self._search()
+        self._proxy_rows = {row: i for i, row in enumerate(self._rows)}
+        self.endResetModel()
+
+    # ---- QAbstractProxyModel 接口 ----
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid() or proxy_index.row() >= len(self._rows) or self.sourceModel() is None:
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self._proxy_rows.get(source_index.row())
+        return QModelIndex() if row is None else self.index(row, source_index.column())
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._rows)) or column != 0:
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
@@ -0,0 +1,93 @@
+"""后台预取：当前视图渲染完成后，以低优先级在数据库执行器上提前执行用户接下来可能发出的查询
+
+预取的结果不直接交给窗口，而是存入 database.result_cache（有条数和行数上限的 LRU）；用户随后发出
+相同的查询（函数和参数完全相同）时直接命中缓存。窗口导航到别处时调用 cancel()，尚未执行的预取被跳过。
+
+命中统计：窗口每次发出查询前调用 note_request()，若同一查询已预取完成且缓存版本未变（期间没有写入）记为命中，
+否则记为未命中；预取完成但一直没有被用到的记为浪费。全局统计见 stats()，诊断对话框中显示。
+"""
+import logging
+import threading
+from collections import OrderedDict
+from database import result_cache
+from ui.db_executor import db_executor, PRIORITY_LOW
+
+logger = logging.getLogger(__name__)
+
+COMPLETED_KEEP = 32  # 每个窗口记住的已完成预取数量
+
+_lock = threading.Lock()
+_stats = {"issued": 0, "completed": 0, "cancelled": 0, "failed": 0, "hits": 0, "misses": 0, "wasted": 0}
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def _key(fn, args, kwargs):
+    return getattr(fn, "__qualname__", repr(fn)), args, tuple(sorted(kwargs.items()))
+
+
+class Prefetcher:
+    """一个窗口的预取器；parent 为窗口，窗口销毁时未返回的预取一并丢弃"""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self._futures = {}              # 键 -> 尚未完成的 DbFuture
+        self._completed = OrderedDict()  # 键 -> 完成时的缓存版本
+
+    def prefetch(self, fn, *args, **kwargs):
+        """以低优先级执行 fn(*args, **kwargs)；已在预取或已完成的查询不重复提交，结果缓存关闭时不预取"""
+        if not result_cache.is_enabled():
+            return
+        key = _key(fn, args, kwargs)
+        if key in self._futures or self._completed.get(key) == result_cache.current_version():
+            return
+        _count("issued")
+        self._futures[key] = db_executor.submit(fn, *args, parent=self.parent, priority=PRIORITY_LOW, **kwargs).then(
+            lambda _result: self._on_done(key), lambda error: self._on_failed(key, error))
+
+    def _on_done(self, key):
+        self._futures.pop(key, None)
+        _count("completed")
+        self._completed[key] = result_cache.current_version()
+        self._completed.move_to_end(key)
+        while len(self._completed) > COMPLETED_KEEP:
+            self._completed.popitem(last=False)
+            _count("wasted")
+
+    def _on_failed(self, key, error):
+        self._futures.pop(key, None)
+        _count("failed")
+        logger.debug("预取失败: %s", error)
+
+    def note_request(self, fn, *args, **kwargs):
+        """窗口发出查询前调用，返回该查询是否已由预取准备好"""
+        completed = self._completed.pop(_key(fn, args, kwargs), None)
+        hit = completed is not None and completed == result_cache.current_version()
+        _count("hits" if hit else "misses")
+        return hit
+
+    def cancel(self):
+        """用户导航到别处：跳过尚未执行的预取（已在执行的一个仍会完成并写入缓存）"""
+        futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future.cancel()
+        _count("cancelled", len(futures))
+
+    def close(self):
+        """窗口关闭时调用：取消未执行的预取，没被用到的已完成预取记为浪费"""
+        self.cancel()
+        _count("wasted", len(self._completed))
+        self._completed.clear()
+
+
+def stats():
+    """全局预取统计；hit_rate 为导航查询中已预取的比例，usage_rate 为完成的预取中被用到的比例"""
+    with _lock:
+        result = dict(_stats)
+    requests = result["hits"] + result["misses"]
+    result["hit_rate"] = round(result["hits"] / requests, 3) if requests else 0.0
+    result["usage_rate"] = round(result["hits"] / result["completed"], 3) if result["completed"] else 0.0
+    return result
@@ -1,51 +1,63 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget,
-                             QTableWidgetItem, QPushButton, QMessageBox, QDialog,
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView,
+                             QAbstractItemView, QPushButton, QMessageBox, QDialog,
                              QFormLayout, QLineEdit, QComboBox, QDateEdit, QApplication,
-                             QStackedWidget, QDoubleSpinBox, QHeaderView, QMenu, QCompleter)
-from PyQt5.QtCore import QDate, Qt, QTimer, QSortFilterProxyModel
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QIntValidator
-from database.queries import get_purchases_by_brand, get_connection, add_item, get_all_items
+                             QStackedWidget, QDoubleSpinBox, QHeaderView, QMenu, QCompleter,
+                             QFileDialog)
+from PyQt5.QtCore import QDate, Qt, QTimer
+from PyQt5.QtGui import QIntValidator
 from database.db_setup import DB_PATH
-from models.purchase import Purchase
-import datetime
-import traceback
+from ui.db_executor import db_executor
+from ui.table_models import PurchaseTableModel, estimate_column_widths
+import logging
 import os
 import sqlite3
 from database.queries import (
-    get_purchases_by_brand, get_connection, add_item, get_all_items, delete_purchase
+    get_purchases_page, get_connection, delete_purchase, get_purchase_count, catalog_add_item, get_purchases_by_ids
 )
-import pandas as pd
+from database import result_cache, change_bus
+from database.period import month_key
+from ui.item_catalog import item_catalog, ItemSearchProxyModel, SEARCH_DEBOUNCE_MS
+from ui.prefetch import Prefetcher
+from utils import ui_metrics
 
-# 调试日志文件路径
-LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug.log")
+logger = logging.getLogger(__name__)
+
+PATCH_LIMIT = 50  # 一轮变更涉及的记录超过该数量时整体重新加载，而不是逐行更新
+PREFETCH_DELAY_MS = 150  # 表格刷新后停顿多久开始预取，连续切换月份时不预取
+
+
+def load_changed_purchases(purchase_ids, brand_id, year, month):
+    """变更记录的当前内容（已删除的不在结果中）和当前视图的总条数，在数据库线程执行"""
+    return get_purchases_by_ids(purchase_ids), get_purchase_count(brand_id, year, month)
 
-def log_debug(message):
-    """记录调试信息到文件"""
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {message}\n")
 
 class PurchaseDetailsWindow(QWidget):
     def __init__(self, brand, parent=None):
         super().__init__(parent)
-        log_debug(f"初始化 PurchaseDetailsWindow for brand: {brand.brand_name}")
+        logger.debug("初始化 PurchaseDetailsWindow for brand: %s", brand.brand_name)
         self.setAttribute(Qt.WA_DeleteOnClose)
         self.brand = brand
-        self.current_page = 1
-        self.per_page = 20
-        self.total_pages = 1
-        self.purchases = []
+        self.fetch_size = 500         # 每次从数据库读取的行数，滚动到底部时再读下一批
+        self.last_cursor = None       # 已加载的最后一行的键集游标
+        self.load_future = None       # 尚未返回的加载请求
+        self.pending_action = None    # 等待表格刷新完成的操作计时（utils.ui_metrics）
         self.year = QDate.currentDate().year()
         self.month = QDate.currentDate().month()
         self.activity_windows = {}  # 新增：跟踪已打开的 ActivityInfoWindow 实例
         self.completion_windows = {}  # 跟踪 ActivityCompletionWindow 实例
         self.expense_windows = {}   # 跟踪 ExpenseInfoWindow 实例
+        self.prefetcher = Prefetcher(self)  # 预取下一批和相邻月份（结果存入 database.result_cache）
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(PREFETCH_DELAY_MS)
+        self.prefetch_timer.timeout.connect(self.start_prefetch)
         self.setWindowTitle(f"{self.brand.brand_name} - 进货详情")
         self.setGeometry(100, 100, 1400, 600)
         self.init_ui()
         self.load_purchases()
+        self.change_subscription = change_bus.subscribe(self.on_data_changed, (change_bus.PURCHASES,), self.brand.brand_id)
         self.center_on_screen()
-        log_debug(f"完成 PurchaseDetailsWindow 初始化 for brand: {brand.brand_name}")
+        logger.debug("完成 PurchaseDetailsWindow 初始化 for brand: %s", brand.brand_name)
     def center_on_screen(self):
         """将窗口移动到屏幕中央"""
         screen = QApplication.primaryScreen().geometry()
@@ -65,31 +77,25 @@ class PurchaseDetailsWindow(QWidget):
         # 时间筛选
         layout.addLayout(self.setup_date_filter())
 
-        # 表格
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(["日期", "品名", "规格", "单位", "数量", "单价", "金额", "备注"])
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.cellDoubleClicked.connect(self.on_cell_double_clicked)
+        # 表格：只有备注列可双击编辑
+        self.model = PurchaseTableModel(self)
+        self.model.fetch_more_requested.connect(self.load_more_purchases)
+        self.model.remarks_edited.connect(self.on_remarks_edited)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.DoubleClicked)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 8)
         
-        # 列宽自适应并支持手动拖动
+        # 列宽按样本估算并支持手动拖动
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
         # 启用右键菜单
         self.setup_context_menu()
         layout.addWidget(self.table)
 
-        # 分页控件
-        page_layout = QHBoxLayout()
-        self.page_label = QLabel("第 1 页 / 共 1 页")
-        prev_button = QPushButton("上一页")
-        prev_button.clicked.connect(self.prev_page)
-        next_button = QPushButton("下一页")
-        next_button.clicked.connect(self.next_page)
-        page_layout.addWidget(self.page_label)
-        page_layout.addWidget(prev_button)
-        page_layout.addWidget(next_button)
-        layout.addLayout(page_layout)
+        # 加载进度
+        self.page_label = QLabel("共 0 条")
+        layout.addWidget(self.page_label)
 
         # 操作按钮
         # 操作按钮
@@ -102,18 +108,23 @@ class PurchaseDetailsWindow(QWidget):
         completion_button.clicked.connect(self.open_completion_screen)
         expense_button = QPushButton("支出情况")
         expense_button.clicked.connect(self.open_expense_screen)
-        bill_button = QPushButton("账单导出")
-        bill_button.clicked.connect(self.export_bill)
+        self.bill_button = QPushButton("账单导出")
+        self.bill_button.clicked.connect(self.export_bill)
+        self.import_button = QPushButton("批量导入")
+        self.import_button.clicked.connect(self.import_purchases)
         button_layout.addWidget(activity_button)
         button_layout.addWidget(add_button)
         button_layout.addWidget(completion_button)
         button_layout.addWidget(expense_button)
-        button_layout.addWidget(bill_button)
+        button_layout.addWidget(self.bill_button)
+        button_layout.addWidget(self.import_button)
         layout.addLayout(button_layout)
 
         self.setLayout(layout)
 
     def open_activity_screen(self):
+        if not self.require_month():
+            return
         from ui.activity_completion import ActivityCompletionWindow  # 改为新文件名
         key = (self.brand.brand_id, self.year, self.month)
         if key in self.activity_windows and self.activity_windows[key].isVisible():
@@ -124,9 +135,11 @@ class PurchaseDetailsWindow(QWidget):
             self.activity_windows[key].show()
 
     def open_expense_screen(self):
+        if not self.require_month():
+            return
         # 新增：支出情况窗口
         try:
-            log_debug("尝试打开支出情况窗口")
+            logger.debug("尝试打开支出情况窗口")
             from ui.expense_info import ExpenseInfoWindow
             key = (self.brand.brand_id, self.year, self.month)
             
@@ -140,47 +153,87 @@ class PurchaseDetailsWindow(QWidget):
                 
             # 创建新窗口或激活现有窗口
             if key not in self.expense_windows:
+                timer = ui_metrics.start("打开支出情况")
                 self.expense_windows[key] = ExpenseInfoWindow(self.brand, self.year, self.month, parent=None)
+                self.expense_windows[key].pending_action = timer
                 self.expense_windows[key].setWindowModality(Qt.ApplicationModal)  # 设置为模态窗口
                 self.expense_windows[key].show()
             else:
                 self.expense_windows[key].activateWindow()
                 self.expense_windows[key].raise_()
                 
-            log_debug(f"支出情况窗口状态: {self.expense_windows[key].isVisible()}")
+            logger.debug("支出情况窗口状态: %s", self.expense_windows[key].isVisible())
             
         except Exception as e:
-            log_debug(f"打开支出情况窗口时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("打开支出情况窗口时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"打开支出情况窗口失败: {str(e)}")
 
 
+    def require_month(self):
+        """活动、完成情况和支出按月计算，选择“全年”时提示先选月份"""
+        if self.month is None:
+            QMessageBox.warning(self, "提示", "请先选择具体月份")
+            return False
+        return True
+
     def export_bill(self):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT p.date, i.item_name, i.spec, p.unit, p.quantity, p.unit_price, p.total_amount, p.remarks
-                FROM purchases p
-                JOIN items i ON p.item_id = i.item_id
-                WHERE p.brand_id = ? AND strftime('%Y', p.date) = ? AND strftime('%m', p.date) = ?
-                ORDER BY p.date
-            """, (self.brand.brand_id, str(self.year), f"{self.month:02d}"))
-            records = cursor.fetchall()
-            conn.close()
-
-            if not records:
+            # 先从月度汇总表判断是否有记录，避免无数据时仍生成空文件
+            if get_purchase_count(self.brand.brand_id, self.year, self.month) == 0:
                 QMessageBox.warning(self, "警告", "没有找到符合条件的记录！")
                 return
 
-            df = pd.DataFrame(records, columns=["日期", "品名", "规格", "单位", "数量", "单价", "金额", "备注"])
-            file_name = f"{self.brand.brand_name}_{self.year}年{self.month}月_进货详情.xlsx"
+            from utils.export import export_purchases
+            period = f"{self.year}年{self.month}月" if self.month else f"{self.year}年"
+            file_name = f"{self.brand.brand_name}_{period}_进货详情.xlsx"
             file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", file_name)
-            df.to_excel(file_path, index=False, engine='openpyxl')
-            QMessageBox.information(self, "成功", f"账单已导出到：{file_path}")
+            self.bill_button.setEnabled(False)
+            self.bill_button.setText("导出中...")
+            db_executor.submit(
+                export_purchases, file_path, [self.brand.brand_id],
+                (self.year, self.month or 1), (self.year, self.month or 12), parent=self
+            ).then(lambda _: self.on_bill_exported(file_path), self.on_bill_export_failed)
         except Exception as e:
-            log_debug(f"导出账单时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("导出账单时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"导出账单失败: {str(e)}")
 
+    def on_bill_exported(self, file_path):
+        self.bill_button.setEnabled(True)
+        self.bill_button.setText("账单导出")
+        QMessageBox.information(self, "成功", f"账单已导出到：{file_path}")
+
+    def on_bill_export_failed(self, error):
+        self.bill_button.setEnabled(True)
+        self.bill_button.setText("账单导出")
+        logger.error("导出账单时发生错误: %s", error)
+        QMessageBox.critical(self, "错误", f"导出账单失败: {str(error)}")
+
+    def import_purchases(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "选择进货记录文件", "", "进货记录 (*.csv *.xlsx);;所有文件 (*)")
+        if not file_path:
+            return
+        from utils.importer import import_purchases
+        self.import_button.setEnabled(False)
+        self.import_button.setText("导入中...")
+        db_executor.submit(
+            import_purchases, file_path, brand_id=self.brand.brand_id, parent=self
+        ).then(self.on_import_finished, self.on_import_failed)
+
+    def on_import_finished(self, report):
+        self.import_button.setEnabled(True)
+        self.import_button.setText("批量导入")
+        if report.rejected:
+            QMessageBox.warning(self, "导入完成", report.summary())
+        else:
+            QMessageBox.information(self, "导入完成", report.summary())
+
+    def on_import_failed(self, error):
+        self.import_button.setEnabled(True)
+        self.import_button.setText("批量导入")
+        logger.error("批量导入时发生错误: %s", error)
+        QMessageBox.critical(self, "错误", f"批量导入失败: {str(error)}")
+
     def setup_date_filter(self):
         date_layout = QHBoxLayout()
         date_layout.addWidget(QLabel("选择月份："))
@@ -196,7 +249,8 @@ class PurchaseDetailsWindow(QWidget):
         # 创建月份选择框
         self.month_combo = QComboBox()
         for month in range(1, 13):
-            self.month_combo.addItem(f"{month:02d}") # 格式化为 01, 02 ...
+            self.month_combo.addItem(f"{month:02d}", month) # 格式化为 01, 02 ...
+        self.month_combo.addItem("全年", None)
         self.month_combo.setCurrentIndex(self.month - 1) # 设置当前月份
         self.month_combo.currentIndexChanged.connect(self.filter_by_date)
 
@@ -208,10 +262,11 @@ class PurchaseDetailsWindow(QWidget):
         return date_layout
 
     def filter_by_date(self):
+        self.track_action(ui_metrics.start("切换月份"))
         # 从下拉框获取新的年月
         self.year = int(self.year_combo.currentText())
-        self.month = int(self.month_combo.currentText())
-        self.current_page = 1
+        self.month = self.month_combo.currentData()  # None 表示全年
+        self.prefetcher.note_request(get_purchases_page, self.brand.brand_id, self.year, self.month, self.fetch_size)
         self.load_purchases()
 
     def setup_context_menu(self):
@@ -231,59 +286,102 @@ class PurchaseDetailsWindow(QWidget):
                 self.edit_purchase(row)
 
     def load_purchases(self):
-        try:
-            self.purchases = []
-            purchase_data, total_records = get_purchases_by_brand(
-                self.brand.brand_id, self.current_page, self.per_page, self.year, self.month
-            )
-            self.total_pages = (total_records + self.per_page - 1) // self.per_page
-            self.page_label.setText(f"第 {self.current_page} 页 / 共 {self.total_pages} 页")
-
-            for data in purchase_data:
-                purchase = Purchase(
-                    purchase_id=data[0], item_id=data[1], brand_id=data[2], quantity=data[3],
-                    unit=data[4], unit_price=data[5], total_amount=data[6], date=data[7],
-                    remarks=data[8], item_name=data[9], spec=data[10]
-                )
-                self.purchases.append(purchase)
-
-            self.table.setRowCount(len(self.purchases))
-            for row, purchase in enumerate(self.purchases):
-                date_str = datetime.datetime.strptime(purchase.date, "%Y-%m-%d").strftime("%Y年%m月%d日")
-                
-                items_to_set = [
-                    date_str, purchase.item_name, str(purchase.spec) if purchase.spec is not None else "", purchase.unit,
-                    str(purchase.quantity), str(purchase.unit_price),
-                    str(purchase.total_amount), purchase.remarks or ""
-                ]
-
-                for col, text in enumerate(items_to_set):
-                    item = QTableWidgetItem(text)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.table.setItem(row, col, item)
-            
-            self.table.resizeColumnsToContents()
-            font_metrics = self.table.fontMetrics()
-            padding = font_metrics.horizontalAdvance('M') * 4 
-            for col in range(self.table.columnCount()):
-                current_width = self.table.columnWidth(col)
-                self.table.setColumnWidth(col, current_width + padding)
-
-        except Exception as e:
-            log_debug(f"加载进货记录时发生错误: {e}\n{traceback.format_exc()}")
-            QMessageBox.critical(self, "错误", f"加载进货记录失败: {str(e)}")
-
-    def prev_page(self):
-        if self.current_page > 1:
-            self.current_page -= 1
-            self.load_purchases()
-
-    def next_page(self):
-        if self.current_page < self.total_pages:
-            self.current_page += 1
-            self.load_purchases()
+        """在数据库线程中读取所选月份（或全年）的第一批记录，其余记录随滚动按需读取"""
+        if self.load_future is not None:
+            self.load_future.cancel()  # 丢弃上一次尚未返回的结果
+        self.prefetch_timer.stop()
+        self.prefetcher.cancel()  # 视图已变，之前排队的预取不再需要
+        self.page_label.setText("加载中...")
+        self.table.setEnabled(False)
+        self.load_future = db_executor.submit(
+            get_purchases_page, self.brand.brand_id, self.year, self.month, self.fetch_size, parent=self
+        ).then(self.on_purchases_loaded, self.on_purchases_failed)
+
+    def on_purchases_loaded(self, result):
+        self.load_future = None
+        self.table.setEnabled(True)
+        rows, total, _, self.last_cursor = result
+        self.model.reset_rows(rows, total, has_more=len(rows) < total)
+        padding = self.table.fontMetrics().horizontalAdvance('M') * 4
+        for col, width in enumerate(estimate_column_widths(self.model, self.table.fontMetrics(), padding=padding)):
+            self.table.setColumnWidth(col, width)
+        self.update_count_label()
+        self.finish_action()
+        self.prefetch_timer.start()
+
+    def on_purchases_failed(self, error):
+        self.load_future = None
+        self.track_action(None)
+        self.table.setEnabled(True)
+        self.update_count_label()
+        QMessageBox.critical(self, "错误", f"加载进货记录失败: {str(error)}")
+
+    def load_more_purchases(self):
+        """视图滚动到底部时由模型触发，读取下一批"""
+        if self.load_future is not None or self.last_cursor is None:
+            self.model.fetch_failed()
+            return
+        self.track_action(ui_metrics.start("加载下一批"))
+        self.prefetcher.note_request(get_purchases_page, self.brand.brand_id, self.year, self.month, self.fetch_size,
+                                     after=self.last_cursor)
+        self.load_future = db_executor.submit(
+            get_purchases_page, self.brand.brand_id, self.year, self.month, self.fetch_size,
+            after=self.last_cursor, parent=self
+        ).then(self.on_more_purchases_loaded, self.on_more_purchases_failed)
+
+    def on_more_purchases_loaded(self, result):
+        self.load_future = None
+        rows, total, _, last_cursor = result
+        if last_cursor is not None:
+            self.last_cursor = last_cursor
+        self.model.total = total
+        self.model.append_rows(rows, has_more=bool(rows) and self.model.rowCount() + len(rows) < total)
+        self.update_count_label()
+        self.finish_action()
+        self.prefetch_timer.start()
+
+    def start_prefetch(self):
+        """当前视图渲染完成后，以低优先级预取下一批和相邻的月份（全年视图时为相邻年份）的第一批"""
+        if self.load_future is not None:
+            return
+        brand_id = self.brand.brand_id
+        if self.model.canFetchMore() and self.last_cursor is not None:
+            self.prefetcher.prefetch(get_purchases_page, brand_id, self.year, self.month, self.fetch_size,
+                                     after=self.last_cursor)
+        if self.month is None:
+            neighbours = [(self.year - 1, None), (self.year + 1, None)]
+        else:
+            neighbours = [(self.year, self.month - 1) if self.month > 1 else (self.year - 1, 12),
+                          (self.year, self.month + 1) if self.month < 12 else (self.year + 1, 1)]
+        for year, month in neighbours:
+            if self.year_combo.findText(str(year)) >= 0:  # 下拉框中没有的年份无法切换到
+                self.prefetcher.prefetch(get_purchases_page, brand_id, year, month, self.fetch_size)
+
+    def on_more_purchases_failed(self, error):
+        self.load_future = None
+        self.track_action(None)
+        self.model.fetch_failed()
+        logger.error("读取更多进货记录时发生错误: %s", error)
+
+    def track_action(self, timer):
+        """开始等待一个操作完成；之前尚未完成的操作被取代，不计入统计"""
+        if self.pending_action is not None:
+            self.pending_action.cancel()
+        self.pending_action = timer
+
+    def finish_action(self):
+        """表格刷新完成：等表格下一次绘制后记下操作耗时"""
+        if self.pending_action is not None:
+            self.pending_action.finish(self.table.viewport())
+            self.pending_action = None
+
+    def update_count_label(self):
+        loaded, total = self.model.rowCount(), self.model.total
+        self.page_label.setText(f"共 {total} 条" if loaded >= total else f"已加载 {loaded} / 共 {total} 条")
 
     def open_activity_screen(self):
+        if not self.require_month():
+            return
         from ui.activity_info import ActivityInfoWindow
         key = (self.brand.brand_id, self.year, self.month)  # 使用 (brand_id, year, month) 作为键
         if key in self.activity_windows and self.activity_windows[key].isVisible():
@@ -292,26 +390,28 @@ class PurchaseDetailsWindow(QWidget):
             self.activity_windows[key].raise_()
         else:
             # 创建新窗口并存储
+            timer = ui_metrics.start("打开活动")
             self.activity_windows[key] = ActivityInfoWindow(self.brand, self.year, self.month, parent=self)
+            self.activity_windows[key].pending_action = timer
             self.activity_windows[key].show()
 
     def add_purchase(self):
         try:
             dialog = AddPurchaseDialog(self.brand.brand_id, self)
             if dialog.exec_():
-                self.load_purchases()
+                self.track_action(dialog.save_timer)  # 表格由变更通知刷新
         except Exception as e:
-            log_debug(f"新增进货记录时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("新增进货记录时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"新增进货记录失败: {str(e)}")
 
     def edit_purchase(self, row):
-        purchase = self.purchases[row]
+        purchase = self.model.purchase_at(row)
         dialog = AddPurchaseDialog(self.brand.brand_id, self, purchase)
         if dialog.exec_():
-            self.load_purchases()
+            self.track_action(dialog.save_timer)  # 表格由变更通知刷新
 
     def delete_purchase(self, row):
-        purchase = self.purchases[row]
+        purchase = self.model.purchase_at(row)
         reply = QMessageBox.question(
             self, "确认删除",
             f"确定删除进货记录 '{purchase.item_name} ({purchase.spec})' 吗？",
@@ -319,41 +419,75 @@ class PurchaseDetailsWindow(QWidget):
         )
         if reply == QMessageBox.Yes:
             try:
-                delete_purchase(purchase.purchase_id)  # 调用 queries.py 的函数
-                self.load_purchases()
+                # 表格由变更通知就地更新
+                if not delete_purchase(purchase.purchase_id):
+                    QMessageBox.critical(self, "错误", "删除失败")
             except Exception as e:
-                log_debug(f"删除进货记录时发生错误: {e}\n{traceback.format_exc()}")
+                logger.exception("删除进货记录时发生错误: %s", e)
                 QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
 
-    def on_cell_double_clicked(self, row, column):
-        if column == 7:
-            self.table.setEditTriggers(QTableWidget.DoubleClicked)
-            self.table.editItem(self.table.item(row, column))
-            self.table.cellChanged.connect(self.on_cell_changed)
-            self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-
-    def on_cell_changed(self, row, column):
+    def on_remarks_edited(self, purchase_id, new_remarks):
         try:
-            if column == 7:
-                purchase = self.purchases[row]
-                new_remarks = self.table.item(row, column).text().strip() or None
-                if new_remarks != purchase.remarks:
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "UPDATE purchases SET remarks = ? WHERE purchase_id = ?",
-                        (new_remarks, purchase.purchase_id)
-                    )
-                    conn.commit()
-                    conn.close()
-                    purchase.remarks = new_remarks
-                    QMessageBox.information(self, "成功", "备注已更新！")
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE purchases SET remarks = ? WHERE purchase_id = ?",
+                (new_remarks, purchase_id)
+            )
+            conn.commit()
+            conn.close()
+            result_cache.bump()  # 备注只在本窗口显示且已就地更新，不发布变更通知
+            QMessageBox.information(self, "成功", "备注已更新！")
         except Exception as e:
-            log_debug(f"更新备注时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("更新备注时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"更新备注失败: {str(e)}")
+            self.load_purchases()
+
+    def view_prefix(self):
+        """当前视图内记录日期的前缀：'YYYY-MM'（某月）或 'YYYY-'（全年）"""
+        return month_key(self.year, self.month) if self.month is not None else f"{self.year:04d}-"
+
+    def on_data_changed(self, changes):
+        """本品牌的进货有变化：单条记录的增删改只读取这几行就地更新，批量变化整体重新加载
+
+        编辑时记录的旧月份和新月份各有一条变更，只要其中之一在当前视图内就需要处理；
+        正在加载时直接重新加载，避免就地更新与加载结果交错。
+        """
+        prefix = self.view_prefix()
+        changes = [change for change in changes if change.ym is None or change.ym.startswith(prefix)]
+        if not changes:
+            return
+        purchase_ids = {change.row_id for change in changes}
+        if None in purchase_ids or len(purchase_ids) > PATCH_LIMIT or self.load_future is not None:
+            self.load_purchases()
+            return
+        self.load_future = db_executor.submit(
+            load_changed_purchases, sorted(purchase_ids), self.brand.brand_id, self.year, self.month, parent=self
+        ).then(lambda result: self.on_changed_purchases_loaded(purchase_ids, result), self.on_patch_failed)
+
+    def on_changed_purchases_loaded(self, purchase_ids, result):
+        self.load_future = None
+        rows, total = result
+        prefix = self.view_prefix()
+        for purchase_id in sorted(purchase_ids):
+            row = rows.get(purchase_id)
+            if row is not None and (row[2] != self.brand.brand_id or not str(row[7]).startswith(prefix)):
+                row = None  # 已移出当前视图
+            self.model.patch_row(purchase_id, row)
+        self.model.total = total
+        self.update_count_label()
+        self.finish_action()
+
+    def on_patch_failed(self, error):
+        self.load_future = None
+        logger.warning("读取变更的进货记录失败，重新加载: %s", error)
+        self.load_purchases()
 
     def closeEvent(self, event):
         """从 AddBrandWindow 的跟踪列表中移除自身"""
+        self.change_subscription.cancel()
+        self.prefetch_timer.stop()
+        self.prefetcher.close()
         parent = self.parent()
         if parent and hasattr(parent, 'purchase_windows'):
             if self in parent.purchase_windows:
@@ -361,6 +495,8 @@ class PurchaseDetailsWindow(QWidget):
         super().closeEvent(event)
 
     def open_completion_screen(self):
+        if not self.require_month():
+            return
         from ui.activity_completion import ActivityCompletionWindow
         key = (self.brand.brand_id, self.year, self.month)
         if key in self.completion_windows:
@@ -371,7 +507,9 @@ class PurchaseDetailsWindow(QWidget):
                     return
             except RuntimeError:
                 del self.completion_windows[key]  # 移除已删除的无效引用
+        timer = ui_metrics.start("打开活动完成情况")
         self.completion_windows[key] = ActivityCompletionWindow(self.brand, self.year, self.month, parent=None)
+        self.completion_windows[key].pending_action = timer
         self.completion_windows[key].setWindowModality(Qt.ApplicationModal)
         self.completion_windows[key].show()
 
@@ -381,12 +519,16 @@ class AddPurchaseDialog(QDialog):
         super().__init__(parent)
         self.brand_id = brand_id
         self.purchase = purchase
-        self.items = self.get_items_for_brand()
+        self.items = item_catalog.items(brand_id)
         self.current_step = 0
         self.item_id = None
         self.selected_item = None
         
-        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model = ItemSearchProxyModel(brand_id, self)
+        self.search_timer = QTimer(self)  # 输入停顿后再搜索
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search)
         
         self.setWindowTitle("新增进货记录" if not purchase else "修改进货记录")
         self.init_ui()
@@ -414,29 +556,6 @@ class AddPurchaseDialog(QDialog):
         self.date_input.setDate(date)
         self.remarks_input.setText(self.purchase.remarks or "")
 
-    def get_items_for_brand(self):
-        try:
-            if not os.path.exists(DB_PATH):
-                log_debug(f"数据库文件不存在: {DB_PATH}")
-                raise FileNotFoundError(f"数据库文件不存在: {DB_PATH}")
-            
-            with get_connection() as conn:  # 使用 with 语句自动管理连接
-                cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    SELECT i.item_id, i.item_name, i.spec, i.unit
-                    FROM items i
-                    WHERE i.brand_id = ?
-                    """,
-                    (self.brand_id,)
-                )
-                items = cursor.fetchall()
-                log_debug(f"获取品牌 {self.brand_id} 的相关品类: {items}")
-                return items
-        except Exception as e:
-            log_debug(f"获取品牌相关品类时发生错误: {e}\n{traceback.format_exc()}")
-            return []
-
     def init_ui(self):
         self.main_layout = QVBoxLayout()
         self.stack = QStackedWidget()
@@ -461,19 +580,7 @@ class AddPurchaseDialog(QDialog):
         self.existing_item_combo.setInsertPolicy(QComboBox.NoInsert)
         self.existing_item_combo.lineEdit().setPlaceholderText("输入关键字进行搜索...")
 
-        self.existing_item_model = QStandardItemModel()
-        for item_id, item_name, spec, unit in self.items:
-            display_text = f"{item_name} ({spec}, {unit})"
-            model_item = QStandardItem(display_text)
-            model_item.setData(item_id, Qt.UserRole)
-            model_item.setData(item_name, Qt.UserRole + 1)
-            model_item.setData(spec, Qt.UserRole + 2)
-            model_item.setData(unit, Qt.UserRole + 3)
-            self.existing_item_model.appendRow(model_item)
-
-        self.proxy_model.setSourceModel(self.existing_item_model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
-        self.proxy_model.setFilterKeyColumn(0)
+        self.existing_item_model = item_catalog.model(self.brand_id)  # 按品牌共享，目录已缓存时不查询数据库
 
         self.existing_item_combo.setModel(self.proxy_model)
         self.existing_item_combo.setCurrentIndex(-1) # 默认不选中
@@ -595,10 +702,11 @@ class AddPurchaseDialog(QDialog):
 
     def on_new_or_existing_changed(self, index):
         try:
-            log_debug(f"用户选择: 新增/已有选项 = {index}")
+            logger.debug("用户选择: 新增/已有选项 = %s", index)
             if index == 1:  # 已有品类
                 self.current_step = 1
-                self.proxy_model.setFilterFixedString("")
+                self.search_timer.stop()
+                self.proxy_model.set_query("")
                 self.existing_item_combo.lineEdit().clear()
                 if not self.items:
                     QMessageBox.information(self, "提示", "当前品牌没有可用品类，请先添加品类！")
@@ -612,46 +720,49 @@ class AddPurchaseDialog(QDialog):
             self.stack.setCurrentIndex(self.current_step)
             self.prev_button.setEnabled(self.current_step > 0)
         except Exception as e:
-            log_debug(f"处理品类选择变化时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("处理品类选择变化时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"切换品类选择失败: {str(e)}")
 
     def on_search_text_changed(self, text):
-        """处理搜索文本变化，确保不自动填充（借鉴自activity_info.py的稳定实现）"""
+        """处理搜索文本变化：立即清除已选品类，停止输入 SEARCH_DEBOUNCE_MS 后再搜索"""
         try:
-            log_debug(f"搜索文本变化: {text}")
-            
-            current_text = self.existing_item_combo.lineEdit().text()
-            cursor_pos = self.existing_item_combo.lineEdit().cursorPosition()
-
-            # 过滤模型并重置状态
-            self.proxy_model.setFilterFixedString(text)
+            logger.debug("搜索文本变化: %s", text)
             self.next_button.setEnabled(False)
-            self.selected_item = None 
+            self.selected_item = None
+            self.search_timer.start()
+        except Exception as e:
+            logger.exception("on_search_text_changed 错误: %s", e)
+            QMessageBox.critical(self, "错误", f"搜索时发生错误: {str(e)}")
+
+    def apply_search(self):
+        """按当前输入搜索品类（相关度和常用程度排序，支持拼音首字母），并显示或隐藏下拉列表"""
+        try:
+            line_edit = self.existing_item_combo.lineEdit()
+            current_text = line_edit.text()
+            cursor_pos = line_edit.cursorPosition()
+
+            # 模型重置会清空编辑框，使用信号阻断恢复用户输入的文本和光标位置，防止递归调用
+            line_edit.blockSignals(True)
+            self.proxy_model.set_query(current_text)
+            if line_edit.text() != current_text:
+                line_edit.setText(current_text)
+                line_edit.setCursorPosition(cursor_pos)
+            line_edit.blockSignals(False)
 
             # 根据搜索结果显示或隐藏下拉列表
-            if text and self.proxy_model.rowCount() > 0:
+            if current_text and self.proxy_model.rowCount() > 0:
                 self.existing_item_combo.showPopup()
             else:
                 self.existing_item_combo.hidePopup()
-            
-            # --- 核心修正：使用信号阻断，防止递归调用导致闪退 ---
-            self.existing_item_combo.lineEdit().blockSignals(True)
-            # 如果自动补全器修改了文本，则强制恢复用户输入的文本和光标位置
-            if self.existing_item_combo.lineEdit().text() != current_text:
-                self.existing_item_combo.lineEdit().setText(current_text)
-                self.existing_item_combo.lineEdit().setCursorPosition(cursor_pos)
-            self.existing_item_combo.lineEdit().blockSignals(False)
-            # --- 修正结束 ---
-                
         except Exception as e:
-            log_debug(f"on_search_text_changed 错误: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("apply_search 错误: %s", e)
             QMessageBox.critical(self, "错误", f"搜索时发生错误: {str(e)}")
 
 
     def on_item_selected(self, index):
         """处理用户选择品类后的操作"""
         try:
-            log_debug(f"用户选择索引: {index}")
+            logger.debug("用户选择索引: %s", index)
             
             if index < 0:
                 self.next_button.setEnabled(False)
@@ -671,7 +782,7 @@ class AddPurchaseDialog(QDialog):
                 self.existing_item_combo.lineEdit().setText(display_text)
                 self.existing_item_combo.lineEdit().blockSignals(False)
                 
-                log_debug(f"用户选择了: {display_text}")
+                logger.debug("用户选择了: %s", display_text)
                 
                 self.selected_item = {
                     "item_id": item.data(Qt.UserRole),
@@ -690,7 +801,7 @@ class AddPurchaseDialog(QDialog):
 
                 
         except Exception as e:
-            log_debug(f"on_item_selected 错误: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("on_item_selected 错误: %s", e)
             self.next_button.setEnabled(False)
 
     def next_step(self):
@@ -749,7 +860,7 @@ class AddPurchaseDialog(QDialog):
             self.prev_button.setEnabled(True)
             self.next_button.setText("确定" if self.current_step == 7 else "下一步")
         except Exception as e:
-            log_debug(f"点击‘下一步’时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("点击‘下一步’时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"操作失败: {str(e)}")
 
     def prev_step(self):
@@ -774,15 +885,17 @@ class AddPurchaseDialog(QDialog):
                     self.next_button.setEnabled(False)
 
         except Exception as e:
-            log_debug(f"点击‘上一步’时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("点击‘上一步’时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"操作失败: {str(e)}")
 
     def save_purchase(self):
+        self.save_timer = ui_metrics.start("保存进货")  # 由进货详情窗口在表格刷新后结束计时
         try:
             if not os.path.exists(DB_PATH):
-                log_debug(f"数据库文件不存在: {DB_PATH}")
+                logger.error("数据库文件不存在: %s", DB_PATH)
                 raise FileNotFoundError(f"数据库文件不存在: {DB_PATH}")
 
+            new_item = None
             with get_connection() as conn:  # 使用 with 语句
                 cursor = conn.cursor()
 
@@ -804,6 +917,7 @@ class AddPurchaseDialog(QDialog):
                                 (item_name, spec, unit, self.brand_id)
                             )
                             self.item_id = cursor.lastrowid
+                            new_item = (self.item_id, item_name, spec, unit)
                     except sqlite3.IntegrityError:
                         raise Exception("无法创建或找到商品")
                 else:
@@ -826,6 +940,7 @@ class AddPurchaseDialog(QDialog):
                         (self.item_id, self.brand_id, quantity, unit, unit_price, total_amount,
                         date, remarks, self.purchase.purchase_id)
                     )
+                    purchase_id = self.purchase.purchase_id
                 else:
                     cursor.execute(
                         """
@@ -836,9 +951,21 @@ class AddPurchaseDialog(QDialog):
                         (self.item_id, self.brand_id, quantity, unit, unit_price, total_amount,
                         date, remarks)
                     )
+                    purchase_id = cursor.lastrowid
                 # 提交事务由 with 语句自动处理
-            QMessageBox.information(self, "成功", "进货记录保存成功！")
+            result_cache.bump()
+            if new_item:
+                catalog_add_item(self.brand_id, *new_item)
+            item_catalog.record_use(self.brand_id, self.item_id)
+            with self.save_timer.paused():
+                QMessageBox.information(self, "成功", "进货记录保存成功！")
             self.accept()
+            # 关闭对话框后再通知，进货详情窗口在下一轮事件循环中只读取这一行就地更新，计入保存耗时
+            if new_item:
+                change_bus.items_changed(self.brand_id)
+            change_bus.purchases_changed(self.brand_id, date[:7], purchase_id)
+            if self.purchase and str(self.purchase.date)[:7] != date[:7]:
+                change_bus.purchases_changed(self.brand_id, str(self.purchase.date)[:7], purchase_id)
         except Exception as e:
-            log_debug(f"保存进货记录时发生错误: {e}\n{traceback.format_exc()}")
+            logger.exception("保存进货记录时发生错误: %s", e)
             QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
@@ -0,0 +1,284 @@
+"""表格数据模型：按列存储查询结果，显示文本在 data() 中按需生成，配合 QTableView 只渲染可见行"""
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from models.purchase import Purchase
+
+# get_purchases_page 返回的列顺序
+PURCHASE_FIELDS = ("purchase_id", "item_id", "brand_id", "quantity", "unit", "unit_price",
+                   "total_amount", "date", "remarks", "item_name", "spec")
+DATE_FIELD = PURCHASE_FIELDS.index("date")
+
+
+def format_date(value):
+    """'YYYY-MM-DD' -> 'YYYY年MM月DD日'，直接切片，避免 strptime/strftime"""
+    return f"{value[:4]}年{value[5:7]}月{value[8:10]}日" if value else ""
+
+
+def format_value(value):
+    return "" if value is None else str(value)
+
+
+def estimate_column_widths(model, font_metrics, sample=50, padding=0):
+    """按表头和前 sample 行的显示文本估算列宽，代替逐行测量的 resizeColumnsToContents"""
+    rows = min(sample, model.rowCount())
+    widths = []
+    for col in range(model.columnCount()):
+        texts = [model.headerData(col, Qt.Horizontal) or ""]
+        texts += [model.data(model.index(row, col)) or "" for row in range(rows)]
+        widths.append(max(font_metrics.horizontalAdvance(text) for text in texts) + padding)
+    return widths
+
+
+class PurchaseTableModel(QAbstractTableModel):
+    """进货记录模型
+
+    数据由窗口分批查询后通过 reset_rows/append_rows 填入；视图滚动到底部时 fetchMore 发出
+    fetch_more_requested，由窗口异步查询下一批再 append_rows。增删改单条记录后用 patch_row 就地更新。
+    备注列可编辑，修改后发出 remarks_edited(purchase_id, 新备注)，由窗口负责写库。
+    """
+    HEADERS = ["日期", "品名", "规格", "单位", "数量", "单价", "金额", "备注"]
+    # 表头列 -> (存储列号, 格式化函数)
+    COLUMNS = (
+        (PURCHASE_FIELDS.index("date"), format_date),
+        (PURCHASE_FIELDS.index("item_name"), format_value),
+        (PURCHASE_FIELDS.index("spec"), format_value),
+        (PURCHASE_FIELDS.index("unit"), format_value),
+        (PURCHASE_FIELDS.index("quantity"), format_value),
+        (PURCHASE_FIELDS.index("unit_price"), format_value),
+        (PURCHASE_FIELDS.index("total_amount"), format_value),
+        (PURCHASE_FIELDS.index("remarks"), format_value),
+    )
+    REMARKS_COLUMN = 7
+
+    fetch_more_requested = pyqtSignal()
+    remarks_edited = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = [[] for _ in PURCHASE_FIELDS]
+        self._has_more = False
+        self._fetching = False
+        self.total = 0
+
+    # ---- 数据填充 ----
+    def reset_rows(self, rows, total, has_more):
+        """替换全部数据"""
+        self.beginResetModel()
+        self._columns = [[] for _ in PURCHASE_FIELDS]
+        self._extend(rows)
+        self.total = total
+        self._has_more = has_more
+        self._fetching = False
+        self.endResetModel()
+
+    def append_rows(self, rows, has_more):
+        """追加 fetchMore 取回的一批数据"""
+        self._fetching = False
+        self._has_more = has_more
+        if rows:
+            first = self.rowCount()
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._extend(rows)
+            self.endInsertRows()
+
+    def fetch_failed(self):
+        """下一批读取失败时调用，允许视图再次触发 fetchMore"""
+        self._fetching = False
+
+    def patch_row(self, purchase_id, row):
+        """就地应用单条记录的变化，保持 (date, purchase_id) 顺序
+
+        row 为 None 表示记录已删除或不再属于当前视图。新位置在已加载范围之后、且还有未加载的数据时
+        不插入，由之后的 fetchMore 按键集游标读到。总条数由调用方更新。
+        """
+        current = self.row_of(purchase_id)
+        if current >= 0 and row is not None and self._fits_at(current, row):
+            for column, value in zip(self._columns, row):
+                column[current] = value
+            self.dataChanged.emit(self.index(current, 0), self.index(current, self.columnCount() - 1))
+            return
+        if current >= 0:
+            self.beginRemoveRows(QModelIndex(), current, current)
+            for column in self._columns:
+                del column[current]
+            self.endRemoveRows()
+        if row is None:
+            return
+        position = self._position(row)
+        if position == self.rowCount() and self._has_more:
+            return
+        self.beginInsertRows(QModelIndex(), position, position)
+        for column, value in zip(self._columns, row):
+            column.insert(position, value)
+        self.endInsertRows()
+
+    def row_of(self, purchase_id):
+        """purchase_id 所在的行号，未加载时返回 -1"""
+        try:
+            return self._columns[0].index(purchase_id)
+        except ValueError:
+            return -1
+
+    def _key(self, position):
+        return self._columns[DATE_FIELD][position], self._columns[0][position]
+
+    def _fits_at(self, position, row):
+        """row 放在 position 处是否仍然有序（修改日期后可能需要移动）"""
+        key = (row[DATE_FIELD], row[0])
+        return ((position == 0 or self._key(position - 1) < key)
+                and (position == self.rowCount() - 1 or key < self._key(position + 1)))
+
+    def _position(self, row):
+        """按 (date, purchase_id) 二分查找 row 的插入位置"""
+        key = (row[DATE_FIELD], row[0])
+        low, high = 0, self.rowCount()
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _extend(self, rows):
+        for column, values in zip(self._columns, zip(*rows)):
+            column.extend(values)
+
+    # ---- QAbstractTableModel 接口 ----
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            field, formatter = self.COLUMNS[index.column()]
+            return formatter(self._columns[field][index.row()])
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == self.REMARKS_COLUMN:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid() or index.column() != self.REMARKS_COLUMN:
+            return False
+        remarks_field = PURCHASE_FIELDS.index("remarks")
+        new_remarks = str(value).strip() or None
+        if new_remarks == self._columns[remarks_field][index.row()]:
+            return False
+        self._columns[remarks_field][index.row()] = new_remarks
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        self.remarks_edited.emit(self._columns[0][index.row()], new_remarks)
+        return True
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._fetching = True
+            self.fetch_more_requested.emit()
+
+    # ---- 辅助方法 ----
+    def purchase_at(self, row):
+        """第 row 行对应的 Purchase 对象（修改、删除时按需构造）"""
+        return Purchase(**{field: self._columns[i][row] for i, field in enumerate(PURCHASE_FIELDS)})
+
+
+class ActivityTableModel(QAbstractTableModel):
+    """单品活动模型，行数据为 get_monthly_activities 返回的元组；最后一列由 ButtonDelegate 绘制删除按钮"""
+    HEADERS = ["商品名称", "规格", "活动类型", "需总销量", "需单品销量", "目标值", "原价", "优惠价", "操作"]
+    ACTION_COLUMN = 8
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    @staticmethod
+    def _accepts(activity, seen_items):
+        """总目标行和已显示商品的重复活动不显示"""
+        item_id = activity[2]
+        return not activity[1] and not (item_id and item_id in seen_items)
+
+    def reset_activities(self, activities):
+        """替换全部单品活动（总目标行和同一商品的重复活动被跳过）"""
+        rows, seen_items = [], set()
+        for activity in activities:
+            if not self._accepts(activity, seen_items):
+                continue
+            seen_items.add(activity[2])
+            rows.append(activity)
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def add_activity(self, activity):
+        """在末尾插入一行，跳过规则与 reset_activities 相同；返回是否插入"""
+        if not self._accepts(activity, {row[2] for row in self._rows}):
+            return False
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append(activity)
+        self.endInsertRows()
+        return True
+
+    def remove_activity(self, activity_id):
+        """按活动 ID 移除一行，返回是否找到"""
+        for row, activity in enumerate(self._rows):
+            if activity[0] == activity_id:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+                return True
+        return False
+
+    def activity_id_at(self, row):
+        return self._rows[row][0]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            (_, _, _, activity_type, need_total, need_item, target_value,
+             original_price, discount_price, item_name, spec, _) = self._rows[index.row()]
+            return (
+                item_name or "",
+                format_value(spec),
+                activity_type or "",
+                "是" if need_total else "否",
+                "是" if need_item else "否",
+                str(target_value),
+                str(original_price or ""),
+                str(discount_price or ""),
+                "删除",
+            )[index.column()]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
@@ -0,0 +1,131 @@
+"""进货账单导出：游标 fetchmany 逐批读取，流式写入 openpyxl 只写工作簿或 CSV
+
+支持跨月区间和多品牌（xlsx 每个品牌一个工作表，CSV 增加“品牌”列）。
+先写入同目录下的临时文件，完成后 os.replace 原子替换目标文件，导出中断不会留下半个文件。
+用法（命令行）：python -m utils.export 输出.xlsx --brand-id 1 --start 2024-01 [--end 2024-12]
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.queries import get_all_brands, iter_purchases_for_export
+from database.period import span_range
+
+EXPORT_COLUMNS = ["日期", "品名", "规格", "单位", "数量", "单价", "金额", "备注"]
+FETCH_SIZE = 5000
+EXCEL_MAX_ROWS = 1048576  # 单个工作表的行数上限（含表头）
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def sheet_title(name, used):
+    """生成合法且不重复的工作表名（最长 31 个字符）"""
+    base = INVALID_SHEET_CHARS.sub("_", str(name)).strip("'") or "Sheet"
+    title = base[:31]
+    index = 2
+    while title in used:
+        suffix = f"({index})"
+        title = base[:31 - len(suffix)] + suffix
+        index += 1
+    used.add(title)
+    return title
+
+
+def _write_xlsx(path, brands, start, end, fetch_size, progress):
+    from openpyxl import Workbook  # 仅在导出 Excel 时加载
+    workbook = Workbook(write_only=True)
+    used_titles = set()
+    total = 0
+    for brand_id, brand_name in brands:
+        sheet = workbook.create_sheet(sheet_title(brand_name, used_titles))
+        sheet.append(EXPORT_COLUMNS)
+        sheet_rows = 1
+        for row in iter_purchases_for_export(brand_id, start, end, fetch_size):
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                # 超出单表上限时续写到新工作表
+                sheet = workbook.create_sheet(sheet_title(brand_name, used_titles))
+                sheet.append(EXPORT_COLUMNS)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+            total += 1
+            if progress and total % fetch_size == 0:
+                progress(total)
+    if not used_titles:
+        workbook.create_sheet("Sheet").append(EXPORT_COLUMNS)
+    workbook.save(path)
+    return total
+
+
+def _write_csv(path, brands, start, end, fetch_size, progress):
+    multi_brand = len(brands) > 1
+    total = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:  # 带 BOM，Excel 直接打开不乱码
+        writer = csv.writer(f)
+        writer.writerow((["品牌"] if multi_brand else []) + EXPORT_COLUMNS)
+        for brand_id, brand_name in brands:
+            rows = iter_purchases_for_export(brand_id, start, end, fetch_size)
+            if multi_brand:
+                rows = ((brand_name,) + row for row in rows)
+            for row in rows:
+                writer.writerow(row)
+                total += 1
+                if progress and total % fetch_size == 0:
+                    progress(total)
+    return total
+
+
+def export_purchases(path, brand_ids, start, end=None, fmt=None, fetch_size=FETCH_SIZE, progress=None):
+    """导出进货记录，返回导出的行数
+
+    brand_ids 为品牌 ID 列表，start/end 为 (年, 月)，首尾均包含，end 省略时只导出 start 当月。
+    fmt 为 "xlsx" 或 "csv"，省略时按文件扩展名判断；progress(已写行数) 每写满一批回调一次。
+    """
+    fmt = (fmt or Path(path).suffix.lstrip(".")).lower()
+    if fmt not in ("xlsx", "csv"):
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    end = end or start
+    date_start, date_end = span_range(*start, *end)
+    names = dict(get_all_brands())
+    brands = [(brand_id, names.get(brand_id, str(brand_id))) for brand_id in brand_ids]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(suffix=f".{fmt}.tmp", dir=directory)
+    os.close(fd)
+    try:
+        writer = _write_xlsx if fmt == "xlsx" else _write_csv
+        total = writer(temp_path, brands, date_start, date_end, fetch_size, progress)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if progress:
+        progress(total)
+    return total
+
+
+def parse_month(text):
+    year, month = text.split("-")
+    return int(year), int(month)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出进货记录（xlsx/CSV）")
+    parser.add_argument("path")
+    parser.add_argument("--brand-id", type=int, action="append", required=True, help="可重复指定多个品牌")
+    parser.add_argument("--start", type=parse_month, required=True, help="起始月份 YYYY-MM")
+    parser.add_argument("--end", type=parse_month, default=None, help="结束月份 YYYY-MM，默认与起始月份相同")
+    args = parser.parse_args()
+    total = export_purchases(args.path, args.brand_id, args.start, args.end)
+    print(f"已导出 {total} 行到 {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""进货记录批量导入：流式读取 CSV/xlsx，内存中解析商品，按批 executemany 写入
+
+用法（命令行）：python -m utils.importer 文件.csv --brand-id 1
+被拒绝的行会连同行号和原因写入错误文件（默认与源文件同目录，文件名追加 _errors.csv）。
+"""
+import argparse
+import csv
+import datetime
+import logging
+import os
+import sys
+from pathlib import Path
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.queries import get_connection, invalidate_item_catalog
+from database import result_cache, change_bus
+from database.db_setup import MONTHLY_AGG_INSERT_TRIGGER
+
+logger = logging.getLogger(__name__)
+
+# 表头别名 -> 字段名，中文表头与账单导出的列名一致
+HEADER_ALIASES = {
+    "日期": "date", "date": "date",
+    "品名": "item_name", "商品名称": "item_name", "item_name": "item_name",
+    "规格": "spec", "spec": "spec",
+    "单位": "unit", "unit": "unit",
+    "数量": "quantity", "quantity": "quantity",
+    "单价": "unit_price", "unit_price": "unit_price",
+    "金额": "total_amount", "total_amount": "total_amount",
+    "备注": "remarks", "remarks": "remarks",
+    "品牌": "brand", "brand": "brand", "brand_id": "brand", "brand_name": "brand",
+}
+REQUIRED_FIELDS = ("date", "item_name", "spec", "unit", "quantity", "unit_price")
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y年%m月%d日", "%Y%m%d")
+DEFAULT_BATCH_SIZE = 50000
+
+INSERT_PURCHASE_SQL = """
+    INSERT INTO purchases (item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_MONTHLY_AGG_SQL = """
+    INSERT INTO purchase_monthly_agg (brand_id, item_id, ym, qty, amount, row_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (brand_id, ym, item_id) DO UPDATE SET
+        qty = qty + excluded.qty,
+        amount = amount + excluded.amount,
+        row_count = row_count + excluded.row_count
+"""
+
+
+class ImportReport:
+    """导入结果统计"""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.new_items = 0
+        self.brand_ids = set()
+        self.error_path = None
+
+    def summary(self):
+        text = f"共 {self.total_rows} 行，导入 {self.imported} 行，新增品类 {self.new_items} 个，拒绝 {self.rejected} 行"
+        if self.rejected and self.error_path:
+            text += f"\n错误明细：{self.error_path}"
+        return text
+
+
+def iter_csv_rows(path):
+    """逐行读取 CSV（兼容带 BOM 的 UTF-8，失败时回退 GBK）"""
+    for encoding in ("utf-8-sig", "gbk"):
+        try:
+            with open(path, newline="", encoding=encoding) as f:
+                f.readline()
+            break
+        except UnicodeDecodeError:
+            continue
+    with open(path, newline="", encoding=encoding) as f:
+        yield from csv.reader(f)
+
+
+def iter_xlsx_rows(path):
+    """以只读模式逐行读取 xlsx 的第一个工作表"""
+    from openpyxl import load_workbook  # 仅在导入 Excel 时加载
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def iter_rows(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        return iter_xlsx_rows(path)
+    if suffix in (".csv", ".txt"):
+        return iter_csv_rows(path)
+    raise ValueError(f"不支持的文件类型: {suffix}")
+
+
+def parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        return datetime.date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS[1:]:
+        try:
+            return datetime.datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的日期: {text}")
+
+
+def parse_positive_int(value, label):
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"{label}必须为数字: {value}")
+    if number <= 0 or number != int(number):
+        raise ValueError(f"{label}必须为正整数: {value}")
+    return int(number)
+
+
+def parse_positive_float(value, label):
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"{label}必须为数字: {value}")
+    if number <= 0:
+        raise ValueError(f"{label}必须大于 0: {value}")
+    return number
+
+
+class PurchaseImporter:
+    """把行数据解析为 purchases 记录；商品字典和品牌字典只在开始时读取一次"""
+
+    def __init__(self, conn, brand_id=None):
+        self.conn = conn
+        self.brand_id = brand_id
+        self.items = {
+            (brand, name, spec, unit): item_id
+            for item_id, name, spec, unit, brand in conn.execute(
+                "SELECT item_id, item_name, spec, unit, brand_id FROM items")
+        }
+        self.brands_by_name = {name: bid for bid, name in conn.execute("SELECT brand_id, brand_name FROM brands")}
+        self.brand_ids = set(self.brands_by_name.values())
+        self.new_items = 0
+        self.dates = {}  # 原始日期文本 -> 'YYYY-MM-DD'，同一文件中的日期取值很少
+
+    def parse_date(self, value):
+        date = self.dates.get(value)
+        if date is None:
+            date = self.dates[value] = parse_date(value)
+        return date
+
+    def resolve_brand(self, value):
+        if self.brand_id is not None:
+            return self.brand_id
+        if value is None or str(value).strip() == "":
+            raise ValueError("缺少品牌")
+        text = str(value).strip()
+        if text in self.brands_by_name:
+            return self.brands_by_name[text]
+        if text.isdigit() and int(text) in self.brand_ids:
+            return int(text)
+        raise ValueError(f"未知品牌: {text}")
+
+    def resolve_item(self, brand_id, item_name, spec, unit):
+        key = (brand_id, item_name, spec, unit)
+        item_id = self.items.get(key)
+        if item_id is None:
+            cursor = self.conn.execute(
+                "INSERT INTO items (item_name, spec, unit, brand_id) VALUES (?, ?, ?, ?)",
+                (item_name, spec, unit, brand_id)
+            )
+            item_id = self.items[key] = cursor.lastrowid
+            self.new_items += 1
+        return item_id
+
+    def parse(self, record):
+        """record 为 {字段名: 原始值}，返回 purchases 插入参数"""
+        item_name = str(record.get("item_name") or "").strip()
+        unit = str(record.get("unit") or "").strip()
+        if not item_name:
+            raise ValueError("品名不能为空")
+        if not unit:
+            raise ValueError("单位不能为空")
+        spec = parse_positive_int(record.get("spec"), "规格")
+        quantity = parse_positive_int(record.get("quantity"), "数量")
+        unit_price = parse_positive_float(record.get("unit_price"), "单价")
+        date = self.parse_date(record.get("date"))
+        total_amount = record.get("total_amount")
+        if total_amount is None or str(total_amount).strip() == "":
+            total_amount = quantity * unit_price
+        else:
+            total_amount = parse_positive_float(total_amount, "金额")
+        remarks = record.get("remarks")
+        remarks = str(remarks).strip() or None if remarks is not None else None
+        brand_id = self.resolve_brand(record.get("brand"))
+        item_id = self.resolve_item(brand_id, item_name, spec, unit)
+        return (item_id, brand_id, quantity, unit, unit_price, total_amount, date, remarks)
+
+
+def map_header(header):
+    """把表头映射为字段名，返回 [(列号, 字段名)]"""
+    columns = []
+    for index, name in enumerate(header):
+        field = HEADER_ALIASES.get(str(name).strip().lower() if name is not None else "")
+        if field is None and name is not None:
+            field = HEADER_ALIASES.get(str(name).strip())
+        if field:
+            columns.append((index, field))
+    missing = [f for f in REQUIRED_FIELDS if f not in {field for _, field in columns}]
+    if missing:
+        raise ValueError(f"文件缺少必需的列: {', '.join(missing)}")
+    return columns
+
+
+def import_purchases(path, brand_id=None, batch_size=DEFAULT_BATCH_SIZE, error_path=None, progress=None):
+    """导入进货记录文件，返回 ImportReport
+
+    brand_id 为空时文件必须包含“品牌”列（品牌名称或 ID）。每 batch_size 行提交一次事务，
+    progress(已处理行数) 在每批提交后回调。
+    """
+    report = ImportReport()
+    rows = iter_rows(path)
+    try:
+        header = next(rows)
+    except StopIteration:
+        return report
+    columns = map_header(header)
+    field_names = [field for _, field in columns]
+
+    if error_path is None:
+        source = Path(path)
+        error_path = str(source.with_name(f"{source.stem}_errors.csv"))
+    error_file = None
+    error_writer = None
+
+    conn = get_connection()
+    importer = PurchaseImporter(conn, brand_id)
+    batch = []
+    try:
+        conn.execute("BEGIN")
+        for line_no, row in enumerate(rows, start=2):
+            if not row or all(value is None or str(value).strip() == "" for value in row):
+                continue
+            report.total_rows += 1
+            record = {field: (row[index] if index < len(row) else None) for index, field in columns}
+            try:
+                batch.append(importer.parse(record))
+            except ValueError as e:
+                report.rejected += 1
+                if error_writer is None:
+                    error_file = open(error_path, "w", newline="", encoding="utf-8-sig")
+                    error_writer = csv.writer(error_file)
+                    error_writer.writerow(["行号", "错误原因"] + field_names)
+                error_writer.writerow([line_no, str(e)] + [record[f] for f in field_names])
+                continue
+
+            if len(batch) >= batch_size:
+                report.imported += _flush(conn, batch, report)
+                conn.commit()
+                conn.execute("BEGIN")
+                if progress:
+                    progress(report.total_rows)
+        if batch:
+            report.imported += _flush(conn, batch, report)
+        conn.commit()
+        if progress:
+            progress(report.total_rows)
+    except Exception:
+        logger.exception("导入进货记录失败: %s", path)
+        raise
+    finally:
+        conn.close()  # 回滚未提交的批次
+        if error_file:
+            error_file.close()
+        report.new_items = importer.new_items
+        if report.imported or importer.new_items:
+            result_cache.bump()
+        for touched in report.brand_ids:
+            change_bus.purchases_changed(touched)  # 一个品牌只通知一次，不按行通知
+        if importer.new_items:
+            for touched in report.brand_ids:
+                invalidate_item_catalog(touched)
+                change_bus.items_changed(touched)
+
+    report.error_path = error_path if report.rejected else None
+    return report
+
+
+def _flush(conn, batch, report):
+    """写入一批记录
+
+    逐行触发器会让每条进货都多做一次汇总表 upsert，这里在同一事务内先移除插入触发器，
+    按 (品牌, 商品, 月份) 预先合计后一次更新汇总表，再恢复触发器；事务回滚时触发器随之恢复。
+    批内按 (品牌, 日期) 稳定排序，使索引写入集中在相邻页。
+    """
+    batch.sort(key=lambda row: (row[1], row[6]))
+    deltas = {}
+    for item_id, brand_id, quantity, _, _, total_amount, date, _ in batch:
+        key = (brand_id, item_id, date[:7])
+        delta = deltas.get(key)
+        if delta is None:
+            deltas[key] = [quantity, total_amount, 1]
+        else:
+            delta[0] += quantity
+            delta[1] += total_amount
+            delta[2] += 1
+
+    conn.execute("DROP TRIGGER IF EXISTS trg_purchases_agg_insert")
+    conn.executemany(INSERT_PURCHASE_SQL, batch)
+    conn.executemany(UPSERT_MONTHLY_AGG_SQL, [key + tuple(delta) for key, delta in deltas.items()])
+    conn.execute(MONTHLY_AGG_INSERT_TRIGGER)
+
+    report.brand_ids.update(brand_id for brand_id, _, _ in deltas)
+    count = len(batch)
+    batch.clear()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入进货记录（CSV/xlsx）")
+    parser.add_argument("path")
+    parser.add_argument("--brand-id", type=int, default=None, help="所有行归属的品牌；省略时读取“品牌”列")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--errors", default=None, help="错误明细输出路径")
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error(f"文件不存在: {args.path}")
+    report = import_purchases(args.path, args.brand_id, args.batch_size, args.errors,
+                              progress=lambda n: print(f"已处理 {n} 行", file=sys.stderr))
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""商品搜索索引：n-gram 倒排表 + 拼音首字母，返回按相关度和使用频率排序的商品
+
+每个商品以“品名 规格 单位”的小写文本和品名的拼音首字母（如 可口可乐 -> kkkl）建立索引，
+单字和相邻两字分别登记到倒排表。查询时先对各 gram 的倒排集合求交集得到候选，再校验子串并打分；
+查询较长且完全匹配不足时，允许缺失一个 gram（容忍一个错字或多打/漏打一个字）。
+拼音首字母表内置（GB2312 一级汉字按拼音排序，按各声母首字的编码区间查表），无需外部依赖；
+二级汉字和生僻字没有首字母，只能按汉字本身搜索。
+"""
+import heapq
+import math
+import time
+from bisect import bisect_right
+from functools import lru_cache
+
+# GB2312 一级汉字（B0A1-D7F9）按拼音排序，各声母首字的编码：啊 芭 擦 搭 蛾 发 噶 哈 击 喀 垃 妈 拿 哦 啪 期 然 撒 塌 挖 昔 压 匝
+_INITIAL_CODES = (
+    0xB0A1, 0xB0C5, 0xB2C1, 0xB4EE, 0xB6EA, 0xB7A2, 0xB8C1, 0xB9FE, 0xBBF7, 0xBFA6, 0xC0AC, 0xC2E8,
+    0xC4C3, 0xC5B6, 0xC5BE, 0xC6DA, 0xC8BB, 0xC8F6, 0xCBFA, 0xCDDA, 0xCEF4, 0xD1B9, 0xD4D1,
+)
+_INITIAL_LETTERS = "abcdefghjklmnopqrstwxyz"
+_LEVEL1_LAST = 0xD7F9
+
+DEFAULT_LIMIT = 200
+# 候选超过该数量时（如只输入一个常见字）只给最常用的这些候选打分，前缀匹配另由前缀表补全
+SCAN_LIMIT = 1000
+# 完全匹配少于该数量时才做容错匹配，容错候选最多打分的数量
+FUZZY_THRESHOLD = 20
+FUZZY_SCAN_LIMIT = 100
+
+# 打分：匹配位置决定基础分，使用频率和最近使用时间在同档内调整顺序
+SCORE_PREFIX = 100
+SCORE_NAME = 80
+SCORE_INITIALS_PREFIX = 75
+SCORE_INITIALS = 60
+SCORE_TEXT = 50
+SCORE_FUZZY = 30
+FREQUENCY_WEIGHT = 8
+RECENCY_WEIGHT = 10
+RECENCY_MONTHS = 12
+SESSION_WEIGHT = 15
+
+
+@lru_cache(maxsize=None)
+def char_initial(ch):
+    """单个字符的拼音首字母；ASCII 字母数字原样（小写）返回，无法识别的字符返回空串"""
+    if ch.isascii():
+        return ch.lower() if ch.isalnum() else ""
+    try:
+        code = ch.encode("gb2312")
+    except UnicodeEncodeError:
+        return ""
+    if len(code) != 2:
+        return ""
+    value = code[0] << 8 | code[1]
+    if value < _INITIAL_CODES[0] or value > _LEVEL1_LAST:
+        return ""
+    return _INITIAL_LETTERS[bisect_right(_INITIAL_CODES, value) - 1]
+
+
+def pinyin_initials(text):
+    """'可口可乐500' -> 'kkkl500'"""
+    return "".join(map(char_initial, text or ""))
+
+
+def normalize(text):
+    """小写并去掉空白，查询和索引文本使用同一规则"""
+    return "".join(str(text).lower().split())
+
+
+def grams(text):
+    """单字和相邻两字；多段文本以 \\0 拼接后一次生成，跨段的 gram 含 \\0，查询永远不会命中"""
+    result = set(text)
+    result.update(map(str.__add__, text, text[1:]))
+    return result
+
+
+def query_grams(query):
+    """查询用的 gram：单字查询用单字，否则只用相邻两字（更有区分度）"""
+    if len(query) == 1:
+        return [query]
+    return [query[i:i + 2] for i in range(len(query) - 1)]
+
+
+def aligned_matches(query, text):
+    """把 query 与 text 的每个位置对齐，返回逐字相同的最大个数"""
+    padded = "\0" * (len(query) - 1) + text
+    return max((sum(map(str.__eq__, query, padded[start:])) for start in range(len(padded))), default=0)
+
+
+def month_ordinal(ym):
+    """'YYYY-MM' -> 月序号，便于计算相隔月数"""
+    return int(ym[:4]) * 12 + int(ym[5:7]) - 1
+
+
+def current_month_ordinal():
+    today = time.localtime()
+    return today.tm_year * 12 + today.tm_mon - 1
+
+
+class ItemSearchIndex:
+    """单个品牌的商品搜索索引
+
+    items 为 [(item_id, item_name, spec, unit)]。add/remove 增量维护；
+    set_usage 载入历史使用情况，record_use 记录本次会话中的选择，二者都会影响排序。
+    """
+
+    def __init__(self, items=()):
+        self._entries = {}      # item_id -> (文本, 首字母, 品名)
+        self._order = {}        # item_id -> 加入顺序，分数相同时保持目录顺序
+        self._postings = {}     # gram -> {item_id}
+        self._prefixes = {}     # 文本/首字母的前一、两个字 -> {item_id}
+        self._usage = {}        # item_id -> (使用次数, 最近使用的月序号)
+        self._session = {}      # item_id -> 本次会话中最近一次选择的序号
+        self._max_count = 0
+        self._ranked_all = None  # (按使用情况排序的全部商品, 名次) 缓存
+        self._sequence = 0
+        for item in items:
+            self.add(*item)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item_id):
+        return item_id in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    # ---- 维护 ----
+    def add(self, item_id, item_name, spec, unit):
+        if item_id in self._entries:
+            self.remove(item_id)
+        name = normalize(item_name)
+        text = normalize(f"{item_name}{spec}{unit}")
+        initials = pinyin_initials(name)
+        self._entries[item_id] = (text, initials, name)
+        self._sequence += 1
+        self._order[item_id] = self._sequence
+        postings = self._postings
+        for gram in grams(text + "\0" + initials):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = {item_id}
+            else:
+                posting.add(item_id)
+        for prefix in {text[:1], text[:2], initials[:1], initials[:2]} - {""}:
+            self._prefixes.setdefault(prefix, set()).add(item_id)
+        self._ranked_all = None
+
+    def remove(self, item_id):
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        del self._order[item_id]
+        text, initials, _ = entry
+        for gram in grams(text + "\0" + initials):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting:
+                    del self._postings[gram]
+        for prefix in {text[:1], text[:2], initials[:1], initials[:2]} - {""}:
+            posting = self._prefixes.get(prefix)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting:
+                    del self._prefixes[prefix]
+        self._ranked_all = None
+
+    def set_usage(self, usage):
+        """usage 为 {item_id: (使用次数, 'YYYY-MM')}，通常来自进货记录的月度汇总"""
+        self._usage = {item_id: (count, month_ordinal(ym) if ym else 0)
+                       for item_id, (count, ym) in usage.items()}
+        self._max_count = max((count for count, _ in self._usage.values()), default=0)
+        self._ranked_all = None
+
+    def record_use(self, item_id):
+        """商品被选中保存后调用，本次会话中最近选过的商品排在前面"""
+        count, _ = self._usage.get(item_id, (0, 0))
+        self._usage[item_id] = (count + 1, current_month_ordinal())
+        self._max_count = max(self._max_count, count + 1)
+        self._sequence += 1
+        self._session[item_id] = self._sequence
+        self._ranked_all = None
+
+    # ---- 查询 ----
+    def boost(self, item_id, current_month=None):
+        """使用频率（0~FREQUENCY_WEIGHT）+ 近一年内的最近使用（0~RECENCY_WEIGHT）+ 本次会话选择"""
+        score = 0.0
+        count, last = self._usage.get(item_id, (0, 0))
+        if count:
+            score += FREQUENCY_WEIGHT * math.log1p(count) / math.log1p(self._max_count)
+            if current_month is None:
+                current_month = current_month_ordinal()
+            months_ago = current_month - last
+            if months_ago < RECENCY_MONTHS:
+                score += RECENCY_WEIGHT * (RECENCY_MONTHS - max(months_ago, 0)) / RECENCY_MONTHS
+        if item_id in self._session:
+            score += SESSION_WEIGHT * self._session[item_id] / self._sequence
+        return score
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """返回按相关度排序的 item_id 列表；空查询返回全部商品（常用的在前）
+
+        先按匹配档位（前缀 > 品名 > 首字母 > 规格单位 > 模糊），同档内按使用频率和最近使用排序。
+        """
+        query = normalize(query)
+        ranked_all, rank_pos = self._ranking()
+        if not query:
+            return ranked_all[:limit] if limit else list(ranked_all)
+
+        postings = [self._postings.get(gram) for gram in query_grams(query)]
+        candidates = self._trim(self._intersect(postings), query, ranked_all)
+        scored = self._score(query, candidates, fuzzy=False)
+        if len(scored) < FUZZY_THRESHOLD and len(query) >= 3:
+            # 容错：完全匹配很少时，允许查询中任意一个字没有出现（错字、多打一个字），候选需包含其余所有字
+            chars = [self._postings.get(ch) for ch in query]
+            fuzzy = set()
+            for skip in range(len(chars)):
+                fuzzy |= self._intersect(chars[:skip] + chars[skip + 1:])
+            fuzzy.difference_update(item_id for item_id, _ in scored)
+            fuzzy = self._trim(fuzzy, query, ranked_all, FUZZY_SCAN_LIMIT, keep_prefixed=False)
+            scored += self._score(query, fuzzy, fuzzy=True)
+
+        ranked = heapq.nsmallest(limit, scored, key=lambda pair: (-pair[1], rank_pos[pair[0]]))
+        return [item_id for item_id, _ in ranked]
+
+    def _trim(self, candidates, query, ranked_all, limit=SCAN_LIMIT, keep_prefixed=True):
+        """候选过多时按使用情况从高到低只保留前 limit 个
+
+        keep_prefixed 时所有前缀匹配的候选也保留（前缀匹配本身超过 limit 个时只保留其中最常用的）。
+        """
+        if len(candidates) <= limit:
+            return candidates
+        prefixed = candidates & self._prefixes.get(query[:2], set()) if keep_prefixed else set()
+        pool = prefixed if len(prefixed) > limit else candidates
+        head = []
+        for item_id in ranked_all:
+            if item_id in pool:
+                head.append(item_id)
+                if len(head) >= limit:
+                    break
+        return prefixed.union(head) if pool is candidates else set(head)
+
+    @staticmethod
+    def _intersect(postings):
+        if not postings or any(posting is None for posting in postings):
+            return set()
+        postings = sorted(postings, key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def _score(self, query, candidates, fuzzy):
+        scored = []
+        entries = self._entries
+        ascii_query = query.isascii()  # 字母数字查询按首字母对齐，否则按文本对齐
+        for item_id in candidates:
+            text, initials, name = entries[item_id]
+            if text.startswith(query):
+                score = SCORE_PREFIX
+            elif query in name:
+                score = SCORE_NAME
+            elif initials.startswith(query):
+                score = SCORE_INITIALS_PREFIX
+            elif query in initials:
+                score = SCORE_INITIALS
+            elif query in text:
+                score = SCORE_TEXT
+            elif fuzzy:
+                # 按位置对齐后相同的字越多越靠前（错一个字时只差一分），仍低于任何完全匹配
+                score = SCORE_FUZZY + min(aligned_matches(query, initials if ascii_query else text),
+                                          SCORE_TEXT - SCORE_FUZZY - 1)
+            else:
+                continue  # gram 都在但不相邻，不算完全匹配
+            scored.append((item_id, score))
+        return scored
+
+    def _ranking(self):
+        """全部商品按使用情况排序的列表及各商品的名次，目录或使用情况变化后重新计算"""
+        if self._ranked_all is None:
+            if self._usage or self._session:
+                current_month = current_month_ordinal()
+                ranked = sorted(
+                    self._entries, key=lambda item_id: (-self.boost(item_id, current_month), self._order[item_id])
+                )
+            else:
+                ranked = sorted(self._entries, key=self._order.__getitem__)
+            self._ranked_all = (ranked, {item_id: pos for pos, item_id in enumerate(ranked)})
+        return self._ranked_all
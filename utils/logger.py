@@ -0,0 +1,73 @@
+"""日志配置：所有模块通过 logging.getLogger(__name__) 记录，写文件由后台线程完成
+
+setup_logging() 在启动时调用一次：根 logger 只挂一个 QueueHandler，调用方只把记录放入队列；
+QueueListener 线程负责格式化后写入按大小轮转的日志文件。级别过滤发生在调用方，
+未启用的 DEBUG 日志只有一次级别比较的开销，消息请使用 logger.debug("...%s", value) 的惰性格式。
+级别可由参数或环境变量 STOCKFLOW_LOG_LEVEL 指定（DEBUG/INFO/WARNING/ERROR），默认 INFO。
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(threadName)s - %(name)s - %(message)s"
+DEFAULT_LEVEL = "INFO"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+_listener = None
+
+
+def default_log_path():
+    """日志文件与数据库放在同一 data 目录（打包后为 main.exe 所在目录下的 data）"""
+    if getattr(sys, 'frozen', False):
+        base_path = Path(sys.executable).parent
+    else:
+        base_path = Path(__file__).resolve().parent.parent
+    return base_path / "data" / "debug.log"
+
+
+def setup_logging(level=None, log_path=None, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """配置根 logger；重复调用时先停止上一次的后台写入线程"""
+    global _listener
+    level = (level or os.environ.get("STOCKFLOW_LOG_LEVEL") or DEFAULT_LEVEL)
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.getLevelName(DEFAULT_LEVEL)
+    log_path = Path(log_path or default_log_path())
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    shutdown_logging()
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+    )
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    return _listener
+
+
+def shutdown_logging():
+    """写完队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,185 @@
+"""采样分析器：定时抓取 GUI 线程和数据库工作线程的调用栈，输出折叠栈文本和 speedscope JSON
+
+只用标准库：后台线程每隔 interval 秒通过 sys._current_frames() 读取目标线程的当前栈，
+不需要信号（Windows 也可用），也不修改被采样的代码。未开启时本模块不会被导入，没有任何开销。
+
+开启方式：
+  - 环境变量 STOCKFLOW_PROFILE=1：启动时开始采样，退出时写出结果（STOCKFLOW_PROFILE_INTERVAL_MS 调整间隔）；
+  - 品牌管理窗口按 Ctrl+Shift+P 开始/停止，停止时写出结果。
+结果写入 data 目录：profile-时间.collapsed.txt（flamegraph.pl 等工具使用的折叠栈格式）和
+profile-时间.speedscope.json（拖入 https://www.speedscope.app 查看，按线程分为多个 profile）。
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from utils.logger import default_log_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_THREADS = ("MainThread", "db-executor")
+MAX_SAMPLES = 500000  # 每个线程最多保留的样本数，约 40 分钟（5ms 间隔）
+THREAD_REFRESH = 0.5  # 每隔多少秒重新查找目标线程（数据库线程可能在开始采样后才启动）
+
+
+def default_output_dir():
+    """与日志、数据库相同的 data 目录"""
+    return default_log_path().parent
+
+
+class SamplingProfiler:
+    """按线程名采样；同一线程连续相同的栈合并为一个样本并累加权重"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_names=DEFAULT_THREADS):
+        self.interval = interval
+        self.thread_names = set(thread_names)
+        self._frames = []          # [(函数名, 文件, 行号)]
+        self._frame_ids = {}       # code 对象 -> 在 _frames 中的序号
+        self._samples = {}         # 线程名 -> [[栈(帧序号元组), 权重(秒)]]
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.duration = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.started_at = datetime.now()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        logger.info("开始采样，间隔 %.1f ms，线程 %s", self.interval * 1000, sorted(self.thread_names))
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            logger.info("停止采样，共 %.1f s", self.duration)
+
+    def _frame_id(self, code):
+        frame_id = self._frame_ids.get(code)
+        if frame_id is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            frame_id = self._frame_ids[code] = len(self._frames)
+            self._frames.append((name, code.co_filename, code.co_firstlineno))
+        return frame_id
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_id(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _targets(self):
+        return {thread.ident: thread.name for thread in threading.enumerate()
+                if thread.name in self.thread_names}
+
+    def _run(self):
+        start = last = time.perf_counter()
+        targets, refreshed = self._targets(), start
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            if now - refreshed > THREAD_REFRESH:
+                targets, refreshed = self._targets(), now
+            frames = sys._current_frames()
+            for ident, name in targets.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._stack(frame)
+                samples = self._samples.setdefault(name, [])
+                if samples and samples[-1][0] == stack:
+                    samples[-1][1] += weight
+                elif len(samples) < MAX_SAMPLES:
+                    samples.append([stack, weight])
+            del frames
+        self.duration = time.perf_counter() - start
+
+    # ---- 输出 ----
+    def _frame_label(self, frame_id):
+        name, filename, line = self._frames[frame_id]
+        return f"{name} ({Path(filename).name}:{line})"
+
+    def collapsed(self):
+        """折叠栈文本：每行“线程;外层;...;内层 毫秒数”"""
+        totals = {}
+        for thread_name, samples in self._samples.items():
+            for stack, weight in samples:
+                key = ";".join([thread_name] + [self._frame_label(f).replace(";", ",") for f in stack])
+                totals[key] = totals.get(key, 0.0) + weight
+        return "".join(f"{key} {max(1, round(weight * 1000))}\n" for key, weight in sorted(totals.items()))
+
+    def speedscope(self):
+        """speedscope 文件格式（sampled profile，单位毫秒）"""
+        profiles = []
+        for thread_name, samples in sorted(self._samples.items()):
+            weights = [round(weight * 1000, 3) for _, weight in samples]
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": [list(stack) for stack, _ in samples],
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"stockflow {self.started_at:%Y-%m-%d %H:%M:%S}" if self.started_at else "stockflow",
+            "exporter": "stockflow utils.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": name, "file": filename, "line": line}
+                                  for name, filename, line in self._frames]},
+            "profiles": profiles,
+        }
+
+    def write(self, out_dir=None):
+        """写出两种格式的结果，返回 (折叠栈文件, speedscope 文件)"""
+        out_dir = Path(out_dir or default_output_dir())
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"profile-{(self.started_at or datetime.now()):%Y%m%d-%H%M%S}"
+        collapsed_path = out_dir / f"{stem}.collapsed.txt"
+        speedscope_path = out_dir / f"{stem}.speedscope.json"
+        collapsed_path.write_text(self.collapsed(), encoding="utf-8")
+        with open(speedscope_path, "w", encoding="utf-8") as f:
+            json.dump(self.speedscope(), f, ensure_ascii=False)
+        logger.info("采样结果已写入 %s 和 %s", collapsed_path, speedscope_path)
+        return collapsed_path, speedscope_path
+
+
+_active = None
+
+
+def is_profiling():
+    return _active is not None
+
+
+def start_profiling(interval=DEFAULT_INTERVAL, thread_names=DEFAULT_THREADS):
+    """开始全局采样（已在采样时不做任何事）"""
+    global _active
+    if _active is None:
+        _active = SamplingProfiler(interval, thread_names)
+        _active.start()
+    return _active
+
+
+def stop_profiling(out_dir=None):
+    """停止全局采样并写出结果，返回 (折叠栈文件, speedscope 文件)；未在采样时返回 None"""
+    global _active
+    profiler, _active = _active, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    return profiler.write(out_dir)
@@ -0,0 +1,255 @@
+"""界面操作耗时统计：从用户操作到表格刷新完成并绘制的时间，按操作记入对数分桶直方图
+
+用法（GUI 线程）：
+    timer = ui_metrics.start("切换月份")   # 在触发操作的槽函数开头
+    ...                                     # 异步加载，结果回来后刷新表格
+    timer.finish(self.table.viewport())     # 刷新完成后调用：控件可见时等它下一次绘制再记时，否则立即记时
+    timer.cancel()                          # 操作被新的请求取代或失败时放弃
+    with timer.paused(): QMessageBox...     # 等待用户的时间不计入
+
+直方图与 HdrHistogram 相同的思路：以微秒为单位，每个 2 的幂区间再等分 16 个子桶（相对误差约 6%），
+任意多次记录只占几十个计数，不同会话、不同机器的直方图可以直接按桶相加。
+程序退出时（main.py 注册）把本次会话的数据累加到 data/ui_metrics.json；比较两个版本的文件：
+    python -m utils.ui_metrics old.json new.json [--threshold 1.2]
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SUB_BUCKET_BITS = 4            # 每个 2 的幂区间 16 个子桶
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def bucket_index(value_us):
+    exponent = max(value_us.bit_length() - SUB_BUCKET_BITS - 1, 0)
+    return SUB_BUCKETS * exponent + (value_us >> exponent)
+
+
+def bucket_range(index):
+    """桶 index 覆盖的微秒区间 [lower, upper]"""
+    exponent = max(index // SUB_BUCKETS - 1, 0)
+    mantissa = index - SUB_BUCKETS * exponent
+    return mantissa << exponent, ((mantissa + 1) << exponent) - 1
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total_us", "min_us", "max_us")
+
+    def __init__(self):
+        self.counts = {}       # 桶序号 -> 次数
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, value_us):
+        value_us = max(int(value_us), 0)
+        index = bucket_index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, fraction):
+        """分位数（微秒），取所在桶的中点，不超过记录到的最大值"""
+        if not self.count:
+            return 0
+        target = self.count * fraction
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                lower, upper = bucket_range(index)
+                return min((lower + upper) / 2, self.max_us)
+        return self.max_us
+
+    def to_dict(self):
+        result = {
+            "count": self.count,
+            "min_ms": round((self.min_us or 0) / 1000, 3),
+            "max_ms": round(self.max_us / 1000, 3),
+            "mean_ms": round(self.total_us / self.count / 1000, 3) if self.count else 0,
+            "total_us": self.total_us,
+        }
+        for fraction in PERCENTILES:
+            result[f"p{round(fraction * 100)}_ms"] = round(self.percentile(fraction) / 1000, 3)
+        result["buckets"] = {str(index): count for index, count in sorted(self.counts.items())}
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data.get("buckets", {}).items()}
+        histogram.count = data.get("count", sum(histogram.counts.values()))
+        histogram.total_us = data.get("total_us", 0)
+        histogram.min_us = round(data["min_ms"] * 1000) if histogram.count else None
+        histogram.max_us = round(data.get("max_ms", 0) * 1000)
+        return histogram
+
+
+_lock = threading.Lock()
+_histograms = {}   # 操作名 -> Histogram
+_session_started = datetime.now().isoformat(timespec="seconds")
+
+
+def record(action, elapsed_ms):
+    with _lock:
+        histogram = _histograms.get(action)
+        if histogram is None:
+            histogram = _histograms[action] = Histogram()
+        histogram.record(elapsed_ms * 1000)
+
+
+def snapshot():
+    """本次会话各操作的统计（可直接序列化为 JSON）"""
+    with _lock:
+        return {action: histogram.to_dict() for action, histogram in sorted(_histograms.items())}
+
+
+class ActionTimer:
+    """一次操作的计时；finish/cancel 只有第一次调用生效"""
+    __slots__ = ("action", "started", "done", "_filter")
+
+    def __init__(self, action):
+        self.action = action
+        self.started = time.perf_counter()
+        self.done = False
+        self._filter = None
+
+    def finish(self, widget=None):
+        if self.done:
+            return
+        self.done = True
+        if widget is None or not widget.isVisible():
+            record(self.action, (time.perf_counter() - self.started) * 1000)
+            return
+        from PyQt5.QtCore import QObject, QEvent
+
+        timer = self
+
+        class PaintFilter(QObject):
+            """控件收到刷新后的第一个绘制事件时记时"""
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint:
+                    obj.removeEventFilter(self)
+                    timer._filter = None
+                    record(timer.action, (time.perf_counter() - timer.started) * 1000)
+                    self.deleteLater()
+                return False
+
+        self._filter = PaintFilter(widget)  # 以控件为父对象，控件销毁时一并销毁
+        widget.installEventFilter(self._filter)
+        widget.update()
+
+    def cancel(self):
+        self.done = True
+
+    @contextmanager
+    def paused(self):
+        """期间的时间不计入（如等待用户关闭提示框）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.started += time.perf_counter() - start
+
+
+def start(action):
+    return ActionTimer(action)
+
+
+def save(path):
+    """把本次会话的数据累加到 path（不存在或格式不同时新建）"""
+    path = Path(path)
+    stored = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("format") != FORMAT_VERSION:
+            stored = {}
+    except (OSError, ValueError):
+        stored = {}
+    with _lock:
+        current = dict(_histograms)
+    if not current:
+        return
+    actions = {name: Histogram.from_dict(data) for name, data in stored.get("actions", {}).items()}
+    for name, histogram in current.items():
+        actions.setdefault(name, Histogram()).merge(histogram)
+    result = {
+        "format": FORMAT_VERSION,
+        "bucketing": f"微秒，对数分桶，每个 2 的幂区间 {SUB_BUCKETS} 个子桶",
+        "sessions": stored.get("sessions", 0) + 1,
+        "first_session": stored.get("first_session", _session_started),
+        "last_session": _session_started,
+        "platform": sys.platform,
+        "actions": {name: histogram.to_dict() for name, histogram in sorted(actions.items())},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(path)
+
+
+def save_quietly(path):
+    try:
+        save(path)
+    except OSError as e:
+        logger.error("写出界面耗时统计失败: %s", e)
+
+
+def compare(old, new, threshold):
+    """逐个操作比较 p50/p90，返回变慢超过 threshold 倍的操作"""
+    regressions = []
+    print(f"{'操作':<16}{'次数':>8}{'p50 旧→新 (ms)':>24}{'p90 旧→新 (ms)':>24}")
+    for name in sorted(set(old.get("actions", {})) | set(new.get("actions", {}))):
+        before, after = old.get("actions", {}).get(name), new.get("actions", {}).get(name)
+        if before is None or after is None:
+            print(f"{name:<16}{'仅旧版' if after is None else '仅新版':>8}")
+            continue
+        ratio = after["p90_ms"] / before["p90_ms"] if before["p90_ms"] else 1.0
+        mark = "  变慢" if ratio > threshold else ""
+        print(f"{name:<16}{after['count']:>8}{before['p50_ms']:>11.1f} → {after['p50_ms']:<10.1f}"
+              f"{before['p90_ms']:>11.1f} → {after['p90_ms']:<10.1f}{ratio:5.2f}x{mark}")
+        if mark:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较两个 ui_metrics.json 中各操作的耗时分位数")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p90 超过旧版的倍数视为变慢")
+    args = parser.parse_args()
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if compare(old, new, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()